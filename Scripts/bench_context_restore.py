@@ -0,0 +1,90 @@
+# bench_context_restore.py
+"""
+Restore time and token cost of priming a new Realtime session from conversation history:
+
+  replay            : last CONTEXT_REPLAY_MAX_TURNS turns as conversation.item.create frames,
+                      capped by the token budget (context_replay.load_replay_frames)
+  rolling summary   : one read of the persisted rolling summary (conversation_summary)
+  summary (scratch) : the pre-rolling path - the last 30 turns sent to the summarizer on every
+                      connect. Its prompt size is always reported; --live also times the call
+                      (needs OPENAI_API_KEY, costs tokens)
+
+Tokens are estimated at ~4 chars/token except for --live, which reports the API's usage.
+"Context tokens" are what the new session carries into every response (items or instructions);
+"restore tokens" are what the summarizer itself consumes per connect.
+
+Run from the repo root:
+  python Scripts/bench_context_restore.py [--db conversation_history.db] [--turns 20] [--budget 2000] [--repeat 20] [--live]
+"""
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import conversation_history_db # noqa: E402
+from context_replay import estimate_tokens, load_replay_frames # noqa: E402
+from conversation_summary import format_turns # noqa: E402
+
+SCRATCH_HISTORY_TURNS = 30 # CONTEXT_HISTORY_LIMIT in openai_client
+SCRATCH_PROMPT_OVERHEAD_TOKENS = 80 # Fixed wording around the history in the old summarizer prompt
+SUMMARY_MAX_TOKENS = 200
+
+
+def best_ms(fn, repeat: int):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, (time.perf_counter() - start) * 1000.0)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare replay and summary context restore.")
+    parser.add_argument("--db", default=conversation_history_db.DB_PATH, help="conversation_history.db to read")
+    parser.add_argument("--turns", type=int, default=20, help="CONTEXT_REPLAY_MAX_TURNS")
+    parser.add_argument("--budget", type=int, default=2000, help="CONTEXT_REPLAY_TOKEN_BUDGET")
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per local measurement (best is reported)")
+    parser.add_argument("--live", action="store_true", help="Also time a from-scratch summarizer call")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"No history database at {args.db}."); return
+    conversation_history_db.DB_PATH = args.db
+    conversation_history_db._ch_log = lambda *a, **k: None # Per-query DEBUG lines would dominate the timings
+
+    rows = []
+    replay_ms, (frames, replay_stats) = best_ms(lambda: load_replay_frames(args.turns, args.budget), args.repeat)
+    rows.append(("replay", replay_ms, replay_stats["tokens_est"], 0, f"{replay_stats['items']} items, {replay_stats['bytes']} bytes"))
+
+    rolling_ms, row = best_ms(lambda: conversation_history_db.get_rolling_summary(), args.repeat)
+    if row: rows.append(("rolling summary", rolling_ms, estimate_tokens(row["summary"]), 0, f"through turn {row['last_turn_id']}"))
+    else: rows.append(("rolling summary", rolling_ms, 0, 0, "no summary stored yet"))
+
+    history_text = format_turns(conversation_history_db.get_recent_turns(limit=SCRATCH_HISTORY_TURNS))
+    scratch_prompt_tokens = estimate_tokens(history_text) + SCRATCH_PROMPT_OVERHEAD_TOKENS
+    scratch_note, scratch_ms, scratch_context = "not timed (use --live)", None, SUMMARY_MAX_TOKENS
+    scratch_restore = scratch_prompt_tokens + SUMMARY_MAX_TOKENS
+    if args.live:
+        import openai
+        client = openai.OpenAI()
+        prompt = f"Briefly state the essence of the History below as a long format summary.\n\nHistory:\n{history_text}\n\nBriefing:"
+        start = time.perf_counter()
+        response = client.chat.completions.create(model=os.getenv("CONTEXT_SUMMARIZER_MODEL", "gpt-4o-mini"),
+                                                  messages=[{"role": "user", "content": prompt}], temperature=0.1, max_tokens=SUMMARY_MAX_TOKENS)
+        scratch_ms = (time.perf_counter() - start) * 1000.0
+        scratch_context = estimate_tokens(response.choices[0].message.content)
+        scratch_restore = response.usage.total_tokens; scratch_note = "measured (API usage)"
+    rows.append(("summary (scratch)", scratch_ms, scratch_context, scratch_restore, scratch_note))
+
+    print(f"History: {args.db}; replay cap {args.turns} turns / {args.budget} tokens\n")
+    print(f"{'mode':<18} {'restore ms':>10} {'context tok':>11} {'restore tok':>11}  notes")
+    for label, ms, context_tokens, restore_tokens, note in rows:
+        print(f"{label:<18} {('-' if ms is None else f'{ms:.2f}'):>10} {context_tokens:>11} {restore_tokens:>11}  {note}")
+    print("\nReplay frames go out right after session.update; the client logs how long the server took to acknowledge the last one.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# bench_dsp_kernels.py
+"""
+Per-frame cost of the mic/TSM hot path before and after dsp_kernels.
+
+  vad_path : RMS gate on the 24 kHz chunk -> 24k->16k resample -> x0.20 gain (barge-in VAD input)
+             -> hand the 16 kHz frame to the wake word detector
+  tsm_conv : int16 -> float32 on the way into StreamingWSOLA, float32 -> int16 on the way out
+
+"before" reproduces the previous code (fresh temporaries, float64 gain, concatenate in the
+resampler, tobytes() for the wake word); "after" uses the preallocated kernels.
+Reports mean time per 30 ms frame and the transient NumPy memory allocated per frame
+(tracemalloc peak above the steady state), plus the max output difference.
+Run from the repo root:  python Scripts/bench_dsp_kernels.py [--frames 5000]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import dsp_kernels # noqa: E402
+from audio_resampler import StreamingResampler # noqa: E402
+
+INPUT_RATE = 24000
+CHUNK_SAMPLES = 720 # 30 ms
+VOLUME_FACTOR = 0.20
+
+
+class LegacyResampler(StreamingResampler):
+    """StreamingResampler.process as it was before the preallocated buffers."""
+
+    def reset(self):
+        self._pending = np.zeros(self._history_len, dtype=np.float32)
+
+    def process(self, audio) -> np.ndarray:
+        from numpy.lib.stride_tricks import sliding_window_view
+        if isinstance(audio, (bytes, bytearray, memoryview)): audio = np.frombuffer(audio, dtype=np.int16)
+        buf = np.concatenate([self._pending, audio.astype(np.float32, copy=False)])
+        periods = (len(buf) - self._history_len) // self.down
+        if periods <= 0:
+            self._pending = buf
+            return np.zeros(0, dtype=np.int16)
+        windows = sliding_window_view(buf, self.taps_per_phase)
+        consumed = periods * self.down
+        out = np.empty(periods * self.up, dtype=np.float32)
+        for m, (phase, offset) in enumerate(self._period_plan):
+            out[m::self.up] = windows[offset:offset + consumed:self.down] @ self._phase_taps[phase]
+        self._pending = buf[consumed:].copy()
+        np.clip(out, -32768, 32767, out=out)
+        return out.astype(np.int16)
+
+
+def make_frames(count: int):
+    rng = np.random.default_rng(7)
+    x = (rng.standard_normal(count * CHUNK_SAMPLES) * 6000).clip(-32768, 32767).astype(np.int16)
+    return [x[i * CHUNK_SAMPLES:(i + 1) * CHUNK_SAMPLES].tobytes() for i in range(count)]
+
+
+def vad_path_before(state, chunk: bytes):
+    samples = np.frombuffer(chunk, dtype=np.int16)
+    x = samples.astype(np.float32)
+    level = float(np.dot(x, x))
+    r16 = state["resampler"].process(chunk)
+    scaled = (r16 * VOLUME_FACTOR).astype(np.int16)
+    ww_input = np.frombuffer(r16.tobytes(), dtype=np.int16)
+    return level, scaled, ww_input
+
+
+def vad_path_after(state, chunk: bytes):
+    samples = np.frombuffer(chunk, dtype=np.int16)
+    level = dsp_kernels.rms_dbfs(samples, state["scratch"])
+    r16 = state["resampler"].process(samples)
+    scaled = dsp_kernels.apply_gain_q15(r16, state["gain_q15"], state["scratch"])
+    return level, scaled, r16
+
+
+def tsm_conv_before(state, chunk: bytes):
+    x = np.frombuffer(chunk, dtype=np.int16).astype(np.float32) / 32768.0
+    return (np.clip(x, -1.0, 1.0) * 32767.0).astype(np.int16)
+
+
+def tsm_conv_after(state, chunk: bytes):
+    samples = np.frombuffer(chunk, dtype=np.int16)
+    x = dsp_kernels.int16_to_float32(samples, state["scratch"].get("in", samples.size, np.float32))
+    return dsp_kernels.float32_to_int16(x, state["scratch"].get("out", samples.size, np.int16), state["scratch"])
+
+
+def measure(fn, state, frames):
+    for chunk in frames[:50]: fn(state, chunk) # Warm up (grows scratch buffers once)
+    start = time.perf_counter()
+    for chunk in frames: fn(state, chunk)
+    us_per_frame = (time.perf_counter() - start) * 1e6 / len(frames)
+    tracemalloc.start()
+    transient = 0
+    for chunk in frames[:500]:
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        result = fn(state, chunk)
+        transient += tracemalloc.get_traced_memory()[1] - base
+        del result
+    tracemalloc.stop()
+    return us_per_frame, transient / min(len(frames), 500)
+
+
+def new_state(after: bool):
+    return {"resampler": StreamingResampler(INPUT_RATE, 16000, reuse_output=True) if after else LegacyResampler(INPUT_RATE, 16000),
+            "scratch": dsp_kernels.Scratch(), "gain_q15": dsp_kernels.gain_to_q15(VOLUME_FACTOR)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the preallocated DSP kernels against the previous hot path.")
+    parser.add_argument("--frames", type=int, default=5000, help="30 ms frames per measurement")
+    args = parser.parse_args()
+    frames = make_frames(args.frames)
+
+    print(f"{args.frames} x 30 ms frames\n")
+    print(f"{'path':<10} {'version':<8} {'us/frame':>10} {'alloc B/frame':>14}")
+    for name, before, after in (("vad_path", vad_path_before, vad_path_after), ("tsm_conv", tsm_conv_before, tsm_conv_after)):
+        for label, fn, is_after in (("before", before, False), ("after", after, True)):
+            us, alloc = measure(fn, new_state(is_after), frames)
+            print(f"{name:<10} {label:<8} {us:>10.1f} {alloc:>14.0f}")
+
+    # Output agreement (gain now rounds instead of truncating: at most 1 LSB apart)
+    sb, sa = new_state(False), new_state(True)
+    diffs = [np.abs(vad_path_before(sb, c)[1].astype(np.int32) - vad_path_after(sa, c)[1]).max(initial=0) for c in frames[:200]]
+    tsm_diff = max(np.abs(tsm_conv_before(None, c).astype(np.int32) - tsm_conv_after(new_state(True), c)).max() for c in frames[:200])
+    print(f"\nMax |before - after|: vad_path gain output {max(diffs)} LSB, tsm_conv {tsm_diff} LSB")
+
+
+if __name__ == "__main__":
+    main()
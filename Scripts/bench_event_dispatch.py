@@ -0,0 +1,129 @@
+# bench_event_dispatch.py
+"""
+Messages per second through the inbound event parse + dispatch layer, before and after
+realtime_events (fast-path scan of response.audio.delta, handler table, orjson if installed).
+
+  before : json.loads every frame, a logging if/elif chain (with the str(msg)[:100] preview
+           for types it doesn't format) and then a second handling if/elif chain
+  after  : scan_audio_delta() on the raw frame, parse_event() + dict dispatch for the rest
+  Both decode the base64 audio payload, as the real handler does (--skip-decode times parse +
+  dispatch alone).
+
+Traffic is either recorded frames (one raw server frame per line, as written by the client
+with REALTIME_TRAFFIC_RECORD_PATH set) or a synthetic mix shaped like a spoken response:
+100 ms audio deltas with interleaved transcript deltas and the usual lifecycle events.
+Run from the repo root:
+  python Scripts/bench_event_dispatch.py [--traffic frames.jsonl] [--responses 200] [--repeat 5] [--skip-decode]
+"""
+
+import os
+import sys
+import json
+import time
+import base64
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import realtime_events # noqa: E402
+from realtime_events import parse_event, scan_audio_delta # noqa: E402
+
+_LOGGED_BY_CHAIN = {"response.audio.delta", "conversation.item.input_audio_transcription.delta", "response.audio_transcript.delta",
+                    "response.output.delta", "response.function_call_arguments.delta",
+                    "input_audio_buffer.speech_started", "input_audio_buffer.speech_stopped"}
+_FORMATTED = {"session.created", "session.updated", "conversation.item.created", "conversation.item.input_audio_transcription.completed",
+              "response.audio_transcript.done", "response.function_call_arguments.done", "conversation.item.truncated",
+              "response.output_item.done", "input_audio_buffer.speech_started", "input_audio_buffer.speech_stopped", "error"}
+_HANDLED = ["conversation.item.created", "response.output.delta", "response.function_call_arguments.delta",
+            "response.function_call_arguments.done", "session.created", "response.audio.delta", "response.audio.done",
+            "response.output_item.done", "response.done", "input_audio_buffer.speech_started", "input_audio_buffer.speech_stopped", "error"]
+_decode_audio = base64.b64decode
+
+
+def synthetic_traffic(responses: int):
+    audio_b64 = base64.b64encode(os.urandom(4800)).decode("ascii") # 100 ms of 24 kHz PCM16
+    frames = []
+    def add(payload): frames.append(json.dumps(payload, separators=(",", ":")))
+    for r in range(responses):
+        rid, iid = f"resp_{r:08d}", f"item_{r:08d}"
+        add({"type": "input_audio_buffer.speech_started", "event_id": f"ev_{r}a", "audio_start_ms": 1000, "item_id": f"user_{r}"})
+        add({"type": "input_audio_buffer.speech_stopped", "event_id": f"ev_{r}b", "audio_end_ms": 2400, "item_id": f"user_{r}"})
+        add({"type": "conversation.item.input_audio_transcription.completed", "event_id": f"ev_{r}c", "item_id": f"user_{r}", "transcript": "What's on my calendar tomorrow?"})
+        add({"type": "response.created", "event_id": f"ev_{r}d", "response": {"id": rid, "status": "in_progress", "output": []}})
+        add({"type": "conversation.item.created", "event_id": f"ev_{r}e", "item": {"id": iid, "type": "message", "role": "assistant", "status": "in_progress"}})
+        for k in range(40): # 4 s of speech
+            add({"type": "response.audio.delta", "event_id": f"ev_{r}_{k}", "response_id": rid, "item_id": iid, "output_index": 0, "content_index": 0, "delta": audio_b64})
+            if k % 2 == 0: add({"type": "response.audio_transcript.delta", "event_id": f"ev_{r}_t{k}", "response_id": rid, "item_id": iid, "output_index": 0, "content_index": 0, "delta": " word"})
+        add({"type": "response.audio.done", "event_id": f"ev_{r}f", "response_id": rid, "item_id": iid})
+        add({"type": "response.audio_transcript.done", "event_id": f"ev_{r}g", "response_id": rid, "item_id": iid, "transcript": "You have two meetings tomorrow."})
+        add({"type": "response.output_item.done", "event_id": f"ev_{r}h", "item": {"id": iid, "type": "message", "status": "completed"}})
+        add({"type": "response.done", "event_id": f"ev_{r}i", "response": {"id": rid, "status": "completed"}})
+        add({"type": "rate_limits.updated", "event_id": f"ev_{r}j", "rate_limits": [{"name": "tokens", "limit": 40000, "remaining": 39000}]})
+    return frames
+
+
+def dispatch_before(frame: str, sink: list):
+    msg = json.loads(frame)
+    msg_type = msg.get("type")
+    if msg_type not in _LOGGED_BY_CHAIN: # Old logging chain: formatted f-string or str(msg) preview
+        sink.append(f"{msg_type}" if msg_type in _FORMATTED else f"ℹ️ {msg_type}: {str(msg)[:100]}...")
+    for handled in _HANDLED: # Old handling chain: linear elif comparisons
+        if msg_type == handled:
+            if msg_type == "response.audio.delta": sink.append(_decode_audio(msg.get("delta")))
+            break
+
+
+def make_dispatch_after():
+    handlers = {t: (lambda msg, sink: sink.append(t)) for t in _HANDLED}
+    handlers["response.audio_transcript.delta"] = None
+    def dispatch_after(frame: str, sink: list):
+        audio = scan_audio_delta(frame)
+        if audio is not None:
+            sink.append(_decode_audio(audio[1])); return
+        msg = parse_event(frame)
+        msg_type = msg.get("type")
+        if msg_type in handlers:
+            handler = handlers[msg_type]
+            if handler: handler(msg, sink)
+        else: sink.append(f"ℹ️ {msg_type}: {str(msg)[:100]}...")
+    return dispatch_after
+
+
+def measure(fn, frames, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        sink = []
+        start = time.perf_counter()
+        for frame in frames: fn(frame, sink)
+        best = min(best, time.perf_counter() - start)
+    return len(frames) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark inbound Realtime event parse + dispatch.")
+    parser.add_argument("--traffic", help="Recorded frames, one raw JSON frame per line")
+    parser.add_argument("--responses", type=int, default=200, help="Synthetic responses to generate when no --traffic is given")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per variant (best is reported)")
+    parser.add_argument("--skip-decode", action="store_true", help="Leave out base64 decoding of audio payloads")
+    args = parser.parse_args()
+    global _decode_audio
+    if args.skip_decode: _decode_audio = lambda data: data
+
+    if args.traffic:
+        with open(args.traffic, "r", encoding="utf-8") as f: frames = [line.rstrip("\n") for line in f if line.strip()]
+        source = args.traffic
+    else:
+        frames = synthetic_traffic(args.responses); source = f"synthetic, {args.responses} responses"
+    audio_frames = sum(1 for frame in frames if scan_audio_delta(frame) is not None)
+    print(f"{len(frames)} frames ({source}); {audio_frames} audio deltas on the fast path; "
+          f"orjson {'installed' if realtime_events.ORJSON_AVAILABLE else 'not installed (json fallback)'}\n")
+
+    before = measure(dispatch_before, frames, args.repeat)
+    after = measure(make_dispatch_after(), frames, args.repeat)
+    print(f"{'variant':<8} {'msgs/s':>12} {'us/msg':>8}")
+    for label, rate in (("before", before), ("after", after)):
+        print(f"{label:<8} {rate:>12,.0f} {1e6 / rate:>8.2f}")
+    print(f"\nSpeed-up: {after / before:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+# bench_pipeline_replay.py
+"""
+Replay a labelled WAV corpus through main.continuous_audio_pipeline, no mic or OpenAI needed.
+
+Each WAV is fed through audio_replay.WavReplayStream to the real pipeline (resampler, local
+VAD, wake word detector, pre-roll, send path) with a stub client in place of
+OpenAISpeechClient. Reports per-stage CPU time, wake word detection latency,
+local VAD barge-in latency, local endpointing latency (LOCAL_ENDPOINTING=shadow|on)
+and dropped frames.
+
+Corpus manifest (JSON list); all label fields are optional:
+  [
+    {"wav": "corpus/hey_jarvis_01.wav", "wake_word_end_s": 1.42},
+    {"wav": "corpus/barge_in_01.wav", "start_in_conversation": true,
+     "assistant_speaking_from_s": 0.0, "barge_in_start_s": 2.10}
+  ]
+  wake_word_end_s          : where the wake word ends (detection latency = detection - this)
+  start_in_conversation    : start in SENDING_TO_OPENAI instead of LISTENING_FOR_WAKEWORD
+  assistant_speaking_from_s: the stub reports assistant audio playing from this time
+                             (default: from the wake word detection)
+  barge_in_start_s         : where the user starts talking over the assistant
+  utterance_end_s          : where the user's request ends (endpoint latency = local endpoint - this;
+                             use with start_in_conversation and no assistant_speaking_from_s)
+
+Usage (repo root):
+  python Scripts/bench_pipeline_replay.py corpus.json [--speed 0] [--json results.json]
+  python Scripts/bench_pipeline_replay.py some.wav other.wav          # unlabelled
+"""
+
+import os
+import sys
+import io
+import json
+import time
+import argparse
+import contextlib
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+os.environ.setdefault("MIC_CAPTURE_ENABLED", "false") # Don't write capture files while benchmarking
+
+
+class ReplayStubClient:
+    """Stands in for OpenAISpeechClient: records what the pipeline does, in replay-audio time."""
+
+    def __init__(self, stream, assistant_speaking_from_s=None):
+        self.stream = stream
+        self.connected = True
+        self.keep_outer_loop_running = True
+        self.goodbye_in_progress = False
+        self.assistant_speaking_from_s = assistant_speaking_from_s
+        self.interrupted = False
+        self.wake_detections_s = []
+        self.interrupts_s = []
+        self.endpoints_s = []
+        self.appended_ms = 0.0
+        self.append_calls = 0
+        self.events_sent = 0
+
+    # --- Called by continuous_audio_pipeline ---
+    def is_assistant_speaking(self) -> bool:
+        since = self.assistant_speaking_from_s
+        return since is not None and not self.interrupted and self.stream.position_s >= since
+
+    def get_current_assistant_speech_duration_ms(self) -> int:
+        return int((self.stream.position_s - self.assistant_speaking_from_s) * 1000) if self.is_assistant_speaking() else 0
+
+    def handle_local_user_speech_interrupt(self):
+        self.interrupts_s.append(self.stream.position_s); self.interrupted = True
+
+    def handle_local_endpoint(self):
+        self.endpoints_s.append(self.stream.position_s)
+
+    def send_wake_up_message(self):
+        self.wake_detections_s.append(self.stream.position_s)
+        if self.assistant_speaking_from_s is None: self.assistant_speaking_from_s = self.stream.position_s
+
+    def send_audio_append(self, audio_bytes: bytes, duration_ms: float):
+        self.append_calls += 1; self.appended_ms += duration_ms
+
+    def flush_audio_appends(self): pass
+    def send_event(self, payload: dict): self.events_sent += 1
+    def _clear_audio_state(self): pass # Called by main.set_app_state_main
+
+
+def run_entry(main, entry: dict, speed: float) -> dict:
+    from audio_replay import WavReplayStream, StageTimer
+    stream = WavReplayStream(entry["wav"], rate=main.INPUT_RATE, frames_per_buffer=main.INPUT_CHUNK_SAMPLES, speed=speed, log_fn=main.log)
+    client = ReplayStubClient(stream, entry.get("assistant_speaking_from_s"))
+    main.openai_client_instance = client
+    start_state = main.STATE_SENDING_TO_OPENAI if (entry.get("start_in_conversation") or not main.wake_word_active) else main.STATE_LISTENING_FOR_WAKEWORD
+    main.set_app_state_main(start_state)
+    main.state_just_changed_to_sending = False
+    if hasattr(main.wake_word_detector_instance, "reset"): main.wake_word_detector_instance.reset()
+
+    timer = StageTimer()
+    wall_start = time.perf_counter()
+    main.continuous_audio_pipeline(client, input_stream=stream, stage_timer=timer)
+    wall_s = time.perf_counter() - wall_start
+
+    result = {"wav": entry["wav"], "audio_s": round(stream.duration_s, 3), "wall_s": round(wall_s, 3),
+              "chunks": timer.calls.get("read", 0), "dropped_frames": stream.overflow_frames,
+              "stage_cpu_us": {k: round(v, 1) for k, v in timer.summary_us().items()},
+              "wake_detections_s": client.wake_detections_s, "interrupts_s": client.interrupts_s, "endpoints_s": client.endpoints_s,
+              "appended_ms": client.appended_ms}
+    if entry.get("wake_word_end_s") is not None:
+        hits = [t for t in client.wake_detections_s if t >= entry["wake_word_end_s"] - 0.5]
+        result["wake_latency_ms"] = round((hits[0] - entry["wake_word_end_s"]) * 1000, 1) if hits else None
+    if entry.get("barge_in_start_s") is not None:
+        hits = [t for t in client.interrupts_s if t >= entry["barge_in_start_s"]]
+        result["interrupt_latency_ms"] = round((hits[0] - entry["barge_in_start_s"]) * 1000, 1) if hits else None
+        result["false_interrupts"] = len([t for t in client.interrupts_s if t < entry["barge_in_start_s"]])
+    if entry.get("utterance_end_s") is not None:
+        hits = [t for t in client.endpoints_s if t >= entry["utterance_end_s"]]
+        result["endpoint_latency_ms"] = round((hits[0] - entry["utterance_end_s"]) * 1000, 1) if hits else None
+        result["early_endpoints"] = len([t for t in client.endpoints_s if t < entry["utterance_end_s"]])
+    return result
+
+
+def load_corpus(inputs):
+    entries = []
+    for path in inputs:
+        if path.lower().endswith(".json"):
+            with open(path, "r", encoding="utf-8") as f: manifest = json.load(f)
+            base = os.path.dirname(os.path.abspath(path))
+            for e in manifest:
+                e = dict(e); e["wav"] = e["wav"] if os.path.isabs(e["wav"]) else os.path.join(base, e["wav"])
+                entries.append(e)
+        else:
+            entries.append({"wav": path})
+    return entries
+
+
+def _mean(values):
+    values = [v for v in values if v is not None]
+    return round(sum(values) / len(values), 1) if values else None
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Replay WAVs through the audio pipeline and report latency/CPU.")
+    parser.add_argument("inputs", nargs="+", help="Corpus manifest(s) (.json) and/or WAV files")
+    parser.add_argument("--speed", type=float, default=0.0, help="Replay speed: 1.0 = real time, 0 = as fast as possible (default)")
+    parser.add_argument("--json", dest="json_out", help="Also write the per-file results to this file")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's own log output")
+    args = parser.parse_args()
+
+    entries = load_corpus(args.inputs)
+    quiet = contextlib.redirect_stdout(io.StringIO()) if not args.verbose else contextlib.nullcontext()
+    with quiet:
+        import main # Heavy import: initialises PyAudio, webrtcvad and the wake word model
+        results = [run_entry(main, e, args.speed) for e in entries]
+
+    print(f"Wake word active: {main.wake_word_active} | Local VAD: {main.LOCAL_VAD_ENABLED and main.WEBRTC_VAD_AVAILABLE} | speed: {args.speed or 'max'}\n")
+    for r in results:
+        line = f"{os.path.basename(r['wav']):<32} {r['audio_s']:>7.1f}s audio {r['wall_s']:>7.2f}s wall  dropped={r['dropped_frames']}"
+        if "wake_latency_ms" in r: line += f"  wake_latency={r['wake_latency_ms']} ms"
+        if "interrupt_latency_ms" in r: line += f"  interrupt_latency={r['interrupt_latency_ms']} ms (false={r['false_interrupts']})"
+        if "endpoint_latency_ms" in r: line += f"  endpoint_latency={r['endpoint_latency_ms']} ms (early={r['early_endpoints']})"
+        print(line)
+
+    stages = list(dict.fromkeys(s for r in results for s in r["stage_cpu_us"])) # Pipeline order
+    total_chunks = sum(r["chunks"] for r in results)
+    print(f"\nPer-stage CPU (mean us per chunk, {total_chunks} chunks):")
+    for stage in stages:
+        per_file = [(r["stage_cpu_us"][stage], r["chunks"]) for r in results if stage in r["stage_cpu_us"]]
+        weighted = sum(us * n for us, n in per_file) / max(sum(n for _, n in per_file), 1)
+        print(f"  {stage:<10} {weighted:>9.1f}")
+    wake_labelled = [r for r in results if "wake_latency_ms" in r]
+    barge_labelled = [r for r in results if "interrupt_latency_ms" in r]
+    if wake_labelled:
+        print(f"\nWake word: {sum(r['wake_latency_ms'] is not None for r in wake_labelled)}/{len(wake_labelled)} detected, "
+              f"mean latency {_mean(r['wake_latency_ms'] for r in wake_labelled)} ms")
+    if barge_labelled:
+        print(f"Barge-in: {sum(r['interrupt_latency_ms'] is not None for r in barge_labelled)}/{len(barge_labelled)} detected, "
+              f"mean latency {_mean(r['interrupt_latency_ms'] for r in barge_labelled)} ms, "
+              f"false interrupts {sum(r['false_interrupts'] for r in barge_labelled)}")
+    endpoint_labelled = [r for r in results if "endpoint_latency_ms" in r]
+    if endpoint_labelled:
+        print(f"Local endpoint: {sum(r['endpoint_latency_ms'] is not None for r in endpoint_labelled)}/{len(endpoint_labelled)} detected, "
+              f"mean latency {_mean(r['endpoint_latency_ms'] for r in endpoint_labelled)} ms, "
+              f"early endpoints {sum(r['early_endpoints'] for r in endpoint_labelled)}")
+    print(f"Dropped frames: {sum(r['dropped_frames'] for r in results)}")
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f: json.dump(results, f, indent=2)
+        print(f"Results written to {args.json_out}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,98 @@
+# bench_ulaw_input.py
+"""
+Compare the two OpenAI input paths for one coalesced append window:
+
+  pcm16     : 24 kHz PCM16 -> base64 append frame
+  g711_ulaw : 24 kHz PCM16 -> 8 kHz (StreamingResampler) -> u-law -> base64 append frame
+
+Reports CPU time per 30 ms mic chunk, payload size per second of audio, and the
+per-window latency (CPU + time to put the frame on an uplink of --uplink-kbps).
+Run from the repo root:  python Scripts/bench_ulaw_input.py [--seconds 60] [--uplink-kbps 512]
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from g711_codec import UlawInputEncoder, ulaw_decode # noqa: E402
+from ws_sender import build_append_frame # noqa: E402
+
+INPUT_RATE = 24000
+CHUNK_MS = 30
+CHUNK_SAMPLES = INPUT_RATE * CHUNK_MS // 1000
+
+
+def make_test_signal(seconds: float) -> np.ndarray:
+    """Speech-like test signal: a few harmonics with syllable-rate amplitude modulation plus noise."""
+    rng = np.random.default_rng(1234)
+    t = np.arange(int(seconds * INPUT_RATE)) / INPUT_RATE
+    f0 = 140 + 30 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(f0) / INPUT_RATE
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 12))
+    envelope = 0.5 * (1 + np.sin(2 * np.pi * 4 * t))
+    x = 0.3 * voiced * envelope + 0.01 * rng.standard_normal(len(t))
+    return (np.clip(x, -1, 1) * 32767).astype(np.int16)
+
+
+def run_path(chunks, window_chunks: int, encoder=None):
+    cpu_per_chunk = []
+    window_cpu = []
+    frame_bytes = []
+    payload_bytes = 0
+    pending = bytearray(); pending_cpu = 0.0
+    for i, chunk in enumerate(chunks):
+        t0 = time.perf_counter()
+        payload = encoder.process(chunk) if encoder else chunk
+        pending += payload
+        if (i + 1) % window_chunks == 0:
+            frame = build_append_frame(bytes(pending))
+            frame_bytes.append(len(frame)); payload_bytes += len(pending)
+            pending = bytearray()
+        dt = time.perf_counter() - t0
+        cpu_per_chunk.append(dt); pending_cpu += dt
+        if (i + 1) % window_chunks == 0:
+            window_cpu.append(pending_cpu); pending_cpu = 0.0
+    return np.array(cpu_per_chunk), np.array(window_cpu), np.array(frame_bytes), payload_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PCM16 vs G.711 u-law OpenAI input paths.")
+    parser.add_argument("--seconds", type=float, default=60.0)
+    parser.add_argument("--coalesce-ms", type=int, default=90, help="Audio per append frame (OPENAI_APPEND_COALESCE_MS)")
+    parser.add_argument("--uplink-kbps", type=float, default=512.0, help="Uplink bandwidth used for the transmit-time estimate")
+    args = parser.parse_args()
+
+    signal = make_test_signal(args.seconds)
+    chunks = [signal[i:i + CHUNK_SAMPLES].tobytes() for i in range(0, len(signal) - CHUNK_SAMPLES + 1, CHUNK_SAMPLES)]
+    window_chunks = max(1, args.coalesce_ms // CHUNK_MS)
+    audio_s = len(chunks) * CHUNK_MS / 1000.0
+
+    encoder = UlawInputEncoder(INPUT_RATE)
+    results = {"pcm16": run_path(chunks, window_chunks), "g711_ulaw": run_path(chunks, window_chunks, encoder)}
+
+    print(f"{len(chunks)} chunks ({audio_s:.1f}s audio), {window_chunks * CHUNK_MS} ms per append frame, uplink {args.uplink_kbps:.0f} kbps\n")
+    print(f"{'path':<10} {'cpu/chunk us (mean/p99)':>24} {'payload kbps':>13} {'frame bytes':>12} {'window latency ms (cpu+tx)':>27}")
+    for name, (cpu_chunk, cpu_window, frame_bytes, payload_bytes) in results.items():
+        tx_ms = frame_bytes * 8 / args.uplink_kbps # bits / (kbit/s) = ms
+        latency_ms = cpu_window * 1000 + tx_ms
+        print(f"{name:<10} {np.mean(cpu_chunk) * 1e6:>11.1f} / {np.percentile(cpu_chunk, 99) * 1e6:>9.1f} "
+              f"{payload_bytes * 8 / audio_s / 1000:>13.1f} {int(np.mean(frame_bytes)):>12d} {np.mean(latency_ms):>27.2f}")
+
+    # Quality of the u-law path against an ideal 8 kHz PCM16 reference
+    encoder.reset()
+    ulaw = np.frombuffer(b"".join(encoder.process(c) for c in chunks), dtype=np.uint8)
+    encoder.reset()
+    reference = encoder.resampler.process(np.concatenate([np.frombuffer(c, dtype=np.int16) for c in chunks])).astype(np.float64)
+    decoded = ulaw_decode(ulaw).astype(np.float64)
+    snr_db = 10 * np.log10(np.sum(reference ** 2) / max(np.sum((reference - decoded) ** 2), 1e-9))
+    rs = encoder.resampler
+    delay_ms = (rs.taps_per_phase * rs.up - 1) / 2 / (INPUT_RATE * rs.up) * 1000 # Linear-phase FIR group delay
+    print(f"\nu-law quantization SNR vs 8 kHz PCM16: {snr_db:.1f} dB; decimation filter delay: {delay_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
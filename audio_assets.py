@@ -0,0 +1,141 @@
+# audio_assets.py
+"""
+Decoded-PCM cache for static playback assets (UI sounds, fixed local prompts).
+
+Assets such as static/ding.mp3 are decoded once - to mono int16 at the player's
+sample rate - and written to `cache_dir` as .npy files. Later runs memory-map
+those files instead of decoding again, so startup stays cheap and playing an
+asset is just handing its samples to the player (PCMPlayer.play_asset).
+
+The cache file name includes a hash of the source path, size, mtime and target
+rate, so editing an asset or changing OUTPUT_RATE re-decodes it automatically.
+
+Decoders: .wav and .pcm (raw PCM16 at the target rate) need nothing extra;
+anything else (mp3, ogg, flac) uses soundfile if installed, then audioread.
+"""
+
+import hashlib
+import os
+import wave
+
+import numpy as np
+
+from audio_resampler import StreamingResampler
+
+try:
+    import soundfile as sf
+    SOUNDFILE_AVAILABLE = True
+except ImportError:
+    SOUNDFILE_AVAILABLE = False
+
+try:
+    import audioread
+    AUDIOREAD_AVAILABLE = True
+except ImportError:
+    AUDIOREAD_AVAILABLE = False
+
+
+def parse_asset_spec(spec: str, base_dir: str = "") -> dict:
+    """'ding=static/ding.mp3, chime=static/chime.wav' -> {name: path}. Relative paths are taken from base_dir."""
+    assets = {}
+    for entry in (spec or "").split(","):
+        name, sep, path = entry.partition("=")
+        name, path = name.strip(), path.strip()
+        if not sep or not name or not path: continue
+        assets[name] = path if os.path.isabs(path) or not base_dir else os.path.join(base_dir, path)
+    return assets
+
+
+class AudioAssetCache:
+    def __init__(self, cache_dir: str, sample_rate: int = 24000, log_fn=print):
+        self.cache_dir = cache_dir
+        self.sample_rate = sample_rate
+        self.log = log_fn
+        self._assets = {} # name -> read-only int16 array (memory-mapped)
+        self.stats = {"decoded": 0, "mapped": 0, "errors": 0}
+        try: os.makedirs(cache_dir, exist_ok=True)
+        except OSError as e: self.log(f"AudioAssetCache: Cannot create '{cache_dir}': {e}. Assets will be decoded every run.")
+
+    def names(self) -> list:
+        return list(self._assets)
+
+    def get(self, name: str):
+        """int16 samples of a loaded asset, or None."""
+        return self._assets.get(name)
+
+    def duration_ms(self, name: str) -> float:
+        samples = self._assets.get(name)
+        return 0.0 if samples is None else samples.size * 1000.0 / self.sample_rate
+
+    def load_all(self, assets: dict) -> int:
+        """Load every {name: path}; returns how many are available."""
+        return sum(self.load(name, path) is not None for name, path in assets.items())
+
+    def load(self, name: str, path: str):
+        try: st = os.stat(path)
+        except OSError as e:
+            self.stats["errors"] += 1
+            self.log(f"AudioAssetCache: Asset '{name}' not found at '{path}': {e}")
+            return None
+        key = hashlib.sha1(f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}|{self.sample_rate}".encode("utf-8")).hexdigest()[:16]
+        cache_path = os.path.join(self.cache_dir, f"{name}-{key}.npy")
+        try:
+            samples = np.load(cache_path, mmap_mode="r")
+            self.stats["mapped"] += 1
+        except (OSError, ValueError):
+            samples = self._decode_and_store(name, path, cache_path)
+            if samples is None: return None
+        self._assets[name] = samples
+        return samples
+
+    def _decode_and_store(self, name: str, path: str, cache_path: str):
+        try: samples = self._decode(path)
+        except Exception as e:
+            self.stats["errors"] += 1
+            self.log(f"AudioAssetCache: Could not decode '{path}': {e}")
+            return None
+        self.stats["decoded"] += 1
+        self.log(f"AudioAssetCache: Decoded '{name}' ({samples.size * 1000.0 / self.sample_rate:.0f} ms at {self.sample_rate} Hz).")
+        tmp_path = cache_path + ".tmp"
+        try:
+            with open(tmp_path, "wb") as f: np.save(f, samples)
+            os.replace(tmp_path, cache_path) # Readers never map a partial file
+            for stale in os.listdir(self.cache_dir): # Older decodes of the same asset
+                if stale.startswith(f"{name}-") and stale.endswith(".npy") and stale != os.path.basename(cache_path):
+                    os.remove(os.path.join(self.cache_dir, stale))
+            return np.load(cache_path, mmap_mode="r")
+        except OSError as e:
+            self.log(f"AudioAssetCache: Could not persist '{name}': {e}. Keeping it in memory.")
+            samples.flags.writeable = False
+            return samples
+
+    def _decode(self, path: str) -> np.ndarray:
+        """Mono int16 at self.sample_rate."""
+        ext = os.path.splitext(path)[1].lower()
+        if ext == ".pcm":
+            with open(path, "rb") as f: return np.frombuffer(f.read(), dtype=np.int16).copy()
+        if ext == ".wav":
+            with wave.open(path, "rb") as wf:
+                if wf.getsampwidth() != 2: raise ValueError(f"{wf.getsampwidth() * 8}-bit WAV not supported (PCM16 only)")
+                rate, channels = wf.getframerate(), wf.getnchannels()
+                frames = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+        elif SOUNDFILE_AVAILABLE:
+            data, rate = sf.read(path, dtype="int16", always_2d=True)
+            channels, frames = data.shape[1], data.reshape(-1)
+        elif AUDIOREAD_AVAILABLE:
+            with audioread.audio_open(path) as f:
+                rate, channels = f.samplerate, f.channels
+                frames = np.frombuffer(b"".join(f), dtype=np.int16)
+        else: raise RuntimeError("no decoder for this format (install soundfile or audioread)")
+        if channels > 1: # Downmix
+            frames = np.round(frames[:frames.size - frames.size % channels].reshape(-1, channels).mean(axis=1)).astype(np.int16)
+        return self._resample(frames, rate)
+
+    def _resample(self, samples: np.ndarray, rate: int) -> np.ndarray:
+        if rate == self.sample_rate or samples.size == 0: return samples.copy()
+        rs = StreamingResampler(rate, self.sample_rate)
+        delay = (rs.taps_per_phase * rs.up // 2) // rs.down # Filter group delay, in output samples
+        n_out = int(np.ceil(samples.size * rs.up / rs.down))
+        tail = np.zeros((delay + 1) * rs.down // rs.up + rs.taps_per_phase + rs.down, dtype=np.int16) # Flushes the filter
+        out = np.concatenate([rs.process(samples), rs.process(tail)])
+        return np.ascontiguousarray(out[delay:delay + n_out])
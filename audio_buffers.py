@@ -0,0 +1,229 @@
+# audio_buffers.py
+"""
+Buffers for the assistant's audio output path.
+
+PCMRingBuffer replaces the old `self.buffer += pcm_bytes` / `self.buffer[n:]`
+pattern in PCMPlayer, which re-copied the whole pending buffer for every chunk
+written to the device. Incoming PCM is copied once into a preallocated
+bytearray through a memoryview; read and write cursors wrap around it.
+"""
+
+import threading
+from collections import deque
+
+
+class PCMRingBuffer:
+    """
+    Thread-safe byte ring buffer for PCM audio.
+
+    Capacity is preallocated. If a write would overflow it, the buffer grows
+    (doubling) instead of dropping audio, since OpenAI can deliver a whole
+    response much faster than real time.
+    """
+
+    def __init__(self, capacity_bytes: int, bytes_per_second: int, frame_bytes: int = 2):
+        self.bytes_per_second = bytes_per_second
+        self.frame_bytes = frame_bytes # Reads are kept frame-aligned (int16 mono = 2 bytes)
+        self._lock = threading.Lock()
+        self._alloc(max(capacity_bytes, frame_bytes))
+        self.total_written_bytes = 0
+        self.total_read_bytes = 0
+        self.total_cleared_bytes = 0 # total_read_bytes + total_cleared_bytes is the consumed offset in write space
+        self.grow_count = 0
+
+    def _alloc(self, capacity_bytes: int):
+        self._buf = bytearray(capacity_bytes)
+        self._view = memoryview(self._buf)
+        self._capacity = capacity_bytes
+        self._read_pos = 0
+        self._write_pos = 0
+        self._size = 0
+
+    def _grow_locked(self, min_capacity: int):
+        new_capacity = self._capacity
+        while new_capacity < min_capacity:
+            new_capacity *= 2
+        pending = self._peek_locked(self._size)
+        self._alloc(new_capacity)
+        self._view[:len(pending)] = pending
+        self._write_pos = self._size = len(pending)
+        self.grow_count += 1
+
+    def _peek_locked(self, n: int) -> bytes:
+        n = min(n, self._size)
+        end = self._read_pos + n
+        if end <= self._capacity:
+            return bytes(self._view[self._read_pos:end])
+        first = self._capacity - self._read_pos
+        return bytes(self._view[self._read_pos:]) + bytes(self._view[:n - first])
+
+    # --- Producer side ---
+    def write(self, data) -> int:
+        src = memoryview(data).cast('B') # Slicing a memoryview copies nothing
+        n = len(src)
+        if n == 0: return 0
+        with self._lock:
+            if self._size + n > self._capacity:
+                self._grow_locked(self._size + n)
+            first = min(n, self._capacity - self._write_pos)
+            self._view[self._write_pos:self._write_pos + first] = src[:first]
+            if first < n:
+                self._view[:n - first] = src[first:]
+            self._write_pos = (self._write_pos + n) % self._capacity
+            self._size += n
+            self.total_written_bytes += n
+        return n
+
+    # --- Consumer side ---
+    def read(self, n: int) -> bytes:
+        """Remove and return up to n bytes (frame-aligned)."""
+        with self._lock:
+            n = min(n, self._size)
+            n -= n % self.frame_bytes
+            if n <= 0: return b""
+            out = self._peek_locked(n)
+            self._read_pos = (self._read_pos + n) % self._capacity
+            self._size -= n
+            self.total_read_bytes += n
+            return out
+
+    def clear(self) -> int:
+        """Drop everything buffered. Returns the number of bytes discarded."""
+        with self._lock:
+            dropped = self._size
+            self._read_pos = self._write_pos = self._size = 0
+            self.total_cleared_bytes += dropped
+            return dropped
+
+    # --- Depth queries ---
+    def __len__(self) -> int:
+        return self._size
+
+    def buffered_bytes(self) -> int:
+        return self._size
+
+    def buffered_ms(self) -> float:
+        if not self.bytes_per_second: return 0.0
+        return self._size * 1000.0 / self.bytes_per_second
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+
+class PreRollBuffer:
+    """
+    Rolling window of the most recent mic chunks (capture thread only, no locking).
+
+    Kept while listening for the wake word so that speech which started before
+    the detector fired can be sent to OpenAI in one batched append.
+    """
+
+    def __init__(self, max_ms: float, chunk_ms: float):
+        self.chunk_ms = chunk_ms
+        self.max_chunks = max(0, int(round(max_ms / chunk_ms))) if chunk_ms > 0 else 0
+        self._chunks = deque(maxlen=self.max_chunks or 1)
+
+    def push(self, chunk: bytes):
+        if self.max_chunks: self._chunks.append(chunk)
+
+    def drain(self) -> bytes:
+        """Return everything held (oldest first) and empty the window."""
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+    def clear(self):
+        self._chunks.clear()
+
+    def duration_ms(self) -> float:
+        return len(self._chunks) * self.chunk_ms
+
+
+class AdaptiveJitterBuffer:
+    """
+    Playout buffer for callback-mode output.
+
+    Sits on top of a PCMRingBuffer. Playback of a new stream only starts once
+    the buffered depth reaches target_ms (priming); the target adapts to the
+    measured jitter of delta inter-arrival times (RFC 3550 style estimator),
+    and is bumped after every underrun. pull() always returns exactly the
+    requested number of bytes, zero-padded when starved.
+    """
+
+    IDLE_GAP_MS = 1000.0 # Arrivals further apart than this start a new stream (no jitter sample)
+
+    def __init__(self, ring: PCMRingBuffer, min_ms: float = 60.0, max_ms: float = 400.0,
+                 initial_ms: float = 120.0, jitter_multiplier: float = 3.0, underrun_step_ms: float = 20.0):
+        self.ring = ring
+        self.min_ms = min_ms
+        self.max_ms = max_ms
+        self.jitter_multiplier = jitter_multiplier
+        self.underrun_step_ms = underrun_step_ms
+        self.target_ms = min(max(initial_ms, min_ms), max_ms)
+        self.jitter_ms = 0.0
+        self.priming = True # Emitting silence until target depth is reached
+        self.end_of_stream = False # Producer finished; play the tail without waiting for target
+        self.underruns = 0
+        self.overruns = 0 # Counted by the owner when its queue bound rejects audio
+        self._underrun_floor_ms = 0.0 # Extra depth learnt from underruns, decays slowly
+        self._last_arrival = None
+        self._last_duration_ms = 0.0
+        self._lock = threading.Lock()
+
+    def _update_target_locked(self):
+        target = self.min_ms + self.jitter_multiplier * self.jitter_ms + self._underrun_floor_ms
+        self.target_ms = min(max(target, self.min_ms), self.max_ms)
+
+    def on_arrival(self, num_bytes: int, now: float):
+        """Record a delta of num_bytes arriving at time `now` (seconds)."""
+        duration_ms = num_bytes * 1000.0 / self.ring.bytes_per_second
+        with self._lock:
+            if self._last_arrival is not None:
+                inter_arrival_ms = (now - self._last_arrival) * 1000.0
+                if inter_arrival_ms < self.IDLE_GAP_MS:
+                    # Deviation of the arrival spacing from the media spacing
+                    deviation_ms = abs(inter_arrival_ms - self._last_duration_ms)
+                    self.jitter_ms += (deviation_ms - self.jitter_ms) / 16.0
+                    self._underrun_floor_ms *= 0.995
+                    self._update_target_locked()
+            self._last_arrival = now
+            self._last_duration_ms = duration_ms
+            self.end_of_stream = False
+
+    def mark_end_of_stream(self):
+        with self._lock:
+            self.end_of_stream = True
+
+    def pull(self, n: int) -> bytes:
+        with self._lock:
+            if self.priming:
+                if self.ring.buffered_ms() >= self.target_ms or (self.end_of_stream and len(self.ring) > 0):
+                    self.priming = False
+                else:
+                    return bytes(n)
+            data = self.ring.read(n)
+            if len(data) < n:
+                if self.end_of_stream:
+                    if len(self.ring) == 0: # Drained normally; next audio is a new stream
+                        self.priming = True
+                        self.end_of_stream = False
+                        self._last_arrival = None
+                else:
+                    self.underruns += 1
+                    self._underrun_floor_ms = min(self._underrun_floor_ms + self.underrun_step_ms, self.max_ms)
+                    self._update_target_locked()
+                    self.priming = True # Re-buffer to the (raised) target before resuming
+                data += bytes(n - len(data))
+            return data
+
+    def reset(self):
+        with self._lock:
+            self.ring.clear()
+            self.priming = True
+            self.end_of_stream = False
+            self._last_arrival = None
+
+    def get_stats(self) -> dict:
+        return {"target_ms": round(self.target_ms, 1), "jitter_ms": round(self.jitter_ms, 1),
+                "underruns": self.underruns, "overruns": self.overruns, "priming": self.priming}
@@ -0,0 +1,123 @@
+# audio_replay.py
+"""
+Offline audio source for continuous_audio_pipeline.
+
+WavReplayStream has the subset of the PyAudio input stream API the pipeline
+uses (read / is_active / stop_stream / close), but plays a WAV file instead of
+a microphone. It can be paced at real time (speed=1.0), at N x real time, or
+as fast as possible (speed=0). When paced, a reader that falls further behind
+than the simulated device buffer loses frames, like a real overflowing mic
+stream; those are counted in `overflow_frames`.
+
+Select it for the whole app with AUDIO_INPUT_REPLAY_WAV=<path> (see
+main.get_input_stream), or pass one to continuous_audio_pipeline directly, as
+Scripts/bench_pipeline_replay.py does.
+
+StageTimer accumulates per-stage thread CPU time for the pipeline loop.
+"""
+
+import time
+import wave
+
+import numpy as np
+
+from audio_resampler import StreamingResampler
+
+
+def load_wav_pcm16(path: str, target_rate: int) -> np.ndarray:
+    """Read a PCM16 WAV as mono int16 at target_rate (channels averaged, resampled if needed)."""
+    with wave.open(path, "rb") as wf:
+        if wf.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit PCM WAV is supported (sample width {wf.getsampwidth()})")
+        channels, rate = wf.getnchannels(), wf.getframerate()
+        samples = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+    if rate != target_rate:
+        samples = StreamingResampler(rate, target_rate).process(np.concatenate([samples, np.zeros(rate // 10, dtype=np.int16)]))
+    return samples
+
+
+class WavReplayStream:
+    def __init__(self, wav_path: str, rate: int = 24000, frames_per_buffer: int = 720, speed: float = 1.0,
+                 device_buffer_chunks: int = 8, log_fn=print):
+        self.wav_path = wav_path
+        self.rate = rate
+        self.frames_per_buffer = frames_per_buffer
+        self.speed = max(0.0, float(speed)) # 0 = no pacing
+        self.device_buffer_frames = device_buffer_chunks * frames_per_buffer
+        self.log = log_fn
+        self._samples = load_wav_pcm16(wav_path, rate)
+        self._pos = 0
+        self._started_at = None
+        self._active = True
+        self.exhausted = False # Set once the whole file has been read; the pipeline stops on it
+        self.frames_read = 0
+        self.overflow_frames = 0
+        self.log(f"WavReplayStream: '{wav_path}' ({len(self._samples) / rate:.1f}s at {rate} Hz, speed {self.speed or 'max'}).")
+
+    @property
+    def position_s(self) -> float:
+        """Audio time of the end of the last chunk read."""
+        return self._pos / self.rate
+
+    @property
+    def duration_s(self) -> float:
+        return len(self._samples) / self.rate
+
+    def read(self, num_frames: int, exception_on_overflow: bool = False) -> bytes:
+        if self._pos >= len(self._samples):
+            self._active = False; self.exhausted = True
+            return b""
+        if self.speed > 0:
+            now = time.perf_counter()
+            if self._started_at is None: self._started_at = now - self._pos / self.rate / self.speed
+            due = self._started_at + (self._pos + num_frames) / self.rate / self.speed
+            if now < due:
+                time.sleep(due - now)
+            else:
+                # Reader is late: a device keeps only device_buffer_frames; older audio is lost
+                late_frames = int((now - due) * self.rate * self.speed)
+                if late_frames > self.device_buffer_frames:
+                    lost = (late_frames - self.device_buffer_frames) // num_frames * num_frames
+                    lost = min(lost, len(self._samples) - self._pos)
+                    if lost and exception_on_overflow: raise IOError("Input overflowed")
+                    self._pos += lost; self.overflow_frames += lost
+        chunk = self._samples[self._pos:self._pos + num_frames]
+        self._pos += len(chunk); self.frames_read += len(chunk)
+        return chunk.tobytes()
+
+    def is_active(self) -> bool:
+        return self._active
+
+    def start_stream(self):
+        self._active = not self.exhausted
+
+    def stop_stream(self):
+        self._active = False
+
+    def close(self):
+        self._active = False
+
+
+class StageTimer:
+    """Per-stage thread CPU time: call start() at the top of each loop iteration, lap(name) after each stage."""
+
+    def __init__(self):
+        self.cpu_s = {}
+        self.calls = {}
+        self._last = None
+
+    def start(self):
+        self._last = time.thread_time()
+
+    def lap(self, stage: str):
+        now = time.thread_time()
+        if self._last is not None:
+            self.cpu_s[stage] = self.cpu_s.get(stage, 0.0) + (now - self._last)
+            self.calls[stage] = self.calls.get(stage, 0) + 1
+        self._last = now
+
+    def summary_us(self) -> dict:
+        """Mean CPU microseconds per call for each stage."""
+        return {stage: self.cpu_s[stage] * 1e6 / self.calls[stage] for stage in self.cpu_s}
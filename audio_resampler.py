@@ -0,0 +1,138 @@
+# audio_resampler.py
+"""
+Streaming polyphase resampler for the mic hot path.
+
+The mic delivers 24 kHz PCM16 in 30 ms chunks, while webrtcvad and openWakeWord
+both want 16 kHz. Instead of running an FFT resample (scipy.signal.resample) per
+consumer per chunk, main.py runs one StreamingResampler per chunk and shares its
+16 kHz output between the VAD and the wake word detector.
+
+The filter is a Kaiser-windowed sinc (same design as scipy.signal.resample_poly),
+split into its polyphase branches once at construction time. Filter history is
+carried between calls, so consecutive chunks join without edge artifacts.
+Work and output buffers are preallocated and reused across calls (see
+dsp_kernels); with reuse_output=True a call allocates no sample arrays at all.
+Only NumPy is required.
+"""
+
+from math import gcd
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from dsp_kernels import Scratch, float32_to_int16
+
+
+def design_polyphase_taps(up: int, down: int, half_len_factor: int = 10, kaiser_beta: float = 5.0) -> np.ndarray:
+    """Low-pass FIR for rational resampling by up/down (gain = up, like resample_poly)."""
+    max_rate = max(up, down)
+    half_len = half_len_factor * max_rate
+    num_taps = 2 * half_len + 1
+    cutoff = 1.0 / max_rate  # Relative to the Nyquist of the upsampled rate
+    n = np.arange(num_taps) - half_len
+    taps = cutoff * np.sinc(cutoff * n) * np.kaiser(num_taps, kaiser_beta)
+    taps *= up / taps.sum()
+    return taps.astype(np.float32)
+
+
+class StreamingResampler:
+    """
+    Stateful rational resampler (default 24000 Hz -> 16000 Hz, i.e. 2/3).
+
+    process() accepts int16 samples (bytes or ndarray) of any length and returns
+    the int16 samples that are fully determined so far. Input that does not fill
+    a whole polyphase period is kept and used on the next call.
+
+    With reuse_output=True the returned array is a view of an internal buffer that
+    is overwritten by the next process() call; copy it if it must outlive that.
+    """
+
+    def __init__(self, input_rate: int = 24000, output_rate: int = 16000, reuse_output: bool = False):
+        g = gcd(input_rate, output_rate)
+        self.input_rate = input_rate
+        self.output_rate = output_rate
+        self.up = output_rate // g
+        self.down = input_rate // g
+
+        taps = design_polyphase_taps(self.up, self.down)
+        # Pad so every polyphase branch has the same number of taps
+        pad = (-len(taps)) % self.up
+        if pad:
+            taps = np.concatenate([taps, np.zeros(pad, dtype=np.float32)])
+        self.taps_per_phase = len(taps) // self.up
+        # Branch p holds taps[p::up]; reversed so a window of input can be dotted directly
+        self._phase_taps = [np.ascontiguousarray(taps[p::self.up][::-1]) for p in range(self.up)]
+
+        # For each output within one period (up outputs per down inputs): which branch and
+        # which input offset (relative to the period start) its newest input sample sits at.
+        self._period_plan = []
+        for m in range(self.up):
+            n = m * self.down  # Position in the virtual upsampled stream
+            phase = n % self.up
+            self._period_plan.append((phase, (n - phase) // self.up))
+
+        self._history_len = self.taps_per_phase - 1
+        self.reuse_output = reuse_output
+        self._scratch = Scratch()
+        self._work = np.zeros(0, dtype=np.float32) # History + new input, grown on demand
+        self._windows = None # sliding_window_view of self._work, rebuilt only when _work is reallocated
+        # Carried input: filter history plus any partial period (< down samples)
+        self._pending = np.zeros(self._history_len + self.down, dtype=np.float32)
+        self.reset()
+
+    def reset(self):
+        """Forget filter history (use after a gap in the input stream)."""
+        self._pending[:self._history_len] = 0.0
+        self._pending_len = self._history_len
+
+    def output_length_for(self, num_input_samples: int) -> int:
+        """Number of output samples produced for an input of this length (given aligned state)."""
+        return (num_input_samples // self.down) * self.up
+
+    def process(self, audio) -> np.ndarray:
+        if isinstance(audio, (bytes, bytearray, memoryview)):
+            audio = np.frombuffer(audio, dtype=np.int16)
+        if audio.size == 0:
+            return np.zeros(0, dtype=np.int16)
+
+        total = self._pending_len + audio.size
+        if self._work.size < total:
+            self._work = np.zeros(max(total, 4096), dtype=np.float32)
+            self._windows = sliding_window_view(self._work, self.taps_per_phase)  # View, no copy
+        buf = self._work[:total]
+        buf[:self._pending_len] = self._pending[:self._pending_len]
+        buf[self._pending_len:] = audio # int16 -> float32 in place
+        periods = (total - self._history_len) // self.down
+        if periods <= 0:
+            self._pending[:total] = buf
+            self._pending_len = total
+            return np.zeros(0, dtype=np.int16)
+
+        windows = self._windows # Rows past `total` hold stale input but are never indexed
+        consumed = periods * self.down
+        n_out = periods * self.up
+        out = self._scratch.get("out_f32", n_out, np.float32)
+        for m, (phase, offset) in enumerate(self._period_plan):
+            np.matmul(windows[offset:offset + consumed:self.down], self._phase_taps[phase], out=out[m::self.up])
+
+        self._pending_len = total - consumed
+        self._pending[:self._pending_len] = buf[consumed:]
+        out_i16 = float32_to_int16(out, self._scratch.get("out_i16", n_out, np.int16), self._scratch, scale=1.0, lo=-32768.0, hi=32767.0)
+        return out_i16 if self.reuse_output else out_i16.copy()
+
+
+# Example usage when run directly
+if __name__ == "__main__":
+    import time
+    rs = StreamingResampler(24000, 16000)
+    print(f"StreamingResampler: up={rs.up}, down={rs.down}, taps/phase={rs.taps_per_phase}")
+    t = np.arange(24000) / 24000.0
+    tone = (np.sin(2 * np.pi * 440 * t) * 10000).astype(np.int16)
+    chunks = [rs.process(tone[i:i + 720]) for i in range(0, len(tone), 720)]
+    out = np.concatenate(chunks)
+    print(f"1s of 24 kHz audio -> {len(out)} samples at 16 kHz")
+    rs.reset()
+    start = time.perf_counter()
+    for _ in range(1000):
+        rs.process(tone[:720])
+    print(f"Per 30 ms chunk: {(time.perf_counter() - start) * 1000:.3f} us")
@@ -0,0 +1,252 @@
+# audio_tsm.py
+"""
+Streaming WSOLA time-scale modification for assistant playback.
+
+Replaces the old per-window `pytsmod.wsola` calls in openai_client.py. Those
+stretched independent 8-chunk windows with no shared state (audible clicks at
+every seam) and ran synchronously on the websocket thread.
+
+StreamingWSOLA keeps its input history, analysis position and overlap-add tail
+across calls, so the output is the same as stretching the whole response in one
+go. TSMWorker runs it on its own thread and hands the result to the player.
+"""
+
+import queue
+import threading
+import time
+
+import numpy as np
+
+import dsp_kernels
+
+
+class StreamingWSOLA:
+    """
+    Waveform-similarity overlap-add with carried state.
+
+    speed > 1.0 plays faster (shorter output). process() returns the output
+    samples that can no longer change; flush() stretches whatever remains and
+    returns the tail, then resets for the next stream.
+
+    Input history and output live in preallocated buffers that only grow when a
+    call needs more than they hold: the history is compacted in place instead of
+    concatenated, and frames overlap-add straight into the output buffer. With
+    reuse_output=True the returned array is a view of an internal buffer that is
+    valid until the next call (TSMWorker copies it into bytes right away).
+    """
+
+    def __init__(self, speed: float, sample_rate: int = 24000, frame_ms: float = 40.0, tolerance_ms: float = 10.0,
+                 reuse_output: bool = False):
+        if speed <= 0: raise ValueError("speed must be > 0")
+        self.speed = speed
+        self.sample_rate = sample_rate
+        self.frame_len = int(sample_rate * frame_ms / 1000) & ~1 # Even, so hop = frame/2 exactly
+        self.syn_hop = self.frame_len // 2
+        self.ana_hop = self.syn_hop * speed
+        self.tolerance = int(sample_rate * tolerance_ms / 1000)
+        self.reuse_output = reuse_output
+        # Periodic Hann: overlapping at 50% sums to exactly 1
+        self.window = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(self.frame_len) / self.frame_len)).astype(np.float32)
+        self._scratch = dsp_kernels.Scratch() # Windowed frame and int16 conversion buffers, reused across calls
+        self._in_buf = np.zeros(4 * (self.frame_len + self.tolerance) + sample_rate // 5, dtype=np.float32) # History (grows on demand)
+        self._out_buf = np.zeros(8 * self.frame_len, dtype=np.float32) # Output of the current call (grows on demand)
+        self._out_acc = np.zeros(self.frame_len, dtype=np.float32) # Overlap-add accumulator
+        self.reset()
+
+    def reset(self):
+        # Input starts with syn_hop zeros so the first real sample gets a full window sum;
+        # the matching syn_hop output samples are skipped in _emit().
+        self._in_buf[:self.syn_hop] = 0.0
+        self._in_off = 0 # Index in _in_buf of absolute input sample _in_start
+        self._in_start = 0 # Absolute input index of the oldest sample still kept
+        self._in_total = self.syn_hop # Absolute input samples received (incl. lead-in)
+        self._real_in = 0 # Real (non-padding) input samples received
+        self._frame_idx = 0
+        self._prev_pos = None # Absolute input position used for the previous frame
+        self._out_acc[:] = 0.0
+        self._out_n = 0
+        self._real_out = 0 # Output samples emitted after the skipped lead-in
+        self._skip = self.syn_hop
+
+    def _history(self) -> np.ndarray:
+        return self._in_buf[self._in_off:self._in_off + self._in_total - self._in_start]
+
+    def _append_input(self, n: int) -> np.ndarray:
+        """Make room for n more input samples and return the (unfilled) view they go into."""
+        kept = self._in_total - self._in_start
+        if self._in_off + kept + n > self._in_buf.size:
+            if kept + n <= self._in_buf.size: # Compact: move the kept history to the front
+                self._in_buf[:kept] = self._in_buf[self._in_off:self._in_off + kept]
+            else:
+                grown = np.empty(max(2 * self._in_buf.size, kept + n), dtype=np.float32)
+                grown[:kept] = self._in_buf[self._in_off:self._in_off + kept]
+                self._in_buf = grown
+            self._in_off = 0
+        self._in_total += n
+        return self._in_buf[self._in_off + kept:self._in_off + kept + n]
+
+    def _can_process_frame(self, padded_end: bool) -> bool:
+        nominal = int(round(self._frame_idx * self.ana_hop))
+        need = nominal + self.tolerance + self.frame_len
+        if self._prev_pos is not None:
+            need = max(need, self._prev_pos + self.syn_hop + self.frame_len)
+        return need <= self._in_total or (padded_end and nominal < self.syn_hop + self._real_in)
+
+    def _process_frame(self):
+        history = self._history()
+        nominal = int(round(self._frame_idx * self.ana_hop))
+        if self._prev_pos is None:
+            pos = nominal
+        else:
+            # Pick the candidate around `nominal` most similar to the natural continuation
+            # of the previous frame
+            natural = self._prev_pos + self.syn_hop - self._in_start
+            template = history[natural:natural + self.frame_len]
+            lo = max(nominal - self.tolerance, self._in_start)
+            hi = min(nominal + self.tolerance, self._in_total - self.frame_len)
+            if hi > lo and len(template) == self.frame_len:
+                region = history[lo - self._in_start:hi - self._in_start + self.frame_len]
+                corr = np.correlate(region, template, mode="valid")
+                pos = lo + int(np.argmax(corr))
+            else:
+                pos = min(max(nominal, lo), max(hi, lo))
+        frame = history[pos - self._in_start:pos - self._in_start + self.frame_len]
+        windowed = self._scratch.get("frame", self.frame_len, np.float32)
+        n = len(frame)
+        np.multiply(frame, self.window[:n], out=windowed[:n])
+        windowed[n:] = 0.0
+        self._out_acc += windowed
+        self._prev_pos = pos
+        self._frame_idx += 1
+
+    def _emit(self, n: int):
+        """Move the first n accumulator samples (n is syn_hop or frame_len) to the output buffer."""
+        drop = min(self._skip, n); self._skip -= drop
+        keep = n - drop
+        if self._out_n + keep > self._out_buf.size:
+            grown = np.empty(max(2 * self._out_buf.size, self._out_n + keep), dtype=np.float32)
+            grown[:self._out_n] = self._out_buf[:self._out_n]
+            self._out_buf = grown
+        self._out_buf[self._out_n:self._out_n + keep] = self._out_acc[drop:n]
+        self._out_n += keep
+        self._real_out += keep
+        if n < self.frame_len: self._out_acc[:self.frame_len - n] = self._out_acc[n:] # n >= frame_len/2: halves don't overlap
+        self._out_acc[self.frame_len - n:] = 0.0
+
+    def _trim_input(self):
+        keep_from = int(round(self._frame_idx * self.ana_hop)) - self.tolerance
+        if self._prev_pos is not None:
+            keep_from = min(keep_from, self._prev_pos + self.syn_hop)
+        drop = keep_from - self._in_start
+        if drop > 0:
+            self._in_off += drop
+            self._in_start += drop
+
+    def _run(self, padded_end: bool):
+        while self._can_process_frame(padded_end):
+            self._process_frame()
+            self._emit(self.syn_hop) # Frame k fixes output [k*hop, (k+1)*hop)
+        self._trim_input()
+
+    def process(self, samples_int16: np.ndarray) -> np.ndarray:
+        dsp_kernels.int16_to_float32(samples_int16, self._append_input(samples_int16.size))
+        self._real_in += samples_int16.size
+        self._out_n = 0
+        self._run(padded_end=False)
+        return self._to_int16(self._out_buf[:self._out_n])
+
+    def flush(self) -> np.ndarray:
+        target_len = int(round(self._real_in / self.speed)) # Total output this stream should produce
+        emitted_before = self._real_out
+        self._append_input(self.frame_len + self.tolerance)[:] = 0.0 # Zero padding so the last frames are complete
+        self._out_n = 0
+        self._run(padded_end=True)
+        self._emit(self.frame_len) # Remaining overlap-add accumulator
+        out = self._to_int16(self._out_buf[:min(self._out_n, max(0, target_len - emitted_before))])
+        self.reset()
+        return out
+
+    def _to_int16(self, x: np.ndarray) -> np.ndarray:
+        out = dsp_kernels.float32_to_int16(x, self._scratch.get("out_i16", x.size, np.int16), self._scratch)
+        return out if self.reuse_output else out.copy()
+
+
+class TSMWorker:
+    """
+    Runs StreamingWSOLA on its own thread so the websocket thread only enqueues.
+
+    submit() queues decoded PCM, flush() stretches the remainder of the current
+    response and then flushes the player, clear() drops everything (barge-in).
+    The item_id passed to submit() is forwarded to player.play() so the player's
+    playback clock can attribute the stretched audio to its assistant item.
+    """
+
+    _FLUSH = object()
+
+    def __init__(self, speed: float, player, log_fn=print, sample_rate: int = 24000):
+        self.engine = StreamingWSOLA(speed, sample_rate=sample_rate, reuse_output=True) # Output is copied by tobytes()
+        self.player = player
+        self.log = log_fn
+        self._queue = queue.Queue()
+        self._generation = 0 # Bumped by clear(); queued items from older generations are dropped
+        self._engine_gen = 0
+        self._last_item_id = None # Item the engine's buffered tail belongs to (worker thread only)
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="TSMWorker", daemon=True)
+        self._thread.start()
+
+    def submit(self, pcm_bytes: bytes, item_id=None):
+        with self._lock: gen = self._generation
+        self._queue.put((gen, pcm_bytes, item_id))
+
+    def flush(self):
+        with self._lock: gen = self._generation
+        self._queue.put((gen, self._FLUSH, None))
+
+    def clear(self):
+        with self._lock: self._generation += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self._queue.put((None, None, None))
+
+    def wait_until_idle(self, timeout_s: float = 5.0) -> bool:
+        """Wait until every queued item (incl. a pending flush) has reached the player."""
+        deadline = time.time() + timeout_s
+        while self._queue.unfinished_tasks:
+            if time.time() >= deadline: return False
+            time.sleep(0.01)
+        return True
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            gen, item, item_id = self._queue.get()
+            try: self._handle(gen, item, item_id)
+            finally: self._queue.task_done()
+            if item is None: break
+
+    def _handle(self, gen, item, item_id=None):
+        if item is None: return
+        with self._lock: current = self._generation
+        if self._engine_gen != current: # A clear() happened: discard engine state
+            self.engine.reset(); self._engine_gen = current
+        if gen != current: return
+        try:
+            if item is self._FLUSH:
+                out = self.engine.flush()
+                if self._is_current(gen):
+                    if out.size and self.player: self.player.play(out.tobytes(), item_id=self._last_item_id)
+                    if self.player: self.player.flush()
+            else:
+                self._last_item_id = item_id
+                out = self.engine.process(np.frombuffer(item, dtype=np.int16))
+                if out.size and self.player and self._is_current(gen): self.player.play(out.tobytes(), item_id=item_id)
+        except Exception as e_tsm:
+            self.log(f"ERROR during streaming TSM: {e_tsm}. Playing audio unstretched.")
+            self.engine.reset()
+            if self.player and item is not self._FLUSH and self._is_current(gen): self.player.play(item, item_id=item_id)
+
+    def _is_current(self, gen) -> bool:
+        # Re-checked after the DSP call so output computed before a barge-in is not played
+        with self._lock: return gen == self._generation
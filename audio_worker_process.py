@@ -0,0 +1,177 @@
+# audio_worker_process.py
+"""
+Optional out-of-process wake word + VAD worker.
+
+In-process, wake word inference and webrtcvad share the GIL with the websocket
+thread, tool threads and the player; a long on_message burst can push the 30 ms
+capture loop past its deadline (and vice versa). With AUDIO_WORKER_PROCESS=true,
+continuous_audio_pipeline instead:
+
+  - writes each 16 kHz chunk into a fixed-slot ring in multiprocessing.shared_memory
+    (one copy, into the slot) and posts a semaphore,
+  - the worker process reads the slot through a NumPy view (no copy) and runs
+    WakeWordDetector and/or webrtcvad on it, as flagged per slot,
+  - results ("vad", seq, [sub-frame decisions]) / ("wake", seq, model_name) come back over a
+    multiprocessing Pipe, which the pipeline drains without blocking.
+
+Results therefore arrive one capture chunk (30 ms) later than in-process.
+The worker loads its own WakeWordDetector, so the model is held in memory twice.
+With the "spawn" start method (Windows/macOS) the child also re-imports main.py's
+top-level setup; the feature is intended for Linux (fork).
+"""
+
+import multiprocessing as mp
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import dsp_kernels
+
+FLAG_VAD = 1
+FLAG_WAKE_WORD = 2
+_HEADER_BYTES = 64 # [0] = next sequence number to be written (uint64)
+
+
+def _slot_dtype(max_samples: int) -> np.dtype:
+    return np.dtype([("seq", "<u8"), ("flags", "<u4"), ("n", "<u4"), ("pcm", "<i2", (max_samples,))])
+
+
+def _ring_views(buf, num_slots: int, max_samples: int):
+    header = np.ndarray((1,), dtype="<u8", buffer=buf, offset=0)
+    slots = np.ndarray((num_slots,), dtype=_slot_dtype(max_samples), buffer=buf, offset=_HEADER_BYTES)
+    return header, slots
+
+
+class AudioWorkerProcess:
+    """Main-process side: owns the shared ring, the worker process and the result pipe."""
+
+    def __init__(self, vad_config: dict, num_slots: int = 64, max_samples: int = 960, log_fn=print):
+        self.num_slots = num_slots
+        self.max_samples = max_samples
+        self.vad_config = vad_config # mode, sample_rate, subframe_samples, volume_factor, enabled
+        self.log = log_fn
+        size = _HEADER_BYTES + num_slots * _slot_dtype(max_samples).itemsize
+        self._shm = shared_memory.SharedMemory(create=True, size=size)
+        self._header, self._slots = _ring_views(self._shm.buf, num_slots, max_samples)
+        self._header[0] = 0
+        self._write_seq = 0
+        self._sem = mp.Semaphore(0)
+        self._conn, child_conn = mp.Pipe(duplex=True)
+        self._proc = mp.Process(target=_worker_main, name="AudioWorkerProcess", daemon=True,
+                                args=(self._shm.name, num_slots, max_samples, self._sem, child_conn, vad_config))
+        self._proc.start()
+        self.worker_stats = {}
+        self._pipe_closed = False
+        self._stopping = False
+        self.log(f"AudioWorkerProcess: Started pid {self._proc.pid} (ring {num_slots} x {max_samples} samples, shm '{self._shm.name}').")
+
+    def submit(self, pcm16k: np.ndarray, run_vad: bool, run_wake_word: bool) -> int:
+        seq = self._write_seq
+        idx = seq % self.num_slots
+        n = min(len(pcm16k), self.max_samples)
+        self._slots["pcm"][idx, :n] = pcm16k[:n]
+        self._slots["n"][idx] = n
+        self._slots["flags"][idx] = (FLAG_VAD if run_vad else 0) | (FLAG_WAKE_WORD if run_wake_word else 0)
+        self._slots["seq"][idx] = seq
+        self._write_seq = seq + 1
+        self._header[0] = self._write_seq # Published after the slot is complete; the semaphore orders it
+        self._sem.release()
+        return seq
+
+    def poll_results(self) -> list:
+        results = []
+        if self._pipe_closed: return results
+        try:
+            while self._conn.poll():
+                msg = self._conn.recv()
+                if msg[0] == "stats": self.worker_stats = msg[1]
+                else: results.append(msg)
+        except (EOFError, OSError):
+            self._pipe_closed = True
+            if not self._stopping: self.log("AudioWorkerProcess: Result pipe closed unexpectedly.")
+        return results
+
+    def reset_wake_word(self):
+        try: self._conn.send(("reset_ww",))
+        except (OSError, BrokenPipeError) as e: self.log(f"AudioWorkerProcess: Could not send reset: {e}")
+
+    def is_alive(self) -> bool:
+        return self._proc.is_alive()
+
+    def stop(self, timeout_s: float = 3.0):
+        self._stopping = True
+        try:
+            self._conn.send(("stop",)); self._sem.release()
+            deadline = time.time() + timeout_s
+            while time.time() < deadline and self._proc.is_alive():
+                self.poll_results(); time.sleep(0.02)
+            self.poll_results()
+        except (OSError, BrokenPipeError): pass
+        if self._proc.is_alive(): self._proc.terminate()
+        self._proc.join(timeout=timeout_s)
+        del self._header, self._slots # Views must be released before the segment is closed
+        self._shm.close()
+        try: self._shm.unlink()
+        except FileNotFoundError: pass
+        self.log(f"AudioWorkerProcess: Stopped. Worker stats: {self.worker_stats}")
+
+
+def _worker_main(shm_name, num_slots, max_samples, sem, conn, vad_config):
+    """Worker process entry point (top-level so it works with the spawn start method)."""
+    shm = shared_memory.SharedMemory(name=shm_name) # Unlinked by the creating process in stop()
+    header, slots = _ring_views(shm.buf, num_slots, max_samples)
+
+    from wake_word_detector import WakeWordDetector
+    detector = WakeWordDetector(sample_rate=16000)
+    vad = None
+    if vad_config.get("enabled"):
+        try:
+            import webrtcvad
+            vad = webrtcvad.Vad(); vad.set_mode(vad_config.get("mode", 0))
+        except Exception as e_vad: print(f"AudioWorkerProcess: webrtcvad unavailable in worker: {e_vad}")
+    subframe = vad_config.get("subframe_samples", 160) # 10 ms at 16 kHz
+    vad_rate = vad_config.get("sample_rate", 16000)
+    gain_q15 = dsp_kernels.gain_to_q15(vad_config.get("volume_factor", 0.20))
+    scratch = dsp_kernels.Scratch()
+
+    stats = {"frames": 0, "dropped_frames": 0, "wake_detections": 0, "vad_frames": 0, "cpu_s": 0.0}
+    read_seq = 0
+    pcm = None
+    running = True
+    while running:
+        while conn.poll():
+            cmd = conn.recv()
+            if cmd[0] == "reset_ww": detector.reset()
+            elif cmd[0] == "stop": running = False
+        if not running: break
+        if not sem.acquire(timeout=0.2): continue
+        write_seq = int(header[0])
+        if write_seq - read_seq > num_slots: # Producer lapped us; those slots are overwritten
+            stats["dropped_frames"] += write_seq - read_seq - num_slots
+            read_seq = write_seq - num_slots
+        while read_seq < write_seq:
+            idx = read_seq % num_slots
+            t0 = time.process_time()
+            flags = int(slots["flags"][idx]); n = int(slots["n"][idx])
+            pcm = slots["pcm"][idx, :n] # View into shared memory
+            if flags & FLAG_WAKE_WORD and detector.process_audio(pcm):
+                stats["wake_detections"] += 1
+                conn.send(("wake", read_seq, detector.last_detected_model or detector.wake_word_model_name))
+            if flags & FLAG_VAD and vad is not None:
+                scaled = dsp_kernels.apply_gain_q15(pcm, gain_q15, scratch)
+                decisions = []
+                for start in range(0, n - subframe + 1, subframe):
+                    try: decisions.append(vad.is_speech(scaled[start:start + subframe].tobytes(), vad_rate))
+                    except Exception: decisions.append(False)
+                stats["vad_frames"] += 1
+                conn.send(("vad", read_seq, decisions))
+            if int(slots["seq"][idx]) != read_seq: stats["dropped_frames"] += 1 # Overwritten while we read it
+            stats["frames"] += 1
+            stats["cpu_s"] += time.process_time() - t0
+            read_seq += 1
+    stats["cpu_s"] = round(stats["cpu_s"], 3)
+    try: conn.send(("stats", stats))
+    except Exception: pass
+    del header, slots, pcm
+    shm.close()
@@ -0,0 +1,102 @@
+# barge_in_detector.py
+"""
+Two-stage local barge-in detector.
+
+The old check in continuous_audio_pipeline needed 25 consecutive 30 ms webrtcvad
+hits (~750 ms) before interrupting the assistant, and resampled + ran VAD on
+every frame even in total silence.
+
+Stage 1 - energy gate: RMS of the raw 24 kHz chunk against
+max(gate_dbfs, noise_floor + margin_db). The floor tracks the mic level while
+the assistant is talking (rises slowly, falls fast, frozen while speech is
+being counted), so the assistant's own playback leaking into the mic raises
+the gate instead of triggering; the user has to be clearly louder than the
+echo. Frames below the gate skip the resampler and VAD entirely.
+
+Stage 2 - sub-frame VAD: the 16 kHz chunk is split into 10 ms sub-frames for
+webrtcvad. Voiced sub-frames accumulate speech time; unvoiced ones only reset it
+after `hangover_ms`, so short dips inside a word don't restart the count. The
+interrupt fires at `min_speech_ms` of accumulated speech.
+"""
+
+import numpy as np
+
+import dsp_kernels
+
+
+class BargeInDetector:
+    def __init__(self, vad, sample_rate: int = 16000, subframe_ms: int = 10, min_speech_ms: float = 300.0,
+                 hangover_ms: float = 90.0, gate_dbfs: float = -45.0, gate_margin_db: float = 9.0,
+                 volume_factor: float = 0.20, floor_rise_alpha: float = 0.02, floor_fall_alpha: float = 0.2):
+        self.vad = vad # webrtcvad.Vad (or anything with is_speech(bytes, rate)); None disables stage 2
+        self.sample_rate = sample_rate
+        self.subframe_ms = subframe_ms
+        self.subframe_samples = int(sample_rate * subframe_ms / 1000)
+        self.min_speech_ms = min_speech_ms
+        self.hangover_ms = hangover_ms
+        self.gate_dbfs = gate_dbfs
+        self.gate_margin_db = gate_margin_db
+        self.volume_factor = volume_factor # Same attenuation the old 30 ms check applied before VAD
+        self._gain_q15 = dsp_kernels.gain_to_q15(volume_factor)
+        self._scratch = dsp_kernels.Scratch()
+        self.floor_rise_alpha = floor_rise_alpha
+        self.floor_fall_alpha = floor_fall_alpha
+        self.noise_floor_db = gate_dbfs - gate_margin_db # Starts at the absolute gate; learnt from there
+        self.stats = {"chunks": 0, "gated_out": 0, "vad_subframes": 0, "voiced_subframes": 0, "triggers": 0}
+        self.reset()
+
+    def reset(self):
+        """Forget accumulated speech (new assistant turn, after a trigger, or after a gap)."""
+        self.speech_ms = 0.0
+        self.silence_ms = 0.0
+
+    def gate_threshold_db(self) -> float:
+        return max(self.gate_dbfs, self.noise_floor_db + self.gate_margin_db)
+
+    # --- Stage 1 ---
+    def gate(self, samples_int16: np.ndarray, chunk_ms: float) -> bool:
+        """True if the chunk is loud enough for stage 2. A closed gate counts as silence."""
+        self.stats["chunks"] += 1
+        level_db = dsp_kernels.rms_dbfs(samples_int16, self._scratch)
+        is_open = level_db >= self.gate_threshold_db()
+        if self.speech_ms == 0: self._update_floor(level_db) # Don't learn the user's own speech as floor
+        if is_open: return True
+        self.stats["gated_out"] += 1
+        self._accumulate([False] * max(1, int(round(chunk_ms / self.subframe_ms))))
+        return False
+
+    def _update_floor(self, level_db: float):
+        alpha = self.floor_rise_alpha if level_db > self.noise_floor_db else self.floor_fall_alpha
+        self.noise_floor_db += alpha * (level_db - self.noise_floor_db)
+
+    # --- Stage 2 ---
+    def process_16k(self, samples_16k: np.ndarray) -> bool:
+        """Run sub-frame VAD on a gated-open chunk. Returns True when a barge-in should fire."""
+        if self.vad is None or samples_16k is None or samples_16k.size == 0: return False
+        scaled = dsp_kernels.apply_gain_q15(samples_16k, self._gain_q15, self._scratch)
+        decisions = []
+        for start in range(0, len(scaled) - self.subframe_samples + 1, self.subframe_samples):
+            try: decisions.append(self.vad.is_speech(scaled[start:start + self.subframe_samples].tobytes(), self.sample_rate))
+            except Exception: decisions.append(False)
+        return self.push_decisions(decisions)
+
+    def push_decisions(self, decisions) -> bool:
+        """Feed sub-frame VAD decisions computed elsewhere (e.g. by the audio worker process)."""
+        self.stats["vad_subframes"] += len(decisions)
+        self.stats["voiced_subframes"] += sum(1 for d in decisions if d)
+        return self._accumulate(decisions)
+
+    def _accumulate(self, decisions) -> bool:
+        for is_speech in decisions:
+            if is_speech:
+                self.speech_ms += self.subframe_ms
+                self.silence_ms = 0.0
+                if self.speech_ms >= self.min_speech_ms:
+                    self.stats["triggers"] += 1
+                    self.reset()
+                    return True
+            elif self.speech_ms > 0:
+                self.silence_ms += self.subframe_ms
+                if self.silence_ms > self.hangover_ms:
+                    self.speech_ms = 0.0; self.silence_ms = 0.0
+        return False
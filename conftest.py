@@ -0,0 +1,3 @@
+# conftest.py
+# test_search.py and Scripts/ (benchmarks, test_ultravox_call.py) are manual scripts against live services, not pytest modules
+collect_ignore = ["test_search.py", "Scripts"]
@@ -39,9 +39,19 @@ def init_db():
         cursor.execute("""
             CREATE INDEX IF NOT EXISTS idx_session_timestamp ON conversation_turns (session_id, timestamp);
         """)
+
+        # Rolling summary: the summary text plus the last turn_id folded into it (one row per summary_key)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS conversation_summaries (
+                summary_key TEXT PRIMARY KEY,
+                summary TEXT NOT NULL,
+                last_turn_id INTEGER NOT NULL,
+                updated_at TIMESTAMP NOT NULL
+            );
+        """)
         
         conn.commit()
-        _ch_log("Database initialized successfully and 'conversation_turns' table is ready.", "INFO")
+        _ch_log("Database initialized successfully and 'conversation_turns' / 'conversation_summaries' tables are ready.", "INFO")
     except sqlite3.Error as e:
         _ch_log(f"Error initializing database: {e}", "ERROR")
     finally:
@@ -217,6 +227,62 @@ def get_recent_turns(session_id: str = None, limit: int = 20) -> list[dict]:
             conn.close()
     return turns
 
+def get_turns_after(after_turn_id: int, limit: int = 30) -> list[dict]:
+    """The newest `limit` turns with turn_id > after_turn_id, oldest first (primary-key range scan)."""
+    turns = []
+    conn = None
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT turn_id, session_id, timestamp, role, content
+            FROM conversation_turns
+            WHERE turn_id > ?
+            ORDER BY turn_id DESC
+            LIMIT ?
+        """, (after_turn_id, limit))
+        turns = [dict(row) for row in cursor.fetchall()]
+        turns.reverse()
+    except sqlite3.Error as e:
+        _ch_log(f"Error retrieving turns after {after_turn_id}: {e}", "ERROR")
+    finally:
+        if conn:
+            conn.close()
+    return turns
+
+def get_rolling_summary(summary_key: str = "global") -> Optional[dict]:
+    """The stored rolling summary ({summary, last_turn_id, updated_at}), or None if there is none yet."""
+    conn = None
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        conn.row_factory = sqlite3.Row
+        row = conn.execute("SELECT summary, last_turn_id, updated_at FROM conversation_summaries WHERE summary_key = ?", (summary_key,)).fetchone()
+        return dict(row) if row else None
+    except sqlite3.Error as e:
+        _ch_log(f"Error reading rolling summary '{summary_key}': {e}", "ERROR")
+        return None
+    finally:
+        if conn:
+            conn.close()
+
+def save_rolling_summary(summary: str, last_turn_id: int, summary_key: str = "global"):
+    """Stores the rolling summary covering every turn up to and including last_turn_id."""
+    conn = None
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        conn.execute("""
+            INSERT OR REPLACE INTO conversation_summaries (summary_key, summary, last_turn_id, updated_at)
+            VALUES (?, ?, ?, ?)
+        """, (summary_key, summary, last_turn_id, datetime.utcnow()))
+        conn.commit()
+        _ch_log(f"Saved rolling summary '{summary_key}' through turn {last_turn_id} ({len(summary)} chars).", "DEBUG")
+    except sqlite3.Error as e:
+        _ch_log(f"Error saving rolling summary '{summary_key}': {e}", "ERROR")
+    finally:
+        if conn:
+            conn.close()
+
 # --- Example Usage (for direct testing of this module) ---
 if __name__ == '__main__':
     _ch_log("Running conversation_history_db.py directly for testing...", "INFO")
@@ -0,0 +1,153 @@
+# conversation_summary.py
+"""
+Rolling conversation summary persisted in conversation_history_db.
+
+Previously every connect re-summarized the last CONTEXT_HISTORY_LIMIT turns from
+scratch with the summarizer model: the same turns were paid for again on every
+reconnect and the session waited on the call. RollingSummarizer keeps one
+summary row (summary text + the last turn_id it covers) and folds new turns
+into it on a background thread as they are logged:
+
+  - note_turn_logged() is called after each turn is written; once
+    `fold_every_turns` turns are pending (or on request_fold()) the worker
+    sends the stored summary plus only the new turns to the summarizer and
+    saves the result with the new last turn_id.
+  - current_summary() returns the stored summary plus, verbatim, any turns
+    logged since its last_turn_id (up to `fold_every_turns - 1` normally, more
+    if a fold is still running), so a reconnect never loses the latest turns.
+    It is two indexed reads; the connect path no longer depends on the LLM.
+
+If many turns piled up while nothing was folding (e.g. the app was down), only
+the newest `max_turns_per_fold` are folded - the same window the old
+from-scratch summary used.
+"""
+
+import json
+import threading
+import time
+
+from conversation_history_db import get_rolling_summary, get_turns_after, save_rolling_summary
+
+_NO_CONTEXT_MARKER = "no specific unresolved context"
+
+
+def format_turns(turns) -> str:
+    """One line per turn with its UTC timestamp (absolute: the summary outlives 'n minutes ago')."""
+    lines = []
+    for turn in turns:
+        content = turn["content"]
+        if turn["role"] in ("tool_call", "tool_result"):
+            try:
+                content_json = json.loads(content)
+                content = f"Tool: {content_json.get('name', 'N/A')}, Data: {str(content_json)[:70]}..."
+            except Exception: pass
+        elif turn["role"] == "system_event":
+            try:
+                event = json.loads(content).get("event")
+                if event not in ("websocket_error", "websocket_closed"): continue # Only connection drops matter to the summary
+                content = "(connection interrupted)"
+            except Exception: continue
+        lines.append(f"[{str(turn['timestamp'])[:19]} UTC] {turn['role'].capitalize()}: {content}")
+    return "\n".join(lines)
+
+
+class RollingSummarizer:
+    def __init__(self, openai_client, model: str, summary_key: str = "global", fold_every_turns: int = 4,
+                 max_turns_per_fold: int = 30, max_tokens: int = 300, request_timeout_s: float = 30.0, log_fn=print):
+        self.openai_client = openai_client # Synchronous openai.OpenAI
+        self.model = model
+        self.summary_key = summary_key
+        self.fold_every_turns = max(1, int(fold_every_turns))
+        self.max_turns_per_fold = max_turns_per_fold
+        self.max_tokens = max_tokens
+        self.request_timeout_s = request_timeout_s
+        self.log = log_fn
+        self._pending_turns = 0 # Logged since the last fold started; shared with the logging thread
+        self._pending_lock = threading.Lock()
+        self._fold_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.stats = {"folds": 0, "turns_folded": 0, "fold_errors": 0, "prompt_tokens": 0, "completion_tokens": 0, "last_fold_ms": 0.0}
+
+    def start(self):
+        if self._thread and self._thread.is_alive(): return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="RollingSummarizer", daemon=True)
+        self._thread.start()
+        self.request_fold() # Catch up on turns logged while nothing was folding
+
+    def stop(self):
+        self._stop_event.set(); self._fold_event.set()
+
+    def get_stats(self) -> dict:
+        return dict(self.stats)
+
+    def current_summary(self) -> str:
+        """The stored summary plus the raw turns it does not cover yet ("" if neither). Two indexed reads; never calls the LLM."""
+        row = get_rolling_summary(self.summary_key)
+        summary, last_turn_id = (row["summary"], row["last_turn_id"]) if row else ("", 0)
+        unfolded_text = format_turns(get_turns_after(last_turn_id, limit=self.max_turns_per_fold))
+        if not unfolded_text: return summary
+        return f"{summary}\nMost recent turns (not yet in the summary):\n{unfolded_text}" if summary else f"Most recent turns:\n{unfolded_text}"
+
+    def note_turn_logged(self):
+        with self._pending_lock:
+            self._pending_turns += 1
+            due = self._pending_turns >= self.fold_every_turns
+        if due: self.request_fold()
+
+    def request_fold(self):
+        self._fold_event.set()
+
+    # --- Worker thread ---
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._fold_event.wait()
+            if self._stop_event.is_set(): break
+            with self._pending_lock: # Clear the event under the lock too, so a turn noted after this always triggers the next fold
+                self._fold_event.clear()
+                self._pending_turns = 0
+            try: self.fold()
+            except Exception as e:
+                self.stats["fold_errors"] += 1
+                self.log(f"RollingSummarizer: Fold failed: {e}")
+
+    def fold(self) -> bool:
+        """Fold every turn after the stored last_turn_id into the summary. Returns True if the summary changed."""
+        row = get_rolling_summary(self.summary_key)
+        previous_summary, last_turn_id = (row["summary"], row["last_turn_id"]) if row else ("", 0)
+        new_turns = get_turns_after(last_turn_id, limit=self.max_turns_per_fold)
+        if not new_turns: return False
+        new_last_turn_id = new_turns[-1]["turn_id"]
+        new_turns_text = format_turns(new_turns)
+        if not new_turns_text: # Nothing summary-worthy (e.g. only rotation events); just advance the marker
+            save_rolling_summary(previous_summary, new_last_turn_id, self.summary_key)
+            return False
+        prompt = f"""You maintain the running memory of a voice assistant: a long format summary of what it discussed with its user,
+        written so the assistant can pick up where it left off. Fold the NEW TURNS into the CURRENT SUMMARY and return the updated summary.
+        Keep open requests, decisions, names, numbers and dates (as absolute dates); drop details that are stale or resolved.
+        Keep it under 200 words. If there is nothing worth remembering, reply exactly "No specific unresolved context."
+
+        CURRENT SUMMARY:
+        {previous_summary or "(none yet)"}
+
+        NEW TURNS:
+        {new_turns_text}
+
+        UPDATED SUMMARY:
+        """
+        start_t = time.time()
+        response = self.openai_client.chat.completions.create(
+            model=self.model, messages=[{"role": "user", "content": prompt}],
+            temperature=0.1, max_tokens=self.max_tokens, timeout=self.request_timeout_s)
+        summary = response.choices[0].message.content.strip()
+        if _NO_CONTEXT_MARKER in summary.lower(): summary = ""
+        save_rolling_summary(summary, new_last_turn_id, self.summary_key)
+        usage = getattr(response, "usage", None)
+        if usage:
+            self.stats["prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+            self.stats["completion_tokens"] += getattr(usage, "completion_tokens", 0) or 0
+        self.stats["folds"] += 1; self.stats["turns_folded"] += len(new_turns)
+        self.stats["last_fold_ms"] = round((time.time() - start_t) * 1000.0, 1)
+        self.log(f"RollingSummarizer: Folded {len(new_turns)} turns (through turn {new_last_turn_id}). {self.stats}")
+        return summary != previous_summary
@@ -0,0 +1,96 @@
+# dsp_kernels.py
+"""
+Allocation-free NumPy kernels for the per-chunk audio hot path.
+
+Each 30 ms mic chunk used to go int16 -> float32 -> resample -> int16 ->
+x0.20 (float64!) -> int16, plus an RMS in float32, with every step returning a
+fresh temporary. The kernels here write into caller-owned buffers instead:
+
+  - Scratch: named, grow-on-demand work buffers. Each consumer (pipeline,
+    detector, TSM engine, ...) owns one, so nothing is shared across threads.
+  - apply_gain_q15: fixed-point gain. int16 x Q15 in an int32 accumulator,
+    rounded, shifted and saturated back to int16 - no float round trip.
+  - int16_to_float32 / float32_to_int16: scaled conversion with saturation.
+  - rms_dbfs: RMS level of an int16 frame.
+
+Resampling lives in audio_resampler.StreamingResampler, which uses the same
+preallocated-buffer approach (reuse_output=True returns a view that is valid
+until the next call).
+
+All kernels return a view of `out` sized to the input.
+"""
+
+import math
+
+import numpy as np
+
+Q15_ONE = 1 << 15
+
+
+class Scratch:
+    """Named work buffers, reallocated only when a larger size is requested."""
+
+    def __init__(self):
+        self._buffers = {}
+
+    def get(self, name: str, n: int, dtype) -> np.ndarray:
+        buf = self._buffers.get(name)
+        if buf is None or buf.size < n or buf.dtype != dtype:
+            buf = np.empty(max(n, 1024), dtype=dtype)
+            self._buffers[name] = buf
+        return buf[:n]
+
+
+def gain_to_q15(gain: float) -> int:
+    """Gain as a Q15 fixed-point integer (1.0 -> 32768). Gains up to 65535/32768 are exact to 1/32768."""
+    return int(round(gain * Q15_ONE))
+
+
+def _saturate(x: np.ndarray, lo, hi):
+    # np.clip has several microseconds of fixed overhead per call; two ufuncs are cheaper on 30 ms frames
+    np.minimum(x, hi, out=x)
+    np.maximum(x, lo, out=x)
+
+
+def apply_gain_q15(samples_int16: np.ndarray, gain_q15: int, scratch: Scratch, out: np.ndarray = None) -> np.ndarray:
+    """out = saturate_int16(round(samples * gain_q15 / 2**15)). `out` may be the input array (in place)."""
+    n = samples_int16.size
+    acc = scratch.get("gain_acc", n, np.int32)
+    np.multiply(samples_int16, np.int32(gain_q15), out=acc, dtype=np.int32)
+    np.add(acc, np.int32(Q15_ONE >> 1), out=acc) # Round half up before the shift
+    if out is None: out = scratch.get("gain_out", n, np.int16)
+    if abs(gain_q15) > Q15_ONE: # Amplification may overflow int16
+        np.right_shift(acc, 15, out=acc)
+        _saturate(acc, -32768, 32767)
+        np.copyto(out[:n], acc, casting="unsafe")
+    else: # Attenuation can't overflow: shift straight into the int16 output
+        np.right_shift(acc, 15, out=out[:n], casting="unsafe")
+    return out[:n]
+
+
+def int16_to_float32(samples_int16: np.ndarray, out: np.ndarray, scale: float = 1.0 / 32768.0) -> np.ndarray:
+    n = samples_int16.size
+    if scale == 1.0: np.copyto(out[:n], samples_int16)
+    else: np.multiply(samples_int16, np.float32(scale), out=out[:n], dtype=np.float32)
+    return out[:n]
+
+
+def float32_to_int16(samples: np.ndarray, out: np.ndarray, scratch: Scratch, scale: float = 32767.0,
+                     lo: float = -1.0, hi: float = 1.0) -> np.ndarray:
+    """out = int16(clip(samples, lo, hi) * scale), truncating like astype(np.int16)."""
+    n = samples.size
+    tmp = scratch.get("f32_tmp", n, np.float32)
+    np.minimum(samples, np.float32(hi), out=tmp)
+    np.maximum(tmp, np.float32(lo), out=tmp)
+    if scale != 1.0: np.multiply(tmp, np.float32(scale), out=tmp)
+    np.copyto(out[:n], tmp, casting="unsafe")
+    return out[:n]
+
+
+def rms_dbfs(samples_int16: np.ndarray, scratch: Scratch = None) -> float:
+    """RMS level in dBFS (-120 for an empty frame). Allocates only when no scratch is given."""
+    n = samples_int16.size
+    if n == 0: return -120.0
+    x = int16_to_float32(samples_int16, scratch.get("rms", n, np.float32), scale=1.0) if scratch is not None else samples_int16.astype(np.float32)
+    rms = math.sqrt(float(np.dot(x, x)) / n)
+    return 20.0 * math.log10(max(rms, 1e-3) / 32768.0)
@@ -0,0 +1,82 @@
+# local_endpointer.py
+"""
+Local end-of-utterance detection for LOCAL_ENDPOINTING.
+
+With server_vad alone, a turn only ends after the server has seen
+silence_duration_ms (500 ms by default) of silence, plus the network hop back.
+LocalEndpointer watches the mic stream while the user has the floor and fires
+as soon as `silence_ms` of non-speech follows at least `min_speech_ms` of
+speech, so the client can commit the input buffer and request a response
+itself.
+
+Same two stages as BargeInDetector: an energy gate on the raw 24 kHz chunk
+(quiet chunks count as silence without resampling or VAD), then webrtcvad on
+10 ms sub-frames of the 16 kHz chunk. Unlike barge-in, no attenuation is
+applied: this runs only while the assistant is silent, so there is no echo to
+reject.
+"""
+
+import numpy as np
+
+import dsp_kernels
+
+
+class LocalEndpointer:
+    def __init__(self, vad, sample_rate: int = 16000, subframe_ms: int = 10, silence_ms: float = 300.0,
+                 min_speech_ms: float = 150.0, gate_dbfs: float = -45.0):
+        self.vad = vad
+        self.sample_rate = sample_rate
+        self.subframe_ms = subframe_ms
+        self.subframe_samples = int(sample_rate * subframe_ms / 1000)
+        self.silence_ms = silence_ms
+        self.min_speech_ms = min_speech_ms
+        self.gate_dbfs = gate_dbfs
+        self.stats = {"chunks": 0, "gated_out": 0, "endpoints": 0}
+        self._scratch = dsp_kernels.Scratch()
+        self.reset()
+
+    def reset(self):
+        """Forget the current utterance (assistant started talking, or not sending)."""
+        self.speech_ms = 0.0 # Voiced time in the current utterance
+        self.trailing_silence_ms = 0.0
+        self.endpoint_detected = False
+
+    @property
+    def in_utterance(self) -> bool:
+        return self.speech_ms >= self.min_speech_ms
+
+    # --- Stage 1 ---
+    def gate(self, samples_int16: np.ndarray, chunk_ms: float) -> bool:
+        """True if the chunk needs VAD. A closed gate counts as silence."""
+        self.stats["chunks"] += 1
+        if dsp_kernels.rms_dbfs(samples_int16, self._scratch) >= self.gate_dbfs: return True
+        self.stats["gated_out"] += 1
+        self._accumulate([False] * max(1, int(round(chunk_ms / self.subframe_ms))))
+        return False
+
+    # --- Stage 2 ---
+    def process_16k(self, samples_16k: np.ndarray):
+        if self.vad is None or samples_16k is None or samples_16k.size == 0: return
+        decisions = []
+        for start in range(0, len(samples_16k) - self.subframe_samples + 1, self.subframe_samples):
+            try: decisions.append(self.vad.is_speech(samples_16k[start:start + self.subframe_samples].tobytes(), self.sample_rate))
+            except Exception: decisions.append(False)
+        self._accumulate(decisions)
+
+    def _accumulate(self, decisions):
+        for is_speech in decisions:
+            if is_speech:
+                self.speech_ms += self.subframe_ms
+                self.trailing_silence_ms = 0.0
+            elif self.speech_ms > 0:
+                self.trailing_silence_ms += self.subframe_ms
+                if self.trailing_silence_ms >= self.silence_ms:
+                    if self.in_utterance: # Otherwise it was a blip too short to be an utterance
+                        self.stats["endpoints"] += 1
+                        self.endpoint_detected = True
+                    self.speech_ms = 0.0; self.trailing_silence_ms = 0.0
+
+    def pop_endpoint(self) -> bool:
+        """True once per detected end of utterance."""
+        detected, self.endpoint_detected = self.endpoint_detected, False
+        return detected
@@ -6,20 +6,23 @@ import json
 import base64
 import time
 import threading
+from collections import OrderedDict
 from dotenv import load_dotenv
 import pyaudio
 import numpy as np
-import wave
 import requests # For DB monitor thread
 import sqlite3  # For DB monitor thread
 from datetime import datetime # For DB monitor thread (already implicitly imported via time but good to be explicit)
 
-try:
-    from scipy import signal
-    SCIPY_AVAILABLE = True
-except ImportError:
-    SCIPY_AVAILABLE = False
-    print("[MAIN_APP_SETUP] WARNING: scipy not installed. Resampling for wake word/VAD disabled.")
+from audio_resampler import StreamingResampler # Shared 24k->16k polyphase resampler for VAD + wake word
+from audio_buffers import PCMRingBuffer, AdaptiveJitterBuffer, PreRollBuffer # Output ring buffer, callback-mode playout buffer, wake word pre-roll
+from mic_recorder import MicCaptureRecorder # Background, segmented mic capture
+from audio_replay import WavReplayStream # Offline WAV source in place of the mic (benchmarks, headless runs)
+from audio_worker_process import AudioWorkerProcess # Optional wake word + VAD in a separate process
+from barge_in_detector import BargeInDetector # Energy gate + sub-frame VAD for local barge-in
+from audio_assets import AudioAssetCache, parse_asset_spec # Decoded-once, memory-mapped UI sounds
+from silence_gate import SilenceGate # Skips sending sustained mic silence to OpenAI
+from local_endpointer import LocalEndpointer # Local end-of-utterance detection (LOCAL_ENDPOINTING)
 
 try:
     import webrtcvad
@@ -33,12 +36,11 @@ except ImportError:
 CHUNK_MS = 30
 LOCAL_VAD_ENABLED = True
 LOCAL_VAD_ACTIVATION_THRESHOLD_MS = 400
-MIN_SPEECH_FRAMES_FOR_LOCAL_INTERRUPT = 25
 LOCAL_INTERRUPT_COOLDOWN_FRAMES = int(2000 / CHUNK_MS)
-MIN_SILENCE_FRAMES_TO_RESET_LOCAL_VAD_STATE = 3
 VAD_SAMPLE_RATE = 16000
 VAD_FRAME_DURATION_MS = CHUNK_MS
 VAD_BYTES_PER_FRAME = int(VAD_SAMPLE_RATE * (VAD_FRAME_DURATION_MS / 1000.0) * 2)
+BARGE_IN_SUBFRAME_MS = 10 # Barge-in / endpointing VAD runs on 10 ms sub-frames of each chunk
 
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -54,11 +56,25 @@ APP_CONFIG = {
     "FASTAPI_DISPLAY_API_URL": os.getenv("FASTAPI_DISPLAY_API_URL"),
     "OPENAI_VOICE": os.getenv("OPENAI_VOICE", "ash"),
     "TSM_PLAYBACK_SPEED": os.getenv("TSM_PLAYBACK_SPEED", "1.0"),
-    "TSM_WINDOW_CHUNKS": os.getenv("TSM_WINDOW_CHUNKS", "8"),
     "END_CONV_AUDIO_FINISH_DELAY_S": float(os.getenv("END_CONV_AUDIO_FINISH_DELAY_S", "2.0")),
     "OPENAI_RECONNECT_DELAY_S": int(os.getenv("OPENAI_RECONNECT_DELAY_S", 5)),
     "OPENAI_PING_INTERVAL_S": int(os.getenv("OPENAI_PING_INTERVAL_S", 20)),
     "OPENAI_PING_TIMEOUT_S": int(os.getenv("OPENAI_PING_TIMEOUT_S", 10)),
+    "OPENAI_APPEND_COALESCE_MS": int(os.getenv("OPENAI_APPEND_COALESCE_MS", 90)), # Mic audio per append frame (0 = one frame per chunk)
+    "USE_ULAW_FOR_OPENAI_INPUT": os.getenv("USE_ULAW_FOR_OPENAI_INPUT", "false").lower() == "true", # Send mic audio as 8 kHz G.711 u-law (6x smaller)
+    "LOCAL_ENDPOINTING": os.getenv("LOCAL_ENDPOINTING", "off").lower(), # off | shadow (metrics only) | on (client commits at local end of utterance)
+    "TTS_CACHE_DIR": os.getenv("TTS_CACHE_DIR", "tts_cache"), # Pre-rendered greeting/announcement PCM, persisted across restarts
+    "WAKE_GREETING_TEXTS": os.getenv("WAKE_GREETING_TEXTS", ""), # '|'-separated; played locally on wake (empty = LLM greets, the default)
+    "SESSION_ROTATION_ENABLED": os.getenv("SESSION_ROTATION_ENABLED", "false").lower() == "true", # Opt-in: swap in a primed standby session before expires_at
+    "SESSION_ROTATE_LEAD_S": float(os.getenv("SESSION_ROTATE_LEAD_S", 300)), # Start preparing the standby this long before expiry
+    "SESSION_ROTATE_IDLE_S": float(os.getenv("SESSION_ROTATE_IDLE_S", 3)), # Quiet gap required before swapping (forced 20 s before expiry)
+    "ROLLING_SUMMARY_ENABLED": os.getenv("ROLLING_SUMMARY_ENABLED", "true").lower() == "true", # Persisted summary folded as turns are logged (false = re-summarize on every connect)
+    "ROLLING_SUMMARY_FOLD_TURNS": int(os.getenv("ROLLING_SUMMARY_FOLD_TURNS", 4)), # User/assistant turns between background folds
+    "CONTEXT_RESTORE_MODE": os.getenv("CONTEXT_RESTORE_MODE", "summary").lower(), # summary (history summary in instructions) | replay (recent turns re-created as items)
+    "CONTEXT_REPLAY_MAX_TURNS": int(os.getenv("CONTEXT_REPLAY_MAX_TURNS", 20)),
+    "CONTEXT_REPLAY_TOKEN_BUDGET": int(os.getenv("CONTEXT_REPLAY_TOKEN_BUDGET", 2000)), # Estimated text tokens replayed per new session
+    "PRIMED_CONTEXT_TIMEOUT_S": float(os.getenv("PRIMED_CONTEXT_TIMEOUT_S", 10)), # History summary later than this is only cached, not pushed to the live session
+    "REALTIME_TRAFFIC_RECORD_PATH": os.getenv("REALTIME_TRAFFIC_RECORD_PATH", ""), # Append raw inbound frames here (input for Scripts/bench_event_dispatch.py)
     # --- New Config for Phase 4 DB Monitor Thread ---
     "DB_MONITOR_POLL_INTERVAL_S": int(os.getenv("DB_MONITOR_POLL_INTERVAL_S", 20)),
     "FASTAPI_UI_STATUS_UPDATE_URL": os.getenv("FASTAPI_UI_STATUS_UPDATE_URL", "http://localhost:8001/api/ui_status_update"),
@@ -114,7 +130,7 @@ if WEBRTC_VAD_AVAILABLE and LOCAL_VAD_ENABLED:
     try:
         vad_instance = webrtcvad.Vad()
         vad_instance.set_mode(0) 
-        log(f"WebRTCVAD instance created. Mode: 0, Frame: {VAD_FRAME_DURATION_MS}ms @ {VAD_SAMPLE_RATE}Hz")
+        log(f"WebRTCVAD instance created. Mode: 0, Frame: {BARGE_IN_SUBFRAME_MS}ms sub-frames @ {VAD_SAMPLE_RATE}Hz")
     except Exception as e_vad_init:
         log(f"ERROR initializing WebRTCVAD: {e_vad_init}. Disabling local VAD.", logging.ERROR); WEBRTC_VAD_AVAILABLE = False; vad_instance = None
 
@@ -124,15 +140,14 @@ wake_word_detector_instance = None; wake_word_active = False # WW Init unchanged
 # ... (same as before) ...
 try:
     from wake_word_detector import WakeWordDetector
-    if SCIPY_AVAILABLE:
-        try:
-            wake_word_detector_instance = WakeWordDetector(sample_rate=16000)
-            is_dummy_check = "DummyOpenWakeWordModel" in str(type(wake_word_detector_instance.model)) if hasattr(wake_word_detector_instance, 'model') else True
-            if hasattr(wake_word_detector_instance, 'model') and wake_word_detector_instance.model is not None and not is_dummy_check :
-                log(f"WakeWordDetector initialized: Model='{wake_word_detector_instance.wake_word_model_name}', Thr={wake_word_detector_instance.threshold}"); wake_word_active = True
-            else: log("WakeWordDetector init with DUMMY model or model is None. WW INACTIVE.", logging.WARNING)
-        except Exception as e_ww: log(f"CRITICAL ERROR WakeWordDetector init: {e_ww}. WW INACTIVE.", logging.CRITICAL)
-    else: log("Scipy unavailable for WakeWordDetector resampling. WW might be INACTIVE.", logging.WARNING)
+    try:
+        # Fed with the pipeline's shared 16kHz stream, so the detector never resamples itself
+        wake_word_detector_instance = WakeWordDetector(sample_rate=16000)
+        is_dummy_check = "DummyOpenWakeWordModel" in str(type(wake_word_detector_instance.model)) if hasattr(wake_word_detector_instance, 'model') else True
+        if hasattr(wake_word_detector_instance, 'model') and wake_word_detector_instance.model is not None and not is_dummy_check :
+            log(f"WakeWordDetector initialized: Model='{wake_word_detector_instance.wake_word_model_name}', Thr={wake_word_detector_instance.threshold}"); wake_word_active = True
+        else: log("WakeWordDetector init with DUMMY model or model is None. WW INACTIVE.", logging.WARNING)
+    except Exception as e_ww: log(f"CRITICAL ERROR WakeWordDetector init: {e_ww}. WW INACTIVE.", logging.CRITICAL)
 except ImportError as e_import_ww: log(f"Failed to import WakeWordDetector: {e_import_ww}. WW DISABLED.", logging.ERROR)
 if not wake_word_active and wake_word_detector_instance is None:
     class DummyWWDetector: # Dummy unchanged
@@ -143,8 +158,12 @@ if not wake_word_active and wake_word_detector_instance is None:
 
 
 openai_client_instance = None
+OPENAI_CLIENT_MODE = os.getenv("OPENAI_CLIENT_MODE", "thread").lower() # "thread" (websocket-client) or "asyncio" (openai_client_async)
 try: from openai_client import OpenAISpeechClient
 except ImportError as e: log(f"CRITICAL ERROR: Failed to import OpenAISpeechClient: {e}. Exiting.", logging.CRITICAL); exit(1)
+if OPENAI_CLIENT_MODE == "asyncio":
+    try: from openai_client_async import AsyncOpenAISpeechClient as OpenAISpeechClient
+    except ImportError as e: log(f"OPENAI_CLIENT_MODE=asyncio needs the 'websockets' package ({e}). Using the threaded client.", logging.WARNING)
 
 try: # Conv DB Init unchanged
     from conversation_history_db import init_db as init_conversation_history_db
@@ -160,6 +179,36 @@ except ImportError as e_conv_db:
 INPUT_RATE = 24000; OUTPUT_RATE = 24000; WAKE_WORD_PROCESS_RATE = 16000
 INPUT_CHUNK_SAMPLES = int(INPUT_RATE * CHUNK_MS / 1000)
 OUTPUT_PLAYER_CHUNK_SAMPLES = int(OUTPUT_RATE * CHUNK_MS / 1000)
+PLAYER_RING_BUFFER_S = float(os.getenv("PLAYER_RING_BUFFER_S", "30")) # Initial capacity; grows if a response outpaces it
+PLAYER_MAX_QUEUE_S = float(os.getenv("PLAYER_MAX_QUEUE_S", "120")) # Bound on queued playback audio
+PLAYER_BACKPRESSURE_TIMEOUT_S = float(os.getenv("PLAYER_BACKPRESSURE_TIMEOUT_S", "2.0")) # Max time play() waits for space before dropping
+PLAYER_OUTPUT_MODE = os.getenv("PLAYER_OUTPUT_MODE", "blocking") # "blocking" (writer thread) or "callback" (jitter-buffered, opt-in)
+PLAYER_JITTER_MIN_MS = float(os.getenv("PLAYER_JITTER_MIN_MS", "60"))
+PLAYER_JITTER_MAX_MS = float(os.getenv("PLAYER_JITTER_MAX_MS", "400"))
+PLAYER_JITTER_INITIAL_MS = float(os.getenv("PLAYER_JITTER_INITIAL_MS", "120"))
+MIC_CAPTURE_ENABLED = os.getenv("MIC_CAPTURE_ENABLED", "true").lower() == "true"
+MIC_CAPTURE_DIR = os.getenv("MIC_CAPTURE_DIR", "mic_captures")
+MIC_CAPTURE_CODEC = os.getenv("MIC_CAPTURE_CODEC", "wav") # "wav" or "flac" (needs soundfile)
+MIC_CAPTURE_SEGMENT_S = float(os.getenv("MIC_CAPTURE_SEGMENT_S", "300"))
+MIC_CAPTURE_MAX_SEGMENTS = int(os.getenv("MIC_CAPTURE_MAX_SEGMENTS", "24")) # 0 = keep all
+MIC_CAPTURE_MAX_AGE_HOURS = float(os.getenv("MIC_CAPTURE_MAX_AGE_HOURS", "0")) # 0 = no age limit
+BARGE_IN_MIN_SPEECH_MS = float(os.getenv("BARGE_IN_MIN_SPEECH_MS", "300")) # Voiced speech needed to interrupt (was 25 x 30 ms frames)
+BARGE_IN_HANGOVER_MS = float(os.getenv("BARGE_IN_HANGOVER_MS", "90")) # Unvoiced gap tolerated inside speech before the count resets
+BARGE_IN_GATE_DBFS = float(os.getenv("BARGE_IN_GATE_DBFS", "-45")) # Absolute energy gate; frames below skip resample + VAD
+BARGE_IN_GATE_MARGIN_DB = float(os.getenv("BARGE_IN_GATE_MARGIN_DB", "9")) # Required level above the learnt mic floor (assistant echo)
+AUDIO_WORKER_PROCESS = os.getenv("AUDIO_WORKER_PROCESS", "false").lower() == "true" # Run wake word + VAD out of process
+AUDIO_INPUT_REPLAY_WAV = os.getenv("AUDIO_INPUT_REPLAY_WAV", "") # If set, replay this WAV instead of opening the mic
+AUDIO_INPUT_REPLAY_SPEED = float(os.getenv("AUDIO_INPUT_REPLAY_SPEED", "1.0")) # 1.0 = real time, 0 = as fast as possible
+WAKE_WORD_PREROLL_MS = float(os.getenv("WAKE_WORD_PREROLL_MS", "600")) # Audio before detection sent on wake (0 = off)
+LOCAL_ENDPOINT_SILENCE_MS = float(os.getenv("LOCAL_ENDPOINT_SILENCE_MS", "300")) # Trailing non-speech that ends an utterance locally
+LOCAL_ENDPOINT_MIN_SPEECH_MS = float(os.getenv("LOCAL_ENDPOINT_MIN_SPEECH_MS", "150")) # Speech needed before an endpoint can fire
+PLAYER_ASSETS = os.getenv("PLAYER_ASSETS", "") # name=path pairs, comma-separated; decoded once for play_asset(). Empty: nothing preloaded
+PLAYER_ASSET_CACHE_DIR = os.getenv("PLAYER_ASSET_CACHE_DIR", "asset_cache") # Decoded PCM (.npy), memory-mapped on later runs
+SEND_SILENCE_GATE_ENABLED = os.getenv("SEND_SILENCE_GATE_ENABLED", "false").lower() == "true" # Stop appending mic audio during sustained quiet
+SEND_SILENCE_GATE_DBFS = float(os.getenv("SEND_SILENCE_GATE_DBFS", "-50")) # Chunks below this level count as quiet
+SEND_SILENCE_GATE_HANGOVER_MS = float(os.getenv("SEND_SILENCE_GATE_HANGOVER_MS", "800")) # Quiet still sent before the gate closes
+SEND_SILENCE_GATE_PADDING_MS = float(os.getenv("SEND_SILENCE_GATE_PADDING_MS", "300")) # Digital silence sent on close so server VAD sees speech end
+SEND_SILENCE_GATE_PREROLL_MS = float(os.getenv("SEND_SILENCE_GATE_PREROLL_MS", "300")) # Held audio sent ahead of the chunk that reopens the gate
 FORMAT = pyaudio.paInt16; CHANNELS = 1
 STATE_LISTENING_FOR_WAKEWORD = "LISTENING_FOR_WAKEWORD"
 STATE_SENDING_TO_OPENAI = "SENDING_TO_OPENAI"
@@ -186,26 +235,169 @@ p = pyaudio.PyAudio()
 player_instance = None # PCMPlayer class and get_input_stream unchanged
 # ... (same as before) ...
 class PCMPlayer:
-    def __init__(self, rate=OUTPUT_RATE, channels=CHANNELS, format_player=FORMAT, chunk_samples_player=OUTPUT_PLAYER_CHUNK_SAMPLES):
-        log(f"PCMPlayer Init: Rate={rate}, ChunkSamples={chunk_samples_player}")
-        self.stream = None
+    """
+    Output player. play() only enqueues PCM into a bounded ring buffer and returns.
+    Two output modes (PLAYER_OUTPUT_MODE):
+      - "blocking" (default): a dedicated playback thread drains the ring to stream.write().
+      - "callback": PortAudio pulls audio through an adaptive jitter buffer
+        from its own callback thread; no Python thread blocks on the device.
+    Either way the websocket receive path never blocks on the audio device.
+
+    play(pcm, item_id) also records where each assistant item's audio sits in the
+    output stream, so played_ms(item_id) can report how much of that item has
+    actually been handed to the device (minus the device's output latency).
+
+    play_asset(name) queues a preloaded asset (see audio_assets) straight from its
+    memory-mapped samples: no decoding or bytes conversion at play time.
+    """
+    def __init__(self, rate=OUTPUT_RATE, channels=CHANNELS, format_player=FORMAT, chunk_samples_player=OUTPUT_PLAYER_CHUNK_SAMPLES, output_mode=None):
+        self.output_mode = (output_mode or PLAYER_OUTPUT_MODE).lower()
+        if self.output_mode not in ("callback", "blocking"):
+            log(f"PCMPlayer: Unknown output mode '{self.output_mode}', using 'blocking'.", logging.WARNING); self.output_mode = "blocking"
+        log(f"PCMPlayer Init: Rate={rate}, ChunkSamples={chunk_samples_player}, Mode={self.output_mode}")
+        self.frame_bytes = pyaudio.get_sample_size(format_player) * channels
+        self.chunk_bytes = chunk_samples_player * self.frame_bytes
+        self.bytes_per_second = rate * self.frame_bytes
+        self.ring = PCMRingBuffer(int(self.bytes_per_second * PLAYER_RING_BUFFER_S), self.bytes_per_second, self.frame_bytes)
+        self.jitter = AdaptiveJitterBuffer(self.ring, min_ms=PLAYER_JITTER_MIN_MS, max_ms=PLAYER_JITTER_MAX_MS, initial_ms=PLAYER_JITTER_INITIAL_MS) if self.output_mode == "callback" else None
+        self.max_queued_bytes = int(self.bytes_per_second * PLAYER_MAX_QUEUE_S)
+        self._cond = threading.Condition()
+        self._flush_requested = False # Play the sub-chunk tail instead of waiting for more audio
+        self._writing = False # True while audio is being handed to the device
+        self._producers_waiting = 0
+        self._stop_event = threading.Event()
+        self.stats = {"chunks_written": 0, "underruns": 0, "overruns": 0, "backpressure_waits": 0, "backpressure_wait_ms": 0.0,
+                      "dropped_bytes": 0, "max_queued_ms": 0.0, "write_errors": 0}
+        self._item_spans = OrderedDict() # item_id -> [start, end] byte offsets in the ring's write space
+        self.output_latency_s = 0.0
+        self.assets = None # AudioAssetCache, set once assets are loaded
+        self.stream = None; self._worker = None
         try:
-            self.stream = p.open(format=format_player, channels=channels, rate=rate, output=True, frames_per_buffer=chunk_samples_player)
+            if self.output_mode == "callback":
+                self.stream = p.open(format=format_player, channels=channels, rate=rate, output=True, frames_per_buffer=chunk_samples_player, stream_callback=self._stream_callback)
+            else:
+                self.stream = p.open(format=format_player, channels=channels, rate=rate, output=True, frames_per_buffer=chunk_samples_player)
         except Exception as e_pyaudio: log(f"CRITICAL ERROR initializing PyAudio output stream: {e_pyaudio}"); raise
-        self.buffer = b""; self.chunk_bytes = chunk_samples_player * pyaudio.get_sample_size(format_player) * channels
-    def play(self, pcm_bytes):
-        if not self.stream: return
-        self.buffer += pcm_bytes
-        while len(self.buffer) >= self.chunk_bytes:
-            try: self.stream.write(self.buffer[:self.chunk_bytes]); self.buffer = self.buffer[self.chunk_bytes:]
-            except IOError as e: log(f"PCMPlayer IOError during write: {e}. Stream might be closed."); self.close(); break
+        try: self.output_latency_s = float(self.stream.get_output_latency())
+        except Exception: self.output_latency_s = 0.0
+        if self.output_mode == "blocking":
+            self._worker = threading.Thread(target=self._playback_worker, name="PCMPlayerWorker", daemon=True)
+            self._worker.start()
+
+    def _stream_callback(self, in_data, frame_count, time_info, status_flags):
+        # Runs on PortAudio's thread: must return promptly and always exactly frame_count frames
+        if self._stop_event.is_set(): return (bytes(frame_count * self.frame_bytes), pyaudio.paComplete)
+        data = self.jitter.pull(frame_count * self.frame_bytes)
+        self._writing = not self.jitter.priming
+        if self._writing: self.stats["chunks_written"] += 1
+        self.stats["underruns"] = self.jitter.underruns
+        if self._producers_waiting:
+            with self._cond: self._cond.notify_all()
+        return (data, pyaudio.paContinue)
+
+    def _playback_worker(self):
+        was_playing = False # Used to tell a mid-response starvation (underrun) from a normal end
+        while not self._stop_event.is_set():
+            with self._cond:
+                while not self._stop_event.is_set() and len(self.ring) < self.chunk_bytes and not (self._flush_requested and len(self.ring) > 0):
+                    if was_playing and not self._flush_requested:
+                        self.stats["underruns"] += 1
+                    if len(self.ring) == 0: self._flush_requested = False # Fully drained
+                    was_playing = False
+                    self._cond.wait(0.05)
+                if self._stop_event.is_set(): break
+                chunk = self.ring.read(self.chunk_bytes)
+                self._writing = True
+                self._cond.notify_all() # Wake producers waiting for space
+            try:
+                if chunk and self.stream:
+                    self.stream.write(chunk)
+                    self.stats["chunks_written"] += 1
+                    was_playing = True
+            except IOError as e:
+                self.stats["write_errors"] += 1
+                log(f"PCMPlayer IOError during write: {e}. Stream might be closed.")
+                self._stop_event.set()
+            finally:
+                with self._cond:
+                    self._writing = False
+                    self._cond.notify_all()
+
+    def play(self, pcm_bytes, item_id=None):
+        if not self.stream or self._stop_event.is_set() or not pcm_bytes: return
+        if self.jitter: self.jitter.on_arrival(len(pcm_bytes), time.time())
+        with self._cond:
+            if len(self.ring) + len(pcm_bytes) > self.max_queued_bytes: # Backpressure: bounded queue is full
+                self.stats["backpressure_waits"] += 1
+                wait_start = time.time(); self._producers_waiting += 1
+                try: self._cond.wait_for(lambda: len(self.ring) + len(pcm_bytes) <= self.max_queued_bytes or self._stop_event.is_set(), timeout=PLAYER_BACKPRESSURE_TIMEOUT_S)
+                finally: self._producers_waiting -= 1
+                self.stats["backpressure_wait_ms"] += (time.time() - wait_start) * 1000.0
+                if len(self.ring) + len(pcm_bytes) > self.max_queued_bytes:
+                    self.stats["overruns"] += 1; self.stats["dropped_bytes"] += len(pcm_bytes)
+                    if self.jitter: self.jitter.overruns += 1
+                    log(f"PCMPlayer: Queue full ({self.ring.buffered_ms():.0f}ms). Dropped {len(pcm_bytes)} bytes.", logging.WARNING)
+                    return
+            start = self.ring.total_written_bytes
+            self.ring.write(pcm_bytes)
+            if item_id:
+                span = self._item_spans.get(item_id)
+                if span: span[1] = self.ring.total_written_bytes
+                else:
+                    self._item_spans[item_id] = [start, self.ring.total_written_bytes]
+                    while len(self._item_spans) > 32: self._item_spans.popitem(last=False)
+            self._flush_requested = False
+            self.stats["max_queued_ms"] = max(self.stats["max_queued_ms"], self.ring.buffered_ms())
+            self._cond.notify_all()
+    def play_asset(self, name):
+        """Queue a preloaded asset. Returns False if it isn't loaded."""
+        samples = self.assets.get(name) if self.assets else None
+        if samples is None or not samples.size: return False
+        self.play(memoryview(samples).cast('B')) # Ring write is the only copy
+        self.flush() # Short clips may not fill a whole output chunk
+        return True
     def flush(self):
-        if not self.stream or not self.buffer: return
-        try: self.stream.write(self.buffer)
-        except IOError as e: log(f"PCMPlayer IOError during flush: {e}."); self.close()
-        finally: self.buffer = b""
-    def clear(self): self.buffer = b""; log("PCMPlayer: Buffer cleared for barge-in.")
+        """Let the remaining sub-chunk tail play out (non-blocking; see wait_until_drained)."""
+        if self.jitter: self.jitter.mark_end_of_stream(); return
+        with self._cond:
+            if len(self.ring): self._flush_requested = True; self._cond.notify_all()
+    def wait_until_drained(self, timeout_s=None):
+        if self.jitter: # Callback thread doesn't signal on drain; poll
+            deadline = None if timeout_s is None else time.time() + timeout_s
+            while self.is_playing() and not self._stop_event.is_set():
+                if deadline is not None and time.time() >= deadline: return False
+                time.sleep(0.02)
+            return True
+        with self._cond:
+            return self._cond.wait_for(lambda: (len(self.ring) == 0 and not self._writing) or self._stop_event.is_set(), timeout=timeout_s)
+    def _consumed_offset(self): return self.ring.total_read_bytes + self.ring.total_cleared_bytes
+    def played_ms(self, item_id):
+        """Milliseconds of item_id's audio the listener has heard: bytes handed to the device, minus output latency."""
+        with self._cond:
+            span = self._item_spans.get(item_id)
+            if not span: return 0.0
+            heard = min(self._consumed_offset(), span[1]) - span[0]
+        heard -= int(self.output_latency_s * self.bytes_per_second)
+        return max(0, heard) * 1000.0 / self.bytes_per_second
+    def clear(self):
+        with self._cond:
+            cut = self._consumed_offset() # Audio past this point is discarded, never heard
+            for span in self._item_spans.values(): span[1] = max(span[0], min(span[1], cut))
+            if self.jitter: self.jitter.reset()
+            else: self.ring.clear()
+            self._flush_requested = False; self._cond.notify_all()
+        log("PCMPlayer: Buffer cleared for barge-in.")
+    def buffered_bytes(self): return self.ring.buffered_bytes() # Exact queued-but-unplayed depth
+    def buffered_ms(self): return self.ring.buffered_ms()
+    def is_playing(self): return self._writing or len(self.ring) > 0
+    def get_stats(self):
+        stats = {**self.stats, "queued_ms": self.ring.buffered_ms(), "mode": self.output_mode, "output_latency_ms": round(self.output_latency_s * 1000, 1)}
+        if self.jitter: stats["jitter"] = self.jitter.get_stats()
+        return stats
     def close(self):
+        self._stop_event.set()
+        with self._cond: self._cond.notify_all()
+        if self._worker and self._worker.is_alive() and threading.current_thread() is not self._worker: self._worker.join(timeout=1)
         if self.stream:
             try:
                 if self.stream.is_active(): self.stream.stop_stream()
@@ -214,36 +406,57 @@ class PCMPlayer:
             except Exception as e_close: log(f"PCMPlayer error during close: {e_close}")
             finally: self.stream = None; log("PCMPlayer stream closed by main_app.")
 def get_input_stream():
+    if AUDIO_INPUT_REPLAY_WAV:
+        try: return WavReplayStream(AUDIO_INPUT_REPLAY_WAV, rate=INPUT_RATE, frames_per_buffer=INPUT_CHUNK_SAMPLES, speed=AUDIO_INPUT_REPLAY_SPEED, log_fn=log)
+        except Exception as e: log(f"CRITICAL ERROR opening replay WAV '{AUDIO_INPUT_REPLAY_WAV}': {e}", logging.CRITICAL); return None
     try: return p.open(format=FORMAT, channels=CHANNELS, rate=INPUT_RATE, input=True, frames_per_buffer=INPUT_CHUNK_SAMPLES)
     except Exception as e: log(f"CRITICAL ERROR PyAudio input stream: {e}", logging.CRITICAL); return None
 
-def is_speech_detected_by_webrtc_vad(audio_chunk_16khz_pcm16_bytes): # Unchanged
-    # ... (same as before) ...
-    global vad_instance
-    if not WEBRTC_VAD_AVAILABLE or not vad_instance or not audio_chunk_16khz_pcm16_bytes: return False
-    try:
-        if len(audio_chunk_16khz_pcm16_bytes) == VAD_BYTES_PER_FRAME:
-            return vad_instance.is_speech(audio_chunk_16khz_pcm16_bytes, VAD_SAMPLE_RATE)
-        return False
-    except Exception as e_vad: log(f"VAD error: {e_vad}", logging.WARNING); return False
-
-def continuous_audio_pipeline(openai_client_ref): # Unchanged
-    # ... (same extensive logic as before) ...
-    global state_just_changed_to_sending; mic_stream = get_input_stream()
+def continuous_audio_pipeline(openai_client_ref, input_stream=None, stage_timer=None):
+    # input_stream: any object with the PyAudio input stream API (default: the mic, or AUDIO_INPUT_REPLAY_WAV)
+    # stage_timer: optional audio_replay.StageTimer collecting per-stage CPU time
+    global state_just_changed_to_sending; mic_stream = input_stream or get_input_stream()
     if not mic_stream: log("CRITICAL: Mic stream failed. Pipeline cannot start.", logging.CRITICAL); return
     # ... (rest of the function as provided in the previous step, including VAD, WW, sending to OpenAI)
     # Ensure the while loop correctly checks openai_client_ref.keep_outer_loop_running
     log("Mic stream opened. Audio pipeline started.")
-    local_vad_speech_frames_count = 0; local_vad_silence_frames_after_speech = 0
     local_interrupt_cooldown_frames_remaining = 0
-    wf_raw = None; wf_processed = None
+    barge_in = BargeInDetector(vad_instance, sample_rate=VAD_SAMPLE_RATE, subframe_ms=BARGE_IN_SUBFRAME_MS, min_speech_ms=BARGE_IN_MIN_SPEECH_MS,
+                               hangover_ms=BARGE_IN_HANGOVER_MS, gate_dbfs=BARGE_IN_GATE_DBFS, gate_margin_db=BARGE_IN_GATE_MARGIN_DB)
+    barge_in_was_armed = False
+    endpointer = None
+    if APP_CONFIG["LOCAL_ENDPOINTING"] in ("shadow", "on"):
+        if vad_instance: endpointer = LocalEndpointer(vad_instance, sample_rate=VAD_SAMPLE_RATE, subframe_ms=BARGE_IN_SUBFRAME_MS, silence_ms=LOCAL_ENDPOINT_SILENCE_MS,
+                                                      min_speech_ms=LOCAL_ENDPOINT_MIN_SPEECH_MS, gate_dbfs=BARGE_IN_GATE_DBFS)
+        else: log(f"LOCAL_ENDPOINTING={APP_CONFIG['LOCAL_ENDPOINTING']} needs webrtcvad. Server VAD will end turns.", logging.WARNING)
+    mic_recorder = None
+    # One resampler per pipeline; its 16kHz output feeds both local VAD and wake word
+    # reuse_output: audio_np_16k is a view that is only valid for the current loop iteration
+    mic_resampler_16k = StreamingResampler(INPUT_RATE, VAD_SAMPLE_RATE, reuse_output=True)
+    mic_resampler_fed_last_chunk = False
+    # Last WAKE_WORD_PREROLL_MS of mic audio while listening; flushed to OpenAI when the wake word fires
+    wake_preroll = PreRollBuffer(WAKE_WORD_PREROLL_MS, CHUNK_MS)
+    greeting_holdback = PreRollBuffer(BARGE_IN_MIN_SPEECH_MS + 300, CHUNK_MS) # Mic audio held while a local wake greeting plays
+    silence_gate = SilenceGate(SEND_SILENCE_GATE_DBFS, SEND_SILENCE_GATE_HANGOVER_MS, SEND_SILENCE_GATE_PADDING_MS,
+                               SEND_SILENCE_GATE_PREROLL_MS, CHUNK_MS, INPUT_RATE) if SEND_SILENCE_GATE_ENABLED else None
+    st = stage_timer
+    audio_worker = None; worker_ww_listening = False; pipeline_chunk_count = 0
+    if AUDIO_WORKER_PROCESS and (wake_word_active or (LOCAL_VAD_ENABLED and WEBRTC_VAD_AVAILABLE)):
+        try:
+            audio_worker = AudioWorkerProcess({"enabled": LOCAL_VAD_ENABLED and WEBRTC_VAD_AVAILABLE, "mode": 0, "sample_rate": VAD_SAMPLE_RATE,
+                                               "subframe_samples": VAD_SAMPLE_RATE * BARGE_IN_SUBFRAME_MS // 1000, "volume_factor": 0.20}, log_fn=log)
+        except Exception as e_worker: log(f"ERROR starting audio worker process: {e_worker}. Using in-process wake word/VAD.", logging.ERROR)
     
     # Audio sending counter
     audio_send_counter = 0
-    try:
-        wf_raw = wave.open("mic_capture_raw.wav", 'wb'); wf_raw.setnchannels(CHANNELS); wf_raw.setsampwidth(p.get_sample_size(FORMAT)); wf_raw.setframerate(INPUT_RATE)
-        wf_processed = wave.open("mic_capture_processed.wav", 'wb'); wf_processed.setnchannels(CHANNELS); wf_processed.setsampwidth(p.get_sample_size(FORMAT)); wf_processed.setframerate(INPUT_RATE)
-    except Exception as e_wav_open: log(f"ERROR opening WAV files: {e_wav_open}", logging.ERROR); wf_raw=None; wf_processed=None
+    if MIC_CAPTURE_ENABLED:
+        # Only the raw stream is recorded: no processing is applied before sending, so a
+        # separate "processed" capture would be byte-identical.
+        try:
+            mic_recorder = MicCaptureRecorder(MIC_CAPTURE_DIR, INPUT_RATE, CHANNELS, p.get_sample_size(FORMAT), prefix="mic_capture_raw",
+                                              codec=MIC_CAPTURE_CODEC, segment_s=MIC_CAPTURE_SEGMENT_S, max_segments=MIC_CAPTURE_MAX_SEGMENTS,
+                                              max_age_hours=MIC_CAPTURE_MAX_AGE_HOURS, log_fn=log)
+        except Exception as e_rec_open: log(f"ERROR starting mic capture recorder: {e_rec_open}", logging.ERROR); mic_recorder = None
 
     try:
         while True:
@@ -255,6 +468,7 @@ def continuous_audio_pipeline(openai_client_ref): # Unchanged
             
             # Get current state at beginning of loop iteration
             current_pipeline_app_state_iter = get_app_state_main()
+            if st: st.start()
             
             # --- Mic Read and VAD/WW/OpenAI Send Logic (as before) ---
             raw_audio_bytes_24k = b''
@@ -263,73 +477,105 @@ def continuous_audio_pipeline(openai_client_ref): # Unchanged
                     raw_audio_bytes_24k = mic_stream.read(INPUT_CHUNK_SAMPLES, exception_on_overflow=False)
                     expected_len = INPUT_CHUNK_SAMPLES * pyaudio.get_sample_size(FORMAT) * CHANNELS
                     if len(raw_audio_bytes_24k) != expected_len: raw_audio_bytes_24k = b'' # Discard partial
+                elif getattr(mic_stream, "exhausted", False): log("Replay audio source finished. Exiting audio loop.", logging.INFO); break
                 else: time.sleep(CHUNK_MS / 1000.0); continue
             except IOError as e: log(f"IOError reading PyAudio stream: {e}. Exiting audio loop.", logging.ERROR); break
             if not raw_audio_bytes_24k: continue
+            if st: st.lap("read")
 
-            if wf_raw: wf_raw.writeframes(raw_audio_bytes_24k)
-            if wf_processed: wf_processed.writeframes(raw_audio_bytes_24k) # Assuming raw for processed for now
+            if mic_recorder: mic_recorder.write(raw_audio_bytes_24k) # Non-blocking; disk I/O happens on the recorder thread
+            if st: st.lap("record")
 
-            # --- Local VAD for Barge-in ---
+            samples_24k = np.frombuffer(raw_audio_bytes_24k, dtype=np.int16) # View, shared by the gates below
+            # --- Barge-in stage 1: energy gate on the raw chunk decides whether resample + VAD run at all ---
+            need_local_vad = local_interrupt_cooldown_frames_remaining == 0 and LOCAL_VAD_ENABLED and WEBRTC_VAD_AVAILABLE and \
+                 current_pipeline_app_state_iter == STATE_SENDING_TO_OPENAI and openai_client_ref.is_assistant_speaking() and \
+                 openai_client_ref.get_current_assistant_speech_duration_ms() > LOCAL_VAD_ACTIVATION_THRESHOLD_MS
+            if need_local_vad:
+                if not barge_in_was_armed: barge_in.reset() # New assistant turn (or end of cooldown): start counting afresh
+                need_local_vad = barge_in.gate(samples_24k, CHUNK_MS)
+                barge_in_was_armed = True
+            else:
+                barge_in_was_armed = False
+            # Local endpointing only while the user has the floor (no assistant audio for the mic to pick up)
+            need_endpoint = endpointer is not None and current_pipeline_app_state_iter == STATE_SENDING_TO_OPENAI and \
+                 not openai_client_ref.is_assistant_speaking() and not getattr(openai_client_ref, 'goodbye_in_progress', False)
+            need_endpoint_vad = need_endpoint and endpointer.gate(samples_24k, CHUNK_MS)
+            if endpointer and not need_endpoint: endpointer.reset()
+            if st: st.lap("gate")
+
+            # --- Shared 24k -> 16k resample (once per chunk, only if a consumer needs it) ---
+            need_ww = current_pipeline_app_state_iter == STATE_LISTENING_FOR_WAKEWORD and wake_word_active
+            audio_np_16k = None
+            if need_local_vad or need_ww or need_endpoint_vad:
+                if not mic_resampler_fed_last_chunk: mic_resampler_16k.reset() # Don't filter across a gap
+                try: audio_np_16k = mic_resampler_16k.process(samples_24k)
+                except Exception as e_resample: log(f"Error resampling mic chunk to 16kHz: {e_resample}", logging.WARNING)
+                mic_resampler_fed_last_chunk = True
+            else:
+                mic_resampler_fed_last_chunk = False
+            if st: st.lap("resample")
+
+            # --- Out-of-process wake word/VAD: hand this chunk over, collect earlier results (one chunk behind) ---
+            worker_vad_decisions = []; worker_ww_hit = False
+            if audio_worker:
+                pipeline_chunk_count += 1
+                if pipeline_chunk_count % 100 == 0 and not audio_worker.is_alive():
+                    log("Audio worker process died. Falling back to in-process wake word/VAD.", logging.ERROR)
+                    audio_worker.stop(); audio_worker = None
+            if audio_worker:
+                if need_ww and not worker_ww_listening: audio_worker.reset_wake_word() # Fresh detector state per listening period
+                worker_ww_listening = need_ww
+                if audio_np_16k is not None and audio_np_16k.size > 0 and (need_local_vad or need_ww):
+                    audio_worker.submit(audio_np_16k, need_local_vad, need_ww)
+                for kind, _seq, value in audio_worker.poll_results():
+                    if kind == "vad" and barge_in_was_armed: worker_vad_decisions.extend(value)
+                    elif kind == "wake" and need_ww: worker_ww_hit = True; wake_word_detector_instance.last_detected_model = value
+                if st: st.lap("worker_ipc")
+
+            # --- Barge-in stage 2: 10 ms sub-frame VAD with hangover ---
             if local_interrupt_cooldown_frames_remaining > 0:
                 local_interrupt_cooldown_frames_remaining -=1
-            elif LOCAL_VAD_ENABLED and WEBRTC_VAD_AVAILABLE and SCIPY_AVAILABLE and \
-                 current_pipeline_app_state_iter == STATE_SENDING_TO_OPENAI and openai_client_ref.is_assistant_speaking() and \
-                 openai_client_ref.get_current_assistant_speech_duration_ms() > LOCAL_VAD_ACTIVATION_THRESHOLD_MS:
+            elif barge_in_was_armed:
                 try:
-                    audio_np_24k = np.frombuffer(raw_audio_bytes_24k, dtype=np.int16)
-                    num_samples_16k = int(len(audio_np_24k) * VAD_SAMPLE_RATE / INPUT_RATE)
-                    if num_samples_16k > 0:
-                        audio_np_16k_float = signal.resample(audio_np_24k.astype(np.float32), num_samples_16k)
-                        audio_np_16k_scaled = (audio_np_16k_float.astype(np.int16) * 0.20).astype(np.int16)  # VAD_VOLUME_REDUCTION_FACTOR = 0.20
-                        vad_chunk = audio_np_16k_scaled.tobytes()
-                        # Ensure vad_chunk is exactly VAD_BYTES_PER_FRAME
-                        if len(vad_chunk) > VAD_BYTES_PER_FRAME: vad_chunk = vad_chunk[:VAD_BYTES_PER_FRAME]
-                        elif len(vad_chunk) < VAD_BYTES_PER_FRAME and len(vad_chunk) > 0 : vad_chunk += b'\x00' * (VAD_BYTES_PER_FRAME - len(vad_chunk))
-                        
-                        if len(vad_chunk) == VAD_BYTES_PER_FRAME and is_speech_detected_by_webrtc_vad(vad_chunk):
-                            local_vad_speech_frames_count += 1
-                            local_vad_silence_frames_after_speech = 0
-                            log(f"LOCAL_VAD: Speech detected - Frame count: {local_vad_speech_frames_count}/{MIN_SPEECH_FRAMES_FOR_LOCAL_INTERRUPT}", logging.DEBUG)
-                            if local_vad_speech_frames_count >= MIN_SPEECH_FRAMES_FOR_LOCAL_INTERRUPT:
-                                log(f"LOCAL_VAD: User speech INTERRUPT detected.", logging.DEBUG)
-                                openai_client_ref.handle_local_user_speech_interrupt()
-                                local_interrupt_cooldown_frames_remaining = LOCAL_INTERRUPT_COOLDOWN_FRAMES
-                                local_vad_speech_frames_count = 0
-                        elif local_vad_speech_frames_count > 0: # Speech was detected, now silence
-                            local_vad_silence_frames_after_speech += 1
-                            log(f"LOCAL_VAD: Silence after speech - Count: {local_vad_silence_frames_after_speech}/{MIN_SILENCE_FRAMES_TO_RESET_LOCAL_VAD_STATE}", logging.DEBUG)
-                            if local_vad_silence_frames_after_speech >= MIN_SILENCE_FRAMES_TO_RESET_LOCAL_VAD_STATE:
-                                log("LOCAL_VAD: Reset due to silence threshold reached", logging.DEBUG)
-                                local_vad_speech_frames_count = 0
-                                local_vad_silence_frames_after_speech = 0
+                    if audio_worker: barge_in_fired = barge_in.push_decisions(worker_vad_decisions)
+                    else: barge_in_fired = need_local_vad and barge_in.process_16k(audio_np_16k)
+                    if barge_in_fired:
+                        log(f"LOCAL_VAD: User speech INTERRUPT detected ({barge_in.min_speech_ms:.0f} ms of speech, gate {barge_in.gate_threshold_db():.1f} dBFS).", logging.DEBUG)
+                        openai_client_ref.handle_local_user_speech_interrupt()
+                        local_interrupt_cooldown_frames_remaining = LOCAL_INTERRUPT_COOLDOWN_FRAMES
                 except Exception as e_vad_proc: log(f"Error in local VAD processing: {e_vad_proc}", logging.WARNING)
-            else: # Reset if not in VAD check conditions
-                local_vad_speech_frames_count = 0; local_vad_silence_frames_after_speech = 0
+            if need_endpoint_vad: endpointer.process_16k(audio_np_16k)
+            if endpointer and endpointer.pop_endpoint() and hasattr(openai_client_ref, 'handle_local_endpoint'):
+                openai_client_ref.handle_local_endpoint()
+            if st: st.lap("vad")
 
             # --- Wake Word Detection ---
-            if current_pipeline_app_state_iter == STATE_LISTENING_FOR_WAKEWORD and wake_word_active:
-                audio_for_ww = b''
-                if SCIPY_AVAILABLE:
-                    try:
-                        audio_np_24k_ww = np.frombuffer(raw_audio_bytes_24k, dtype=np.int16)
-                        num_samples_16k_ww = int(len(audio_np_24k_ww) * WAKE_WORD_PROCESS_RATE / INPUT_RATE)
-                        if num_samples_16k_ww > 0:
-                            audio_np_16k_ww_float = signal.resample(audio_np_24k_ww.astype(np.float32), num_samples_16k_ww)
-                            audio_for_ww = audio_np_16k_ww_float.astype(np.int16).tobytes()
-                    except Exception as e_ww_resample: log(f"Error resampling for WW: {e_ww_resample}", logging.WARNING)
-                elif INPUT_RATE == WAKE_WORD_PROCESS_RATE: # No resampling needed if rates match
-                    audio_for_ww = raw_audio_bytes_24k
-                
-                if audio_for_ww and wake_word_detector_instance.process_audio(audio_for_ww):
-                    log_section(f"WAKE WORD DETECTED: '{wake_word_detector_instance.wake_word_model_name.upper()}'!")
+            if current_pipeline_app_state_iter == STATE_LISTENING_FOR_WAKEWORD: wake_preroll.push(raw_audio_bytes_24k)
+            else: wake_preroll.clear()
+            if silence_gate and current_pipeline_app_state_iter != STATE_SENDING_TO_OPENAI: silence_gate.reset() # Start each conversation open
+            if need_ww:
+                if audio_worker: ww_hit = worker_ww_hit
+                else:
+                    ww_hit = audio_np_16k is not None and audio_np_16k.size > 0 and wake_word_detector_instance.process_audio(audio_np_16k)
+                if ww_hit:
+                    log_section(f"WAKE WORD DETECTED: '{(getattr(wake_word_detector_instance, 'last_detected_model', None) or wake_word_detector_instance.wake_word_model_name).upper()}'!")
                     set_app_state_main(STATE_SENDING_TO_OPENAI)
                     if hasattr(wake_word_detector_instance, 'reset'): wake_word_detector_instance.reset()
                     # Send wake-up greeting message to provide fresh context
                     if openai_client_ref and hasattr(openai_client_ref, 'send_wake_up_message'):
-                        openai_client_ref.send_wake_up_message()
+                        if openai_client_ref.send_wake_up_message():
+                            # Greeted from the local TTS cache: let server VAD trigger the reply to the user's request
+                            state_just_changed_to_sending = False
                         log("*** Sent wake-up greeting context to LLM ***", logging.INFO)
+                    # Speech that started in the same breath as the wake word (incl. this chunk) goes out as one append
+                    preroll_ms = wake_preroll.duration_ms(); preroll_audio = wake_preroll.drain()
+                    if preroll_audio and openai_client_ref.connected:
+                        openai_client_ref.send_audio_append(preroll_audio, preroll_ms)
+                        openai_client_ref.flush_audio_appends()
+                        log(f"Sent {preroll_ms:.0f} ms of wake word pre-roll audio to OpenAI.", logging.INFO)
                     log("*** Wake word detected! Sending audio to OpenAI... ***", logging.INFO)
+            if st: st.lap("wake_word")
 
             if current_pipeline_app_state_iter == STATE_SENDING_TO_OPENAI and raw_audio_bytes_24k:
                 # Check if goodbye is in progress - if so, don't send user audio to OpenAI
@@ -337,28 +583,40 @@ def continuous_audio_pipeline(openai_client_ref): # Unchanged
                     # Skip sending user audio during goodbye sequence
                     continue
                     
+                # Local wake greeting playing: hold the mic back so its echo can't reach server VAD as user speech.
+                # If the user talks over it (local barge-in stops it), their held speech onset goes out first
+                if hasattr(openai_client_ref, 'is_local_greeting_playing') and openai_client_ref.is_local_greeting_playing():
+                    greeting_holdback.push(raw_audio_bytes_24k)
+                    continue
+                if greeting_holdback.duration_ms():
+                    held_ms = greeting_holdback.duration_ms(); held_audio = greeting_holdback.drain()
+                    if openai_client_ref.pop_local_greeting_interrupted() and openai_client_ref.connected:
+                        openai_client_ref.send_audio_append(held_audio, held_ms)
+
                 if openai_client_ref.connected: # Send only if connected
+                    was_open = silence_gate.is_open if silence_gate else True
+                    segments = silence_gate.process(raw_audio_bytes_24k) if silence_gate else [(raw_audio_bytes_24k, CHUNK_MS)]
+                    if silence_gate and was_open != silence_gate.is_open:
+                        if silence_gate.is_open: log(f"🎤 SILENCE GATE: Speech resumed, sending {segments[0][1]:.0f} ms incl. pre-roll", logging.DEBUG)
+                        else: log(f"🎤 SILENCE GATE: Paused sending after {SEND_SILENCE_GATE_HANGOVER_MS:.0f} ms of quiet ({silence_gate.bytes_saved} bytes saved so far)", logging.DEBUG)
                     # Increment counter and log periodically
-                    audio_send_counter += 1
-                    if audio_send_counter % 75 == 0:  # Log every 75th message
+                    if segments: audio_send_counter += 1
+                    if segments and audio_send_counter % 75 == 0:  # Log every 75th message
                         log(f"🎤 AUDIO: Sent {audio_send_counter} chunks to OpenAI", logging.INFO)
                         
-                    audio_b64_str = base64.b64encode(raw_audio_bytes_24k).decode('utf-8')
-                    audio_msg_to_send = {"type": "input_audio_buffer.append", "audio": audio_b64_str}
                     try:
-                        if hasattr(openai_client_ref.ws_app, 'send'):
-                            openai_client_ref.ws_app.send(json.dumps(audio_msg_to_send))
-                            if state_just_changed_to_sending:
-                                # Log initial response create message
-                                log("🎙️ CONVERSATION: Initiating new assistant response", logging.INFO)
-                                # Directly use the string without any get() calls
-                                voice_to_use = "ash"  # Hardcoded for now to bypass any potential issues
-                                response_create_payload = {"type": "response.create", "response": {"modalities": ["text", "audio"], "voice": APP_CONFIG.get("OPENAI_VOICE", "ash"), "output_audio_format": "pcm16"}}
-                                openai_client_ref.ws_app.send(json.dumps(response_create_payload))
-                                state_just_changed_to_sending = False
+                        # Queued on the client's single outbound writer; coalesced into larger append frames there
+                        for segment_bytes, segment_ms in segments: openai_client_ref.send_audio_append(segment_bytes, segment_ms)
+                        if state_just_changed_to_sending:
+                            # Log initial response create message
+                            log("🎙️ CONVERSATION: Initiating new assistant response", logging.INFO)
+                            response_create_payload = {"type": "response.create", "response": {"modalities": ["text", "audio"], "voice": APP_CONFIG.get("OPENAI_VOICE", "ash"), "output_audio_format": "pcm16"}}
+                            openai_client_ref.send_event(response_create_payload)
+                            state_just_changed_to_sending = False
                     except Exception as e_send_ws:
-                        log(f"❌ ERROR: Failed to send audio: {e_send_ws}", logging.WARNING)
+                        log(f"❌ ERROR: Failed to queue audio: {e_send_ws}", logging.WARNING)
                         # Let client's run_client handle major disconnects
+                    if st: st.lap("send")
             # ... rest of VAD/WW logic ...
 
     except KeyboardInterrupt: log("KeyboardInterrupt in audio pipeline.", logging.INFO)
@@ -366,8 +624,15 @@ def continuous_audio_pipeline(openai_client_ref): # Unchanged
     finally:
         log("Audio pipeline stopping. Closing mic stream...", logging.INFO)
         if mic_stream: mic_stream.close()
-        if wf_raw: wf_raw.close()
-        if wf_processed: wf_processed.close()
+        if audio_worker: audio_worker.stop()
+        log(f"Barge-in detector stats: {barge_in.stats}", logging.INFO)
+        if silence_gate: log(f"Send silence gate stats: {silence_gate.get_stats()}", logging.INFO)
+        if endpointer:
+            log(f"Local endpointer stats: {endpointer.stats}", logging.INFO)
+            if hasattr(openai_client_ref, 'get_endpointing_stats'): log(f"Endpointing turn metrics: {openai_client_ref.get_endpointing_stats()}", logging.INFO)
+        if mic_recorder:
+            mic_recorder.close()
+            log(f"Mic capture recorder stats: {mic_recorder.stats}", logging.INFO)
 
 
 # --- Phase 4: DB Monitor Thread ---
@@ -451,6 +716,8 @@ def db_monitor_thread_func(shutdown_event: threading.Event, openai_client_ref=No
             for job_row in jobs_to_notify:
                 job = dict(job_row) # Convert to dict
                 log(f"DB_MONITOR: Found un-notified completed job ID: {job['id']}, Contact: {job['contact_name']}, Status: {job['overall_status']}", logging.INFO)
+                if hasattr(openai_client_ref, 'prerender_update_announcement'):
+                    openai_client_ref.prerender_update_announcement(job['contact_name']) # No-op once cached
                 
                 payload = {
                     "type": "new_call_update_available",
@@ -527,24 +794,29 @@ if __name__ == "__main__":
 
     try: player_instance = PCMPlayer()
     except Exception as e_player_init: log(f"CRITICAL: PCMPlayer init failed: {e_player_init}. Exiting.", logging.CRITICAL); p and p.terminate(); exit(1)
+    asset_specs = parse_asset_spec(PLAYER_ASSETS, os.path.dirname(os.path.abspath(__file__)))
+    if asset_specs:
+        player_instance.assets = AudioAssetCache(PLAYER_ASSET_CACHE_DIR, sample_rate=OUTPUT_RATE, log_fn=log)
+        log(f"Player assets: {player_instance.assets.load_all(asset_specs)}/{len(asset_specs)} loaded ({player_instance.assets.stats})")
 
     log(f"Initial App State: {current_app_state} (WW Active: {wake_word_active})")
     log(f"OpenAI Model: {OPENAI_REALTIME_MODEL_ID}")
     log(f"Audio Rates: MicIn={INPUT_RATE}Hz, PlayerOut={OUTPUT_RATE}Hz, WWProcess={WAKE_WORD_PROCESS_RATE}Hz")
-    log(f"Local VAD (WebRTC) Enabled: {LOCAL_VAD_ENABLED and WEBRTC_VAD_AVAILABLE and SCIPY_AVAILABLE}")
+    log(f"Local VAD (WebRTC) Enabled: {LOCAL_VAD_ENABLED and WEBRTC_VAD_AVAILABLE}")
     if wake_word_active and wake_word_detector_instance: log(f"WW ACTIVE: Model='{wake_word_detector_instance.wake_word_model_name}'.")
     else: log("WW INACTIVE or model/resampling issue.", logging.WARNING)
     log(f"Display API URL: {APP_CONFIG.get('FASTAPI_DISPLAY_API_URL', 'Not Set')}")
     log(f"UI Status Update URL: {APP_CONFIG.get('FASTAPI_UI_STATUS_UPDATE_URL', 'Not Set')}")
     log(f"Notify Call Update URL: {APP_CONFIG.get('FASTAPI_NOTIFY_CALL_UPDATE_URL', 'Not Set')}")
     log(f"TSM Playback Speed: {APP_CONFIG.get('TSM_PLAYBACK_SPEED', '1.0')} (1.0 = TSM disabled, direct play)")
+    log(f"OpenAI input audio format: {'g711_ulaw (8kHz)' if APP_CONFIG['USE_ULAW_FOR_OPENAI_INPUT'] else 'pcm16 (24kHz)'}")
 
     ws_full_url = f"wss://api.openai.com/v1/realtime?model={OPENAI_REALTIME_MODEL_ID}"
     auth_headers = ["Authorization: Bearer " + OPENAI_API_KEY, "OpenAI-Beta: realtime=v1"]
     # Make sure OPENAI_VOICE is a string, not a complex object
     APP_CONFIG["OPENAI_VOICE"] = APP_CONFIG.get("OPENAI_VOICE", "ash")
     # Match exactly the format in working openai_client.py
-    client_config = {**APP_CONFIG, "CHUNK_MS": CHUNK_MS, "USE_ULAW_FOR_OPENAI_INPUT": False }
+    client_config = {**APP_CONFIG, "CHUNK_MS": CHUNK_MS }
 
     try:
         openai_client_instance = OpenAISpeechClient(
@@ -0,0 +1,129 @@
+# mic_recorder.py
+"""
+Background mic capture recorder.
+
+continuous_audio_pipeline used to call wave.writeframes() on two ever-growing
+files from inside its 30 ms capture loop. MicCaptureRecorder takes frames
+through a bounded queue (never blocks; frames are dropped and counted if the
+disk falls behind) and a writer thread stores them as time-segmented files,
+deleting the oldest segments beyond the retention limits.
+
+Codecs: "wav" (PCM16) or "flac" (lossless, ~50% smaller; needs soundfile).
+"""
+
+import os
+import glob
+import queue
+import threading
+import time
+import wave
+from datetime import datetime
+
+import numpy as np
+
+try:
+    import soundfile as sf
+    SOUNDFILE_AVAILABLE = True
+except ImportError:
+    SOUNDFILE_AVAILABLE = False
+
+
+class MicCaptureRecorder:
+    def __init__(self, directory: str, sample_rate: int, channels: int = 1, sample_width: int = 2,
+                 prefix: str = "mic_capture_raw", codec: str = "wav", segment_s: float = 300.0,
+                 max_segments: int = 24, max_age_hours: float = 0.0, queue_max_chunks: int = 500,
+                 log_fn=print):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self.prefix = prefix
+        self.segment_s = segment_s
+        self.max_segments = max_segments # 0 = unlimited
+        self.max_age_hours = max_age_hours # 0 = unlimited
+        self.log = log_fn
+        self.codec = codec.lower()
+        if self.codec == "flac" and not SOUNDFILE_AVAILABLE:
+            self.log("MicCaptureRecorder: soundfile not installed; falling back to WAV.")
+            self.codec = "wav"
+        elif self.codec not in ("wav", "flac"):
+            self.log(f"MicCaptureRecorder: Unknown codec '{codec}'; using WAV.")
+            self.codec = "wav"
+
+        self._queue = queue.Queue(maxsize=queue_max_chunks)
+        self._writer = None
+        self._segment_started_at = 0.0
+        self._segment_path = None
+        self.stats = {"chunks_written": 0, "chunks_dropped": 0, "segments_opened": 0, "segments_deleted": 0, "write_errors": 0}
+        os.makedirs(self.directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="MicCaptureRecorder", daemon=True)
+        self._thread.start()
+        self.log(f"MicCaptureRecorder: Writing '{self.prefix}' to '{self.directory}' ({self.codec}, {self.segment_s:.0f}s segments, keep {self.max_segments or 'all'}).")
+
+    # --- Capture-loop side (must never block) ---
+    def write(self, pcm_bytes: bytes):
+        try:
+            self._queue.put_nowait(pcm_bytes)
+        except queue.Full:
+            self.stats["chunks_dropped"] += 1
+
+    def close(self, timeout_s: float = 2.0):
+        try: self._queue.put(None, timeout=timeout_s)
+        except queue.Full: self.log("MicCaptureRecorder: Queue full on close; remaining frames discarded.")
+        self._thread.join(timeout=timeout_s)
+
+    # --- Writer thread ---
+    def _run(self):
+        while True:
+            chunk = self._queue.get()
+            if chunk is None: break
+            try:
+                if self._writer is None or (time.time() - self._segment_started_at) >= self.segment_s:
+                    self._rotate()
+                if self.codec == "flac":
+                    self._writer.write(np.frombuffer(chunk, dtype=np.int16))
+                else:
+                    self._writer.writeframes(chunk)
+                self.stats["chunks_written"] += 1
+            except Exception as e:
+                self.stats["write_errors"] += 1
+                if self.stats["write_errors"] <= 5: self.log(f"MicCaptureRecorder: Write error: {e}")
+                self._close_segment()
+        self._close_segment()
+
+    def _rotate(self):
+        self._close_segment()
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3] # ms, so short segments never collide
+        self._segment_path = os.path.join(self.directory, f"{self.prefix}_{stamp}.{self.codec}")
+        if self.codec == "flac":
+            self._writer = sf.SoundFile(self._segment_path, mode="w", samplerate=self.sample_rate,
+                                        channels=self.channels, subtype="PCM_16", format="FLAC")
+        else:
+            self._writer = wave.open(self._segment_path, "wb")
+            self._writer.setnchannels(self.channels)
+            self._writer.setsampwidth(self.sample_width)
+            self._writer.setframerate(self.sample_rate)
+        self._segment_started_at = time.time()
+        self.stats["segments_opened"] += 1
+        self._apply_retention()
+
+    def _close_segment(self):
+        if self._writer is not None:
+            try: self._writer.close()
+            except Exception as e: self.log(f"MicCaptureRecorder: Error closing segment: {e}")
+            self._writer = None
+
+    def _apply_retention(self):
+        segments = sorted(glob.glob(os.path.join(self.directory, f"{self.prefix}_*.*")), key=os.path.getmtime)
+        segments = [s for s in segments if s != self._segment_path]
+        to_delete = []
+        if self.max_segments > 0 and len(segments) + 1 > self.max_segments:
+            to_delete.extend(segments[:len(segments) + 1 - self.max_segments])
+        if self.max_age_hours > 0:
+            cutoff = time.time() - self.max_age_hours * 3600
+            to_delete.extend(s for s in segments if os.path.getmtime(s) < cutoff and s not in to_delete)
+        for path in to_delete:
+            try:
+                os.remove(path); self.stats["segments_deleted"] += 1
+            except OSError as e:
+                self.log(f"MicCaptureRecorder: Could not delete old segment '{path}': {e}")
@@ -2,11 +2,11 @@
 import json
 import base64
 import time
+import random
 import threading
 import numpy as np
-from pytsmod import wsola
 import websocket
-import openai # For synchronous LLM call in on_open
+import openai # For the synchronous summarizer call (background context priming)
 from datetime import datetime as dt, timezone # Alias for datetime, import timezone
 import os # For path joining
 import requests # For Phase 4 frontend notifications
@@ -16,6 +16,14 @@ from tools_definition import ALL_TOOLS, END_CONVERSATION_TOOL_NAME
 # tool_definition imports (assuming all necessary names are included in ALL_TOOLS)
 from tool_executor import TOOL_HANDLERS # Assuming this is kept up-to-date
 from llm_prompt_config import INSTRUCTIONS as LLM_DEFAULT_INSTRUCTIONS
+from audio_tsm import TSMWorker # Streaming WSOLA on its own thread
+from ws_sender import OutboundSender # Single outbound websocket writer with append coalescing
+from g711_codec import UlawInputEncoder # 24k PCM16 -> 8k G.711 u-law for g711_ulaw input sessions
+from realtime_events import parse_event, scan_audio_delta # Fast-path scan for response.audio.delta, orjson when installed
+from tts_audio_cache import TTSAudioCache # Persistent pre-rendered PCM for greetings and announcements
+from session_rotator import SessionRotator # Swaps in a primed standby session before expires_at
+from conversation_summary import RollingSummarizer # Persisted rolling history summary, folded in the background
+from context_replay import REPLAY_ITEM_PREFIX, load_replay_frames # Warm restore: recent turns re-created as conversation items
 
 # --- Phase 2 & 3 Imports ---
 from conversation_history_db import add_turn as log_conversation_turn
@@ -27,6 +35,7 @@ CONTEXT_HISTORY_LIMIT = 30  # Increased for better context retention
 BASE_DIR_CLIENT = os.path.dirname(os.path.abspath(__file__))
 SCHEDULED_CALLS_DB_PATH = os.path.join(BASE_DIR_CLIENT, "scheduled_calls.db")
 CONTEXT_SUMMARIZER_MODEL = os.getenv("CONTEXT_SUMMARIZER_MODEL", "gpt-4o-mini") # Use env var or fallback
+LOCAL_GREETING_ITEM_PREFIX = "local_greeting_" # Player/item id of a wake greeting played from the TTS cache (never sent to the server)
 
 
 class OpenAISpeechClient:
@@ -48,12 +57,18 @@ class OpenAISpeechClient:
         self.ws_app = None
         self.connected = False
         self.session_id = None
+        self.session_expires_at = 0 # expires_at of the active session (session.created)
+        self._ws_swap_lock = threading.Lock()
+        self._ws_handoff_thread = None # Set when a rotated standby takes over; run_client follows it instead of reconnecting
+        self.last_activity_t = time.time() # Last speech / response / tool event; rotation waits for a quiet gap
+        self._user_speaking = False
+        self._tools_in_flight = 0 # Incremented on the websocket thread, decremented by tool threads; guarded by _tools_lock
+        self._tools_lock = threading.Lock()
         self.accumulated_tool_args = {}
         self.current_assistant_text_response = ""
 
         self.last_assistant_item_id = None
-        self.current_assistant_item_played_ms = 0
-        self.client_audio_chunk_duration_ms = self.config.get("CHUNK_MS", 30)
+        self.current_assistant_item_received_ms = 0 # Audio received for the item; what was heard comes from the player clock
         self.client_initiated_truncated_item_ids = set()
         
         # Pending sleep state for delayed transitions
@@ -67,20 +82,56 @@ class OpenAISpeechClient:
         # Audio logging counters
         self.audio_received_counter = 0
         self.audio_sent_counter = 0
+        self._event_handlers = self._build_event_handlers()
+        # History summary + call updates for the instructions. on_open sends the cached copy immediately and
+        # _refresh_primed_context follows up with a fresh one in the background
+        # "summary": new sessions get the history summary in their instructions. "replay": the last turns are
+        # re-created as conversation items instead (no summarizer), capped by CONTEXT_REPLAY_TOKEN_BUDGET
+        self.context_restore_mode = str(self.config.get("CONTEXT_RESTORE_MODE", "summary")).lower()
+        self.replay_max_turns = int(self.config.get("CONTEXT_REPLAY_MAX_TURNS", 20))
+        self.replay_token_budget = int(self.config.get("CONTEXT_REPLAY_TOKEN_BUDGET", 2000))
+        self._replay_last_item_id = None; self._replay_started_t = 0.0
+        self._primed_context = ""
+        self._primed_job_ids = [] # Call update jobs in _primed_context; counted as presented when it reaches the live session
+        self._last_good_summary = ""
+        self._sent_primed_context = None
+        self._connection_generation = 0
+        self.primed_context_timeout_s = float(self.config.get("PRIMED_CONTEXT_TIMEOUT_S", 10))
+        record_path = self.config.get("REALTIME_TRAFFIC_RECORD_PATH")
+        self._traffic_record_file = open(record_path, "a", encoding="utf-8") if record_path else None # Raw frames, one per line
 
         self.use_ulaw_for_openai = self.config.get("USE_ULAW_FOR_OPENAI_INPUT", False)
+        # The session advertises g711_ulaw in that case, so every append must really be 8 kHz u-law
+        self.ulaw_encoder = UlawInputEncoder(input_rate_hz) if self.use_ulaw_for_openai else None
+        # "off": server_vad ends turns. "shadow": the pipeline's LocalEndpointer only records metrics.
+        # "on": the client commits + requests the response at the local endpoint (server_vad kept for
+        # barge-in and as the fallback, with create_response disabled)
+        self.endpointing_mode = str(self.config.get("LOCAL_ENDPOINTING", "off")).lower()
+        self._endpoint_lock = threading.Lock()
+        self._turn_endpoints = {} # Wall-clock times for the current user turn: local_t, server_t, first_audio_t
+        self._local_commits_unacked = 0 # Our input_audio_buffer.commit events whose committed ack hasn't arrived
+        self.endpoint_stats = {"turns": 0, "local_first": 0, "server_first": 0, "server_only": 0,
+                               "local_lead_ms_sum": 0.0, "local_lead_n": 0, "response_latency_ms_sum": 0.0, "response_latency_n": 0}
         self.desired_playback_speed = float(self.config.get("TSM_PLAYBACK_SPEED", 1.0))
         self.tsm_enabled = self.desired_playback_speed != 1.0
         self.openai_sample_rate = 24000
         self.tsm_channels = 1
-        if self.tsm_enabled: self.log(f"TSM enabled. Speed: {self.desired_playback_speed}")
-        self.NUM_CHUNKS_FOR_TSM_WINDOW = int(self.config.get("TSM_WINDOW_CHUNKS", 8))
-        self.BYTES_PER_OPENAI_CHUNK = (self.openai_sample_rate * self.client_audio_chunk_duration_ms // 1000) * (16 // 8) * self.tsm_channels
-        self.TSM_PROCESSING_THRESHOLD_BYTES = self.BYTES_PER_OPENAI_CHUNK * self.NUM_CHUNKS_FOR_TSM_WINDOW
+        self.tsm_worker = None
+        if self.tsm_enabled:
+            self.log(f"TSM enabled. Speed: {self.desired_playback_speed}")
+            self.tsm_worker = TSMWorker(self.desired_playback_speed, self.player, log_fn=self.log, sample_rate=self.openai_sample_rate)
         self.openai_audio_buffer_raw_bytes = b''
 
+        # All outbound frames (audio appends from the mic thread, tool outputs, truncation, ...) go through
+        # one queue and one writer thread
+        self.sender = self._make_sender()
+
         self.keep_outer_loop_running = True
         self.RECONNECT_DELAY_SECONDS = self.config.get("OPENAI_RECONNECT_DELAY_S", 5)
+        self.session_rotator = None
+        if self.config.get("SESSION_ROTATION_ENABLED", False):
+            self.session_rotator = SessionRotator(self, lead_s=float(self.config.get("SESSION_ROTATE_LEAD_S", 300)),
+                                                  idle_s=float(self.config.get("SESSION_ROTATE_IDLE_S", 3)), log_fn=self.log)
         
         # Ensure OPENAI_API_KEY is available for the sync client
         openai_api_key_for_sync = self.config.get("OPENAI_API_KEY")
@@ -100,9 +151,56 @@ class OpenAISpeechClient:
         if not self.ui_status_update_url:
             self.log("WARN: FASTAPI_UI_STATUS_UPDATE_URL not configured in .env. Frontend status notifications will be disabled.")
 
+        # Rolling history summary: new turns are folded in as they are logged, so connect is a single DB read
+        self.rolling_summarizer = None
+        if self.sync_openai_client and self.context_restore_mode != "replay" and self.config.get("ROLLING_SUMMARY_ENABLED", True):
+            self.rolling_summarizer = RollingSummarizer(self.sync_openai_client, CONTEXT_SUMMARIZER_MODEL,
+                                                        fold_every_turns=int(self.config.get("ROLLING_SUMMARY_FOLD_TURNS", 4)),
+                                                        max_turns_per_fold=CONTEXT_HISTORY_LIMIT, log_fn=self.log)
+            self.rolling_summarizer.start()
+
+        # Pre-rendered TTS: wake greetings play locally the moment the wake word fires (no LLM round trip)
+        self.tts_voice = self.config.get("OPENAI_VOICE", "ash")
+        self.tts_cache = TTSAudioCache(self.config.get("TTS_CACHE_DIR", "tts_cache"), log_fn=self.log)
+        # Cached wake greeting playing locally. Kept apart from last_assistant_item_id: the audio thread polls it
+        # while the websocket thread owns the server item's tracking
+        self._local_greeting_lock = threading.Lock()
+        self._local_greeting_item_id = None
+        self._local_greeting_ms = 0
+        self._local_greeting_interrupted = False
+        self.wake_greeting_texts = [t.strip() for t in self.config.get("WAKE_GREETING_TEXTS", "").split("|") if t.strip()]
+        if self.wake_greeting_texts and self.sync_openai_client:
+            self.tts_cache.prerender_async(self.tts_voice, self.wake_greeting_texts, self._render_tts)
+
         
 
 
+    def _make_sender(self):
+        return OutboundSender(lambda: self.ws_app, lambda: self.connected, log_fn=self.log,
+                              coalesce_ms=int(self.config.get("OPENAI_APPEND_COALESCE_MS", 90)))
+
+    def _spawn(self, target, *args):
+        """Run a blocking helper (tool call, wait-for-playback) off the websocket thread."""
+        threading.Thread(target=target, args=args, daemon=True).start()
+
+    def _close_socket(self):
+        if self.ws_app: self.ws_app.close()
+
+    def _defer_blocking(self, fn, *args):
+        """Short blocking bookkeeping (history writes, replay loads) from a message handler. Inline on the websocket thread."""
+        fn(*args)
+
+    def _log_turn(self, role: str, content: str, what: str, summarize: bool = False):
+        """Log one conversation-history turn for the current session; `summarize` turns count towards the next rolling-summary fold."""
+        if self.session_id: self._defer_blocking(self._write_turn, self.session_id, role, content, what, summarize)
+
+    def _write_turn(self, session_id, role, content, what, summarize):
+        try:
+            log_conversation_turn(session_id, role, content)
+            if summarize and self.rolling_summarizer: self.rolling_summarizer.note_turn_logged()
+        except Exception as e:
+            self.log(f"ERROR: Failed to log {what} to conversation history: {e}")
+
     def _log_section(self, title):
         self.log(f"\n===== [Client] {title} =====")
 
@@ -110,70 +208,40 @@ class OpenAISpeechClient:
 
     def _clear_audio_state(self):
         """Clear all audio-related state and buffers."""
+        if self.tsm_worker: self.tsm_worker.clear()
         if self.player:
             self.player.clear()
             self.player.flush()
         self.openai_audio_buffer_raw_bytes = b''
         self.last_assistant_item_id = None
-        self.current_assistant_item_played_ms = 0
+        self.current_assistant_item_received_ms = 0
         self.audio_received_counter = 0
 
-    def _process_and_play_audio(self, audio_data_bytes: bytes):
+    def _process_and_play_audio(self, audio_data_bytes: bytes, item_id=None):
         """
-        Buffers incoming audio, applies TSM with pytsmod.wsola if enabled, and sends to player.
+        Sends incoming audio to the player, via the streaming TSM worker if enabled.
+        Never runs DSP on the websocket thread. item_id tags the audio for the player's playback clock.
         """
         # Don't process audio if we're transitioning states
         if self.get_app_state() == "LISTENING_FOR_WAKEWORD":
             return
 
-        if not self.tsm_enabled:
-            if self.player:
-                self.player.play(audio_data_bytes)
-            return
-
-        self.openai_audio_buffer_raw_bytes += audio_data_bytes
-
-        while len(self.openai_audio_buffer_raw_bytes) >= self.TSM_PROCESSING_THRESHOLD_BYTES:
-            segment_to_process_bytes = self.openai_audio_buffer_raw_bytes[:self.TSM_PROCESSING_THRESHOLD_BYTES]
-            self.openai_audio_buffer_raw_bytes = self.openai_audio_buffer_raw_bytes[self.TSM_PROCESSING_THRESHOLD_BYTES:]
+        if self.tsm_worker:
+            self.tsm_worker.submit(audio_data_bytes, item_id=item_id)
+        elif self.player:
+            self.player.play(audio_data_bytes, item_id=item_id)
 
-            try:
-                segment_np_int16 = np.frombuffer(segment_to_process_bytes, dtype=np.int16)
-                # pytsmod.wsola expects a 1D (for mono) or 2D (for multi-channel) float array.
-                # Normalizing to -1.0 to 1.0 is good practice.
-                segment_np_float32 = segment_np_int16.astype(np.float32) / 32768.0 
-                
-                if segment_np_float32.size == 0:
-                    continue 
-
-                # self.log(f"DEBUG_TSM: Input array shape to wsola: {segment_np_float32.shape}, SR: {self.openai_sample_rate}, Alpha: {self.desired_playback_speed}")
-                
-                # Perform time stretching using pytsmod.wsola
-                # x: input signal (1D or 2D NumPy array)
-                # alpha: ratio by which the length of the signal is changed ( > 1 for speedup)
-                # Fs: sample rate
-                self.log(f"Blocking call start ")
-                stretched_audio_float32 = wsola(
-                    x=segment_np_float32, 
-                    s=self.desired_playback_speed 
-                    #Fs=self.openai_sample_rate
-                )
-                self.log(f"BLocking call end.")
-                # self.log(f"DEBUG_TSM: Output array shape from wsola: {stretched_audio_float32.shape}")
-                
-                # Convert back to int16 bytes
-                clipped_stretched_audio = np.clip(stretched_audio_float32, -1.0, 1.0)
-                stretched_audio_int16 = (clipped_stretched_audio * 32767.0).astype(np.int16)
-                stretched_audio_bytes = stretched_audio_int16.tobytes()
-
-                if self.player and len(stretched_audio_bytes) > 0:
-                    self.player.play(stretched_audio_bytes)
-
-            except Exception as e_tsm_proc:
-                self.log(f"ERROR during TSM processing with pytsmod.wsola: {e_tsm_proc}. Playing segment directly.")
-                if self.player: 
-                    self.player.play(segment_to_process_bytes) 
 
+    def _finish_response_audio(self):
+        """End of a response's audio: play what is left and let the player drain its sub-chunk tail."""
+        if self.tsm_worker:
+            # Stretches the remainder with the same overlap state, then flushes the player
+            self.tsm_worker.flush()
+        else:
+            if len(self.openai_audio_buffer_raw_bytes) > 0 and self.player:
+                self.player.play(self.openai_audio_buffer_raw_bytes)
+                self.openai_audio_buffer_raw_bytes = b''
+            if self.player: self.player.flush()
 
     # --- Phase 4: Frontend Notification Methods and TTS Announcement ---
     def _notify_frontend(self, payload: dict):
@@ -193,10 +261,31 @@ class OpenAISpeechClient:
         except Exception as e_notify: # Catch any other unexpected error
             self.log(f"WARN: Unexpected error in _notify_frontend: {e_notify}")
             
+    def _render_tts(self, voice, text):
+        """Render text with OpenAI TTS as 24 kHz PCM16 (the cache's render_fn)."""
+        response = self.sync_openai_client.audio.speech.create(
+            model=self.tts_cache.model,  # Or "tts-1-hd" for higher quality
+            voice=voice,
+            input=text,
+            response_format="pcm"  # Get PCM format directly
+        )
+        return response.content
+
+    @staticmethod
+    def update_announcement_text(contact_name):
+        # A concise announcement without details
+        return f"I have an update on your call with {contact_name}. Wake me up and I can give you the details."
+
+    def prerender_update_announcement(self, contact_name):
+        """Render the announcement for contact_name in the background so it plays instantly when needed."""
+        if self.sync_openai_client:
+            self.tts_cache.prerender_async(self.tts_voice, [self.update_announcement_text(contact_name)], self._render_tts)
+
     def generate_update_announcement(self, contact_name):
         """
         Generate a brief TTS announcement about an update without providing details.
         Uses the same OpenAI voice as configured for real-time conversations.
+        Served from the TTS cache when pre-rendered; rendered (and cached) otherwise.
         
         Args:
             contact_name: The name of the contact associated with the update
@@ -204,42 +293,24 @@ class OpenAISpeechClient:
         Returns:
             bytes: PCM audio bytes of the announcement
         """
+        announcement_text = self.update_announcement_text(contact_name)
+        cached_audio = self.tts_cache.get(self.tts_voice, announcement_text)
+        if cached_audio:
+            self.log(f"Using cached TTS announcement for contact: {contact_name}")
+            return cached_audio
         if not self.sync_openai_client:
             self.log("WARN: Synchronous OpenAI client not available for TTS announcement")
             return None
-            
-        # Create a concise announcement without details
-        announcement_text = f"I have an update on your call with {contact_name}. Wake me up and I can give you the details."
         
         try:
-            # Use the same voice configured for the conversation
-            voice = self.config.get("OPENAI_VOICE", "ash")
-            
-            # Generate TTS using OpenAI's API
-            response = self.sync_openai_client.audio.speech.create(
-                model="tts-1",  # Or "tts-1-hd" for higher quality
-                voice=voice,
-                input=announcement_text,
-                response_format="pcm"  # Get PCM format directly
-            )
-            
-            # Get the audio content as bytes
-            announcement_audio = response.content
-            
+            announcement_audio = self.tts_cache.get_or_render(self.tts_voice, announcement_text, self._render_tts)
+            if not announcement_audio: return None
             self.log(f"Generated TTS announcement for contact: {contact_name}")
             return announcement_audio
             
         except Exception as e:
             self.log(f"ERROR generating TTS announcement: {e}")
             return None
-            if response.status_code == 200:
-                self.log(f"Successfully notified frontend: Type '{payload.get('type')}', Status '{payload.get('status', {}).get('connection')}'")
-            else:
-                self.log(f"WARN: Failed to notify frontend. Status: {response.status_code}, Response: {response.text[:100]}")
-        except requests.exceptions.RequestException as e:
-            self.log(f"WARN: Error notifying frontend: {e}")
-        except Exception as e_notify: # Catch any other unexpected error
-            self.log(f"WARN: Unexpected error in _notify_frontend: {e_notify}")
 
     def _notify_frontend_connect(self):
         self.log("Client: Notifying frontend of connection.")
@@ -287,16 +358,12 @@ class OpenAISpeechClient:
                     job_id = job['id']
                     
                     # We only need to track presentations - DB updates happen in main.py
-                    # Skip updates that have already been presented
-                    current_count = self.call_update_presentation_count.get(job_id, 0)
-                    if current_count >= 2:
+                    # Skip updates that have already been presented. Reading doesn't count as presenting:
+                    # _count_call_update_presentations runs once the text reaches the live session
+                    if self.call_update_presentation_count.get(job_id, 0) >= 2:
                         # Skip - already presented twice
                         continue
                     
-                    # Increment presentation counter for this call update
-                    self.call_update_presentation_count[job_id] = current_count + 1
-                    self.log(f"Call update for job {job_id} presentation count: {current_count + 1}")
-                    
                     summary = job['final_summary_for_main_agent'] if job['final_summary_for_main_agent'] else f"finished with status {job['overall_status']}."
                     updates_list.append(f"Call to {job['contact_name']} (Job ID: {job_id}): {summary}")
                     processed_job_ids.append(job_id)
@@ -313,6 +380,12 @@ class OpenAISpeechClient:
             if conn: conn.close()
         return updates_text, processed_job_ids
 
+    def _count_call_update_presentations(self, job_ids: list[int]):
+        """The live session's instructions now carry these call updates (the DB monitor marks jobs informed after two)."""
+        for job_id in job_ids:
+            self.call_update_presentation_count[job_id] = self.call_update_presentation_count.get(job_id, 0) + 1
+            self.log(f"Call update for job {job_id} presentation count: {self.call_update_presentation_count[job_id]}")
+
     def _mark_call_updates_as_informed(self, job_ids: list[int]):
         if not job_ids: return
         conn = None
@@ -329,7 +402,14 @@ class OpenAISpeechClient:
         finally:
             if conn: conn.close()
 
-    def _get_conversation_summary(self, session_id_for_history: Optional[str]) -> str:
+    def _get_conversation_summary(self, session_id_for_history: Optional[str]) -> Optional[str]:
+        # The rolling summary folds every session's turns (summary_key "global"), so it only stands in for the
+        # global history; a request scoped to one session still summarizes that session's turns below.
+        use_rolling_summary = self.rolling_summarizer is not None and session_id_for_history is None
+        if use_rolling_summary:
+            summary = self.rolling_summarizer.current_summary()
+            self.log(f"Rolling summary read ({len(summary)} chars, including unfolded turns).")
+            return f"Recent conversation summary: {summary}\n" if summary else ""
         if not self.sync_openai_client:
             self.log("WARN: Synchronous OpenAI client not available for conversation summarization.")
             return "Previous conversation context is unavailable at the moment.\n"
@@ -409,33 +489,28 @@ class OpenAISpeechClient:
             response = self.sync_openai_client.chat.completions.create(
                 model=CONTEXT_SUMMARIZER_MODEL,
                 messages=[{"role": "user", "content": prompt_for_summarizer}],
-                temperature=0.1, max_tokens=200 )
+                temperature=0.1, max_tokens=200, timeout=self.primed_context_timeout_s )
             summary = response.choices[0].message.content.strip()
             if "no specific unresolved context" in summary.lower():
                 self.log("Summarizer: No specific context to resume from history.")
                 return ""
             self.log(f"Summarizer LLM response: {summary}")
-            print( f"Summarizer LLM response: {summary}")
             return f"Recent conversation summary: {summary}\n"
         except Exception as e:
             self.log(f"ERROR summarizing conversation history with LLM: {e}")
-            return "Context summary unavailable due to an error.\n"
-
+            return None # Caller falls back to the last good summary
 
 
-    def on_open(self, ws):
-        self._log_section("WebSocket OPEN")
-        self.log("Client: Connected to OpenAI Realtime API.")
-        self.connected = True
-        self.current_assistant_text_response = ""
 
-        # --- Phase 4: self.notify_frontend_connect() would be called here ---
-            # --- Phase 4: Notify frontend of connection ---
-        self._notify_frontend_connect()
+    def _compute_primed_context(self) -> tuple[str, list[int]]:
+        """History summary + pending call updates for the instructions, and the call job ids in it. Blocking (summarizer, SQLite)."""
         primed_context_parts = []
-        # 1. Get conversation summary (uses self.session_id from *previous* connection)
+        # 1. Get conversation summary (uses self.session_id from *previous* connection). Replay mode restores history as items instead
         
-        conv_summary = self._get_conversation_summary(session_id_for_history=None)
+        conv_summary = self._get_conversation_summary(session_id_for_history=None) if self.context_restore_mode != "replay" else ""
+        if conv_summary is None: # Summarizer failed or timed out
+            conv_summary = self._last_good_summary or "Context summary unavailable due to an error.\n"
+        else: self._last_good_summary = conv_summary
         if conv_summary: primed_context_parts.append(conv_summary)
         else:
             self.log("No prior session_id for conversation history retrieval on this connection.")
@@ -444,31 +519,55 @@ class OpenAISpeechClient:
         call_updates_text, informed_job_ids = self._get_pending_call_updates_text()
         if call_updates_text:
             primed_context_parts.append(call_updates_text)
-            
+        return "\n".join(primed_context_parts), informed_job_ids
+
+    def _effective_instructions(self, primed_context: str) -> str:
         effective_instructions = LLM_DEFAULT_INSTRUCTIONS
-        if primed_context_parts:
-            full_primed_context = "\n".join(primed_context_parts)
-            self.log(f"Priming LLM with context:\n{full_primed_context}")
-            effective_instructions += "\n\n---\nIMPORTANT: You have just been activated by a wake word. The following is HISTORICAL context from previous conversations for reference only. Do NOT act on any requests mentioned in this historical context. Wait for the user to speak and provide their current request.\n\nHISTORICAL CONTEXT:\n" + full_primed_context + "\n--- END OF HISTORICAL CONTEXT ---"
+        if primed_context:
+            self.log(f"Priming LLM with context:\n{primed_context}")
+            effective_instructions += "\n\n---\nIMPORTANT: You have just been activated by a wake word. The following is HISTORICAL context from previous conversations for reference only. Do NOT act on any requests mentioned in this historical context. Wait for the user to speak and provide their current request.\n\nHISTORICAL CONTEXT:\n" + primed_context + "\n--- END OF HISTORICAL CONTEXT ---"
             self.log(f" Effective instruciton: \n{ effective_instructions}")
         else:
             self.log("No additional context (history summary or call updates) to prime LLM with.")
+        return effective_instructions
+
+    def build_session_config(self, refresh_context: bool = False) -> dict:
+        """session.update for a new connection. Uses the last computed context unless refresh_context (blocking)."""
+        if refresh_context: self._primed_context, self._primed_job_ids = self._compute_primed_context()
+        effective_instructions = self._effective_instructions(self._primed_context)
 
         input_format_to_use = "g711_ulaw" if self.use_ulaw_for_openai else "pcm16"
-        session_config = {
+        return {
             "type": "session.update",
             "session": {
                 "voice": self.config.get("OPENAI_VOICE", "ash"),
-                "turn_detection": {"type": "server_vad", "interrupt_response": True},
+                "turn_detection": {"type": "server_vad", "interrupt_response": True, **({"create_response": False} if self.endpointing_mode == "on" else {})},
                 "input_audio_format": input_format_to_use, "output_audio_format": "pcm16",
                 "tools": ALL_TOOLS, "tool_choice": "auto",
                 "instructions": effective_instructions,
                 "input_audio_transcription": {"model": "gpt-4o-transcribe", "language": "en"}
             }
         }
+
+    def on_open(self, ws):
+        self._log_section("WebSocket OPEN")
+        self.log("Client: Connected to OpenAI Realtime API.")
+        self.sender.reset() # Anything still queued was meant for the previous connection
+        if self.ulaw_encoder: self.ulaw_encoder.reset()
+        with self._endpoint_lock: self._local_commits_unacked = 0 # Acks for the old connection's commits never arrive
+        self.connected = True
+        self.current_assistant_text_response = ""
+
+        # --- Phase 4: self.notify_frontend_connect() would be called here ---
+            # --- Phase 4: Notify frontend of connection ---
+        self._notify_frontend_connect()
+        self._connection_generation += 1
+        session_config = self.build_session_config() # Cached context only; the fresh one follows via _refresh_primed_context
         try:
-            self.ws_app.send(json.dumps(session_config))
-            self.log(f"Client: Session config sent. Instructions length: {len(effective_instructions)} chars.")
+            self.sender.send_event(session_config)
+            self._sent_primed_context = self._primed_context
+            self._count_call_update_presentations(self._primed_job_ids)
+            self.log(f"Client: Session config sent. Instructions length: {len(session_config['session']['instructions'])} chars.")
             # Do not mark as informed immediately - we'll do this after user interaction
             # This allows the updates to remain visible until explicitly acknowledged
             # if informed_job_ids:
@@ -476,8 +575,49 @@ class OpenAISpeechClient:
         except Exception as e_send_session:
             self.log(f"ERROR sending session.update: {e_send_session}")
             # If this fails, the connection might be unstable already. Reconnect loop will handle.
+        if self.context_restore_mode == "replay": self._send_context_replay()
+        self._spawn(self._refresh_primed_context, self._connection_generation)
+
+    def _send_context_replay(self):
+        """Replay mode: re-create the last turns as conversation items on the new session, in one burst after session.update."""
+        try: frames, stats = load_replay_frames(self.replay_max_turns, self.replay_token_budget)
+        except Exception as e_replay:
+            self.log(f"Client: Could not build context replay: {e_replay}"); return
+        if not frames:
+            self.log("Client: No conversation history to replay."); return
+        self._replay_last_item_id, self._replay_started_t = stats["last_item_id"], time.time()
+        for frame in frames: self.sender.send_raw(frame)
+        self.log(f"Client: Replaying {stats['items']} items (~{stats['tokens_est']} tokens, {stats['bytes']} bytes, built in {stats['build_ms']} ms).")
+
+    def _refresh_primed_context(self, connection_generation):
+        """Recompute the history summary + call updates and push them as a follow-up session.update.
+        Results later than PRIMED_CONTEXT_TIMEOUT_S only refresh the cache: by then the user may be mid-turn."""
+        started_t = time.time()
+        try: primed_context, job_ids = self._compute_primed_context()
+        except Exception as e_context:
+            self.log(f"Client: Could not build primed context ({e_context}). Keeping {'cached' if self._primed_context else 'no'} context.")
+            return
+        elapsed_s = time.time() - started_t
+        self._primed_context, self._primed_job_ids = primed_context, job_ids
+        if connection_generation != self._connection_generation or not self.connected: return # Connection already replaced
+        if elapsed_s > self.primed_context_timeout_s:
+            self.log(f"Client: Primed context took {elapsed_s:.1f}s (> {self.primed_context_timeout_s:g}s); cached for the next connection, session left as is.")
+            return
+        if primed_context == self._sent_primed_context:
+            self.log(f"Client: Primed context unchanged ({elapsed_s:.1f}s); no follow-up session.update.")
+            return
+        self.sender.send_event({"type": "session.update", "session": {"instructions": self._effective_instructions(primed_context)}})
+        self._sent_primed_context = primed_context
+        self._count_call_update_presentations(job_ids)
+        self.log(f"Client: Primed context pushed via session.update {elapsed_s:.1f}s after connect.")
 
 
+    def _run_tool(self, *args):
+        """Tool thread entry: the call counts as in flight until its output and response.create are queued."""
+        try: self._execute_tool_in_thread(*args)
+        finally:
+            with self._tools_lock: self._tools_in_flight -= 1
+
     def _execute_tool_in_thread(self, handler_function, parsed_args, call_id, config, function_name):
         self.log(f"Client (Thread - {function_name}): Starting execution for Call_ID {call_id}. Args: {parsed_args}")
         tool_output_for_llm = ""
@@ -497,7 +637,7 @@ class OpenAISpeechClient:
                         })
                     )
                 except Exception as e:
-                    self.log(f"ERROR: Failed to log tool result to conversation history: {e}", logging.ERROR)
+                    self.log(f"ERROR: Failed to log tool result to conversation history: {e}")
         except Exception as e_tool_exec_thread:
             self.log(f"Client (Thread - {function_name}) ERROR: Exception during execution: {e_tool_exec_thread}")
             error_detail = f"An error occurred while executing the tool '{function_name}': {str(e_tool_exec_thread)}"
@@ -505,41 +645,160 @@ class OpenAISpeechClient:
             self.log(f"Client (Thread - {function_name}): Sending error back to LLM: {tool_output_for_llm}")
 
         tool_response_payload = {"type": "conversation.item.create", "item": {"type": "function_call_output", "call_id": call_id, "output": tool_output_for_llm}}
+        self.last_activity_t = time.time()
         if self.ws_app and self.connected:
             try:
-                self.ws_app.send(json.dumps(tool_response_payload))
+                self.sender.send_event(tool_response_payload)
                 self.log(f"Client (Thread - {function_name}): Sent tool output for Call_ID='{call_id}'.")
                 response_create_payload = {"type": "response.create", "response": {"modalities": ["text", "audio"], "voice": self.config.get("OPENAI_VOICE", "ash"), "output_audio_format": "pcm16"}}
-                self.ws_app.send(json.dumps(response_create_payload))
+                self.sender.send_event(response_create_payload)
                 self.log(f"Client (Thread - {function_name}): Sent 'response.create' to trigger assistant after tool output for Call_ID='{call_id}'.")
             except Exception as e_send_thread:
                 self.log(f"Client (Thread - {function_name}) ERROR: Could not send tool output or response.create for Call_ID='{call_id}': {e_send_thread}")
         else:
             self.log(f"Client (Thread - {function_name}) ERROR: WebSocket not available/connected. Cannot send tool output for Call_ID='{call_id}'.")
 
-    def is_assistant_speaking(self) -> bool: return self.last_assistant_item_id is not None
+    def is_assistant_speaking(self) -> bool: return self.is_local_greeting_playing() or self.last_assistant_item_id is not None
     def get_current_assistant_speech_duration_ms(self) -> int:
-        if self.last_assistant_item_id: return self.current_assistant_item_played_ms
+        if self.last_assistant_item_id: return self._item_played_ms(self.last_assistant_item_id)
         return 0
+    def _item_played_ms(self, item_id) -> int:
+        """Milliseconds of item_id the user has actually heard, in the item's own (unstretched) timeline."""
+        received_ms = self.current_assistant_item_received_ms
+        if not self.player or not hasattr(self.player, "played_ms"): # No playback clock: assume all but the queue was heard
+            return max(0, received_ms - int(self.player.buffered_ms() if self.player else 0))
+        played_ms = self.player.played_ms(item_id)
+        if self.tsm_worker: played_ms *= self.desired_playback_speed # Stretched output ms -> original audio ms
+        return int(min(played_ms, received_ms))
     def is_goodbye_in_progress(self) -> bool: return self.goodbye_in_progress
+    def is_idle_for_rotation(self, idle_s: float) -> bool:
+        """True in a quiet gap where swapping sessions can't cut off speech, a response or a tool call."""
+        if self.is_assistant_speaking() or self.goodbye_in_progress or self.pending_sleep_after_audio: return False
+        with self._tools_lock: tools_running = self._tools_in_flight > 0
+        if tools_running or self.accumulated_tool_args: return False
+        if self.player and self.player.is_playing(): return False
+        if self.get_app_state() == "LISTENING_FOR_WAKEWORD": return True # Mic audio isn't being sent
+        return not self._user_speaking and time.time() - self.last_activity_t >= idle_s
+    def adopt_rotated_connection(self, ws_app, ws_thread, session_id, expires_at, forced=False) -> bool:
+        """Make a primed standby connection (see SessionRotator) the active one and retire the current socket."""
+        with self._ws_swap_lock:
+            if not (self.connected and self.keep_outer_loop_running): return False
+            old_app = self.ws_app
+            self.sender.flush_audio()
+            ws_app.on_message, ws_app.on_error, ws_app.on_close = self.on_message, self.on_error, self.on_close
+            self._ws_handoff_thread = ws_thread # run_client follows this thread once old_app's run_forever returns
+            self.ws_app = ws_app # OutboundSender picks up the new socket on its next frame
+            self._adopt_session_state(session_id, expires_at, forced)
+        if old_app:
+            old_app.on_message = old_app.on_error = old_app.on_close = None # Its close must not look like a disconnect
+            try: old_app.close()
+            except Exception as e_close: self.log(f"Client: Error closing rotated-out socket: {e_close}")
+        return True
+    def _adopt_session_state(self, session_id, expires_at, forced):
+        """Per-session bookkeeping when a rotated session takes over."""
+        previous_session_id = self.session_id
+        self.session_id = session_id or self.session_id
+        self.session_expires_at = expires_at
+        self._connection_generation += 1; self._sent_primed_context = self._primed_context # Standby was primed with a fresh summary
+        self._count_call_update_presentations(self._primed_job_ids) # Only now does the user's session carry them
+        if forced and self.last_assistant_item_id: # The old session's response can't continue on the new one
+            self._clear_audio_state()
+        self.accumulated_tool_args.clear(); self.client_initiated_truncated_item_ids.clear()
+        if self.context_restore_mode == "replay": self._defer_blocking(self._send_context_replay) # Items don't carry over to the new session
+        self._log_turn("system_event", json.dumps({"event": "session_rotated", "previous_session_id": previous_session_id, "forced": forced}), "session rotation")
+    def send_event(self, payload: dict): self.sender.send_event(payload)
+    def send_audio_append(self, audio_bytes: bytes, duration_ms: float):
+        """Queue captured mic audio (24 kHz PCM16); it is coalesced into input_audio_buffer.append frames by the sender."""
+        if self.ulaw_encoder: audio_bytes = self.ulaw_encoder.process(audio_bytes)
+        self.sender.append_audio(audio_bytes, duration_ms)
+    def flush_audio_appends(self): self.sender.flush_audio() # Send pending mic audio now instead of waiting for the coalesce window
+    def _request_response(self):
+        self.sender.send_event({"type": "response.create", "response": {"modalities": ["text", "audio"], "voice": self.config.get("OPENAI_VOICE", "ash"), "output_audio_format": "pcm16"}})
+    def handle_local_endpoint(self):
+        """Called from the audio pipeline when LocalEndpointer sees the end of the user's utterance."""
+        with self._endpoint_lock:
+            turn = self._turn_endpoints
+            if "local_t" in turn: return
+            turn["local_t"] = time.time()
+            # server_vad stays on in "on" mode: if it already ended (and committed) this turn, a second commit would be an error
+            commit = self.endpointing_mode == "on" and "server_t" not in turn and not turn.get("server_committed") and self.connected
+            if commit: turn["committed_locally"] = True; self._local_commits_unacked += 1
+        if commit:
+            self.flush_audio_appends()
+            self.sender.send_event({"type": "input_audio_buffer.commit"})
+            self._request_response()
+            self.log("🎤 ENDPOINT: Local end of utterance. Committed input and requested response.")
+    def _on_server_speech_stopped(self):
+        with self._endpoint_lock:
+            turn = self._turn_endpoints
+            turn.setdefault("server_t", time.time())
+            respond = self.endpointing_mode == "on" and not turn.get("committed_locally")
+            if respond: turn["committed_locally"] = True # Server committed; local endpointer missed this turn
+        if respond: self._request_response() # create_response is off in this mode
+    def _on_input_buffer_committed(self, msg):
+        """input_audio_buffer.committed: the ack of our own commit, or server_vad committing the turn itself."""
+        with self._endpoint_lock:
+            if self._local_commits_unacked: self._local_commits_unacked -= 1
+            else: self._turn_endpoints["server_committed"] = True
+    def _on_server_speech_started(self):
+        with self._endpoint_lock:
+            previous = self._turn_endpoints
+            if "server_t" not in previous and time.time() - previous.get("local_t", 0) < 1.0:
+                return # speech_started for the utterance the local endpointer just closed (arrived late)
+            self._turn_endpoints = {}
+        if previous and not previous.get("recorded"): self._record_turn_endpoints(previous) # Turn ended without a response
+    def _on_first_response_audio(self):
+        with self._endpoint_lock:
+            turn = self._turn_endpoints
+            if not turn or turn.get("recorded"): return
+            turn["first_audio_t"] = time.time(); turn["recorded"] = True
+            turn = dict(turn)
+        self._record_turn_endpoints(turn, log_now=True)
+    def _record_turn_endpoints(self, turn: dict, log_now: bool = False):
+        """Fold one user turn's endpoint times into endpoint_stats."""
+        if "local_t" not in turn and "server_t" not in turn: return
+        stats = self.endpoint_stats; stats["turns"] += 1
+        local_t, server_t = turn.get("local_t"), turn.get("server_t")
+        line = "🎤 TURN METRICS:"
+        if local_t and server_t:
+            lead_ms = (server_t - local_t) * 1000.0
+            stats["local_first" if lead_ms >= 0 else "server_first"] += 1
+            stats["local_lead_ms_sum"] += lead_ms; stats["local_lead_n"] += 1
+            line += f" local endpoint {lead_ms:+.0f} ms vs server"
+        elif server_t: stats["server_only"] += 1; line += " server endpoint only"
+        endpoint_t = min(t for t in (local_t, server_t) if t) if self.endpointing_mode == "on" else server_t
+        if turn.get("first_audio_t") and endpoint_t:
+            latency_ms = (turn["first_audio_t"] - endpoint_t) * 1000.0
+            stats["response_latency_ms_sum"] += latency_ms; stats["response_latency_n"] += 1
+            line += f", first audio {latency_ms:.0f} ms after endpoint"
+        if log_now: self.log(f"{line} ({self.endpointing_mode})")
+    def get_endpointing_stats(self) -> dict:
+        s = self.endpoint_stats
+        return {"mode": self.endpointing_mode, "turns": s["turns"], "local_first": s["local_first"], "server_first": s["server_first"], "server_only": s["server_only"],
+                "mean_local_lead_ms": round(s["local_lead_ms_sum"] / s["local_lead_n"], 1) if s["local_lead_n"] else None,
+                "mean_response_latency_ms": round(s["response_latency_ms_sum"] / s["response_latency_n"], 1) if s["response_latency_n"] else None}
     def _perform_truncation(self, reason_prefix: str):
+        self._stop_local_greeting(reason_prefix)
         item_id_to_truncate = self.last_assistant_item_id
         if not item_id_to_truncate: return
+        # Read the playback clock before clearing: only audio that reached the device (less its latency) was heard
+        timestamp_to_send_ms = self._item_played_ms(item_id_to_truncate)
+        if self.tsm_worker: self.tsm_worker.clear()
         self.player.clear(); self.openai_audio_buffer_raw_bytes = b''
-        timestamp_to_send_ms = max(10, self.current_assistant_item_played_ms)
+        self.log(f"Truncating item {item_id_to_truncate} at {timestamp_to_send_ms}ms heard of {self.current_assistant_item_received_ms}ms received.")
         truncate_payload = {"type": "conversation.item.truncate", "item_id": item_id_to_truncate, "content_index": 0, "audio_end_ms": timestamp_to_send_ms}
         try:
             if self.ws_app and self.connected:
-                self.ws_app.send(json.dumps(truncate_payload))
+                self.sender.send_event(truncate_payload)
                 self.client_initiated_truncated_item_ids.add(item_id_to_truncate)
         except Exception as e_send_trunc: self.log(f"Client ERROR sending truncate: {e_send_trunc}")
-        self.last_assistant_item_id = None; self.current_assistant_item_played_ms = 0
+        self.last_assistant_item_id = None; self.current_assistant_item_received_ms = 0
     def _wait_for_audio_completion(self, timeout_s=5.0):
         """Wait for any current audio to finish playing."""
         start_time = time.time()
         while (time.time() - start_time) < timeout_s:
             # Check if there's any audio still playing
-            if not self.last_assistant_item_id and len(self.player.buffer) == 0:
+            if not self.last_assistant_item_id and not self.player.is_playing():
                 return True  # Audio finished
             time.sleep(0.1)  # Small sleep to prevent CPU spin
         return False  # Timeout reached
@@ -556,6 +815,7 @@ class OpenAISpeechClient:
         self.log("🔊 AUDIO: Goodbye sequence complete - user audio enabled")
         
         # Clear all audio buffers
+        if self.tsm_worker: self.tsm_worker.clear()
         if self.player:
             self.player.clear()
             self.player.flush()
@@ -563,7 +823,7 @@ class OpenAISpeechClient:
         
         # Reset audio state
         self.last_assistant_item_id = None
-        self.current_assistant_item_played_ms = 0
+        self.current_assistant_item_received_ms = 0
         
         # Transition to wake word mode
         if self.wake_word_active:
@@ -572,11 +832,69 @@ class OpenAISpeechClient:
         else:
             print(f"\n*** Conversation turn ended by LLM (Reason: {reason}). Ready for next query. ***\n")
 
-    def send_wake_up_message(self):
-        """Send a wake-up system message to provide context after wake word detection."""
+    def _transition_to_sleep_after_playback(self, reason):
+        """Wait for queued assistant audio to finish playing, then go to sleep."""
+        if self.tsm_worker: self.tsm_worker.wait_until_idle() # Stretched tail must reach the player first
+        if self.player and hasattr(self.player, 'wait_until_drained'):
+            timeout_s = self.player.buffered_ms() / 1000.0 + float(self.config.get("END_CONV_AUDIO_FINISH_DELAY_S", 2.0))
+            if not self.player.wait_until_drained(timeout_s=timeout_s):
+                self.log(f"WARN: Goodbye audio still playing after {timeout_s:.1f}s. Sleeping anyway.")
+        self._transition_to_sleep(reason)
+
+    def play_cached_wake_greeting(self):
+        """Play a pre-rendered wake greeting right away. Returns its text, or None on a cache miss."""
+        if not self.player or not self.wake_greeting_texts: return None
+        cached = [(text, pcm) for text in self.wake_greeting_texts for pcm in [self.tts_cache.get(self.tts_voice, text)] if pcm]
+        if not cached: return None
+        text, pcm = random.choice(cached)
+        item_id = f"{LOCAL_GREETING_ITEM_PREFIX}{int(time.time() * 1000)}"
+        with self._local_greeting_lock: # Tracked so local barge-in arms on it and can cut it off
+            self._local_greeting_item_id = item_id
+            self._local_greeting_ms = len(pcm) * 1000 // (self.openai_sample_rate * 2)
+            self._local_greeting_interrupted = False
+        self.player.play(pcm, item_id=item_id); self.player.flush()
+        self.log(f"Client: Played cached wake greeting: '{text}'")
+        return text
+
+    def _local_greeting_audible_locked(self) -> bool:
+        item_id = self._local_greeting_item_id
+        if not item_id: return False
+        if self.player and self.player.is_playing() and (not hasattr(self.player, "played_ms") or self.player.played_ms(item_id) < self._local_greeting_ms): return True
+        self._local_greeting_item_id = None # Played out
+        return False
+
+    def is_local_greeting_playing(self) -> bool:
+        """True while a cached wake greeting is still audible; clears its tracking once it has played out."""
+        with self._local_greeting_lock: return self._local_greeting_audible_locked()
+
+    def _stop_local_greeting(self, reason_prefix: str) -> bool:
+        """Barge-in over the local greeting: stop it and remember that the held-back mic audio is the user's speech."""
+        with self._local_greeting_lock:
+            if not self._local_greeting_audible_locked(): return False
+            self._local_greeting_item_id = None; self._local_greeting_interrupted = True
+        if self.player: self.player.clear()
+        self.log(f"{reason_prefix}: Local wake greeting interrupted.")
+        return True
+
+    def pop_local_greeting_interrupted(self) -> bool:
+        """True once after the user talked over the local greeting (the mic audio held back meanwhile is their speech)."""
+        with self._local_greeting_lock: interrupted, self._local_greeting_interrupted = self._local_greeting_interrupted, False
+        return interrupted
+
+    def send_wake_up_message(self) -> bool:
+        """
+        Send a wake-up system message to provide context after wake word detection.
+        Returns True if a cached greeting was played locally, in which case the model
+        is told not to greet and no response should be requested until the user speaks.
+        """
         if not (self.ws_app and self.connected):
-            return
-            
+            return False
+
+        local_greeting = self.play_cached_wake_greeting()
+        if local_greeting:
+            wake_up_text = f"WAKE-UP: You have just been activated by your wake word and the user has already been greeted with '{local_greeting}'. Do not greet again; wait for the user's request and answer it directly. Do not reference previous conversations unless specifically asked."
+        else:
+            wake_up_text = "WAKE-UP: You have just been activated by your wake word. Give a brief, friendly greeting to let the user know you're awake and ready (e.g., 'Hi, I'm back!' or 'Hello! How can I help?'). Then wait for the user's request. Do not reference previous conversations unless specifically asked."
         wake_up_message = {
             "type": "conversation.item.create",
             "item": {
@@ -585,393 +903,295 @@ class OpenAISpeechClient:
                 "content": [
                     {
                         "type": "input_text",
-                        "text": "WAKE-UP: You have just been activated by your wake word. Give a brief, friendly greeting to let the user know you're awake and ready (e.g., 'Hi, I'm back!' or 'Hello! How can I help?'). Then wait for the user's request. Do not reference previous conversations unless specifically asked."
+                        "text": wake_up_text
                     }
                 ]
             }
         }
         
         try:
-            self.ws_app.send(json.dumps(wake_up_message))
+            self.sender.send_event(wake_up_message)
             self.log("Client: Sent wake-up system message to LLM")
         except Exception as e:
             self.log(f"Client: Error sending wake-up message: {e}")
+        return bool(local_greeting)
 
  
-    def _format_message(self, msg, msg_type):
-        """Format OpenAI messages into human-readable logs."""
-        timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
-        
-        # Session events
-        if msg_type == "session.created":
-            session_id = msg.get('session', {}).get('id')
-            expires_at = msg.get('session', {}).get('expires_at', 0)
-            try:
-                expires_str = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(expires_at))
-            except:
-                expires_str = str(expires_at)
-            return f"📡 SESSION: Created new session {session_id} (expires: {expires_str})"
-            
-        elif msg_type == "session.updated":
-            return f"📡 SESSION: Updated session {msg.get('session', {}).get('id')}"
-            
-        # Conversation items
-        elif msg_type == "conversation.item.created":
-            item = msg.get("item", {})
-            item_type = item.get("type")
-            role = item.get("role")
-            item_id = item.get("id")
-            
-            if role == "user":
-                return f"👤 USER: New message started (ID: {item_id})"
-            elif role == "assistant" and item_type == "message":
-                return f"🤖 ASSISTANT: New message started (ID: {item_id})"
-            elif item_type == "function_call":
-                name = item.get("name", "unknown")
-                return f"🔧 FUNCTION: Starting '{name}' (ID: {item_id})"
-            
-        # Transcription events
-        elif msg_type == "conversation.item.input_audio_transcription.completed":
-            transcript = msg.get("transcript", "")
-            # Log completed user transcription
-            if self.session_id and transcript:
-                try:
-                    log_conversation_turn(
-                        self.session_id,
-                        "user",
-                        transcript
-                    )
-                except Exception as e:
-                    self.log(f"ERROR: Failed to log user transcript to conversation history: {e}", logging.ERROR)
-            return f"------ CONVERSATION ------\n👤 USER SAID: \"{transcript}\"\n---------------------------"
-            
-        elif msg_type == "response.audio_transcript.done":
-            transcript = msg.get("transcript", "")
-            # Log completed assistant response
-            if self.session_id and transcript:
-                try:
-                    log_conversation_turn(
-                        self.session_id,
-                        "assistant",
-                        transcript
-                    )
-                except Exception as e:
-                    self.log(f"ERROR: Failed to log assistant response to conversation history: {e}", logging.ERROR)
-            return f"------ CONVERSATION ------\n🤖 ASSISTANT SAID: \"{transcript}\"\n---------------------------"
-            
-        elif msg_type == "response.audio_transcript.done":
-            transcript = msg.get("transcript", "")
-            return f"------ CONVERSATION ------\n🤖 ASSISTANT SAID: \"{transcript}\"\n---------------------------"
-            
-        # Function calling
-        elif msg_type == "response.function_call_arguments.done":
-            name = msg.get("name")
-            call_id = msg.get("call_id")
-            args = msg.get("arguments", "{}")
-            args_preview = args[:100] + ("..." if len(args) > 100 else "")
-            return f"🔧 FUNCTION: Executing '{name}' (ID: {call_id})\n    Args: {args_preview}"
-            
-        # Truncation and completion events
-        elif msg_type == "conversation.item.truncated":
-            item_id = msg.get("item_id")
-            audio_end_ms = msg.get("audio_end_ms")
-            return f"✂️ TRUNCATED: Item {item_id} at {audio_end_ms}ms"
-            
-        elif msg_type == "response.output_item.done":
-            item = msg.get("item", {})
-            item_id = item.get("id")
-            item_type = item.get("type")
-            status = item.get("status")
-            return f"✅ COMPLETED: {item_type} (ID: {item_id}, Status: {status})"
-            
-        # Speech detection
-        elif msg_type == "input_audio_buffer.speech_started":
-            return f"🎤 SPEECH: User started speaking"
-            
-        elif msg_type == "input_audio_buffer.speech_stopped":
-            return f"🎤 SPEECH: User stopped speaking"
-            
-        # Error handling
-        elif msg_type == "error":
-            error_message = msg.get('error', {}).get('message', 'Unknown error')
-            error_code = msg.get('error', {}).get('code', 'unknown')
-            return f"❌ ERROR: {error_message} (Code: {error_code})"
-            
-        # Default handler for other message types
-        else:
-            # For any other message types, return a short preview
-            return f"ℹ️ {msg_type}: {str(msg)[:100]}..."
+    def _build_event_handlers(self) -> dict:
+        """Server event type -> handler(msg). Types not listed are logged as a one-line preview."""
+        return {
+            "session.created": self._on_session_created,
+            "session.updated": lambda msg: self.log(f"📡 SESSION: Updated session {msg.get('session', {}).get('id')}"),
+            "conversation.item.created": self._on_item_created,
+            "conversation.item.input_audio_transcription.delta": self._on_input_transcription_delta,
+            "conversation.item.input_audio_transcription.completed": self._on_input_transcription_completed,
+            "conversation.item.truncated": lambda msg: self.log(f"✂️ TRUNCATED: Item {msg.get('item_id')} at {msg.get('audio_end_ms')}ms"),
+            "input_audio_buffer.speech_started": self._on_speech_started,
+            "input_audio_buffer.speech_stopped": self._on_speech_stopped,
+            "input_audio_buffer.committed": self._on_input_buffer_committed,
+            "response.audio.delta": lambda msg: self._on_audio_delta(msg.get("item_id"), msg.get("delta")), # Frames the fast path couldn't scan
+            "response.audio.done": self._on_audio_done,
+            "response.audio_transcript.delta": None, # High rate; not logged
+            "response.audio_transcript.done": self._on_audio_transcript_done,
+            "response.output.delta": self._on_output_delta,
+            "response.function_call_arguments.delta": self._on_function_call_arguments_delta,
+            "response.function_call_arguments.done": self._on_function_call_arguments_done,
+            "response.output_item.done": self._on_output_item_done,
+            "response.done": self._on_response_done,
+            "error": self._on_error_event,
+        }
 
     def on_message(self, ws, message_str):
-        msg = json.loads(message_str)
+        if self._traffic_record_file and isinstance(message_str, str): self._traffic_record_file.write(message_str + "\n")
+        audio_delta = scan_audio_delta(message_str) # Most frames: skip the full parse
+        if audio_delta is not None:
+            self._on_audio_delta(*audio_delta)
+            return
+        msg = parse_event(message_str)
         msg_type = msg.get("type")
-
-        # For audio delta messages, use a counter instead of logging each one
-        if msg_type == "response.audio.delta":
-            self.audio_received_counter += 1
-            if self.audio_received_counter % 75 == 0:  # Log every 75th message
-                self.log(f"🔊 AUDIO: Received {self.audio_received_counter} chunks from OpenAI")
-        # For transcription deltas, format them more prominently
-        elif msg_type == "conversation.item.input_audio_transcription.delta":
-            transcript = msg.get("delta", "")
-            if transcript and transcript.strip():  # Only log if there's actual content
-                self.log(f"------ CONVERSATION ------\n👤 USER SAYING: \"{transcript.strip()}\"\n---------------------------")
-                # Log user's speech to conversation history
-                #if self.session_id:
-                #    try:
-                 #       log_conversation_turn(self.session_id, "user", transcript.strip())
-                  #  except Exception as e:
-                   #     self.log(f"ERROR: Failed to log user transcript to conversation history: {e}", logging.ERROR)
-        # For other high-frequency events that we want to minimize in logs
-        elif msg_type in ["response.audio_transcript.delta", "response.output.delta", "response.function_call_arguments.delta"]:
-            pass  # Skip logging these entirely
-        # For speech detection, use simplified format
-        elif msg_type == "input_audio_buffer.speech_started":
-            self.log(f"🎤 SPEECH: User started speaking | State: {self.get_app_state()}")
-        elif msg_type == "input_audio_buffer.speech_stopped":
-            self.log("🎤 SPEECH: User stopped speaking")
-        # For all other message types, use the formatter
-        else:
-            formatted_message = self._format_message(msg, msg_type)
-            self.log(formatted_message)
-
-        if msg_type == "conversation.item.created":
-            item = msg.get("item", {})
-            item_id, item_role, item_type, item_status = item.get("id"), item.get("role"), item.get("type"), item.get("status")
-            if item_role == "assistant" and item_type == "message" and item_status == "in_progress":
-                if self.last_assistant_item_id != item_id:
-                    self.log(f"------ CONVERSATION START ------\n🤖 ASSISTANT STARTING: New message (ID: {item_id})\n---------------------------")
-                    self.last_assistant_item_id = item_id
-                    self.current_assistant_item_played_ms = 0
-                    # Log assistant's response start
-                    if self.session_id:
-                        try:
-                            log_conversation_turn(self.session_id, "assistant", "Starting new response...")
-                        except Exception as e:
-                            self.log(f"ERROR: Failed to log assistant response start to conversation history: {e}", logging.ERROR)
-        
-        elif msg_type == "response.output.delta":
-            delta_content = msg.get("delta", {}).get("tool_calls", [])
-            for tc_obj in delta_content:
-                if isinstance(tc_obj, dict):
-                    call_id, fn_name = tc_obj.get("id"), tc_obj.get('function',{}).get('name')
-                    fn_args_partial = tc_obj.get('function',{}).get('arguments',"")
-                    if call_id and fn_name: 
-                        self.accumulated_tool_args[call_id] = self.accumulated_tool_args.get(call_id, "") + fn_args_partial
+        if msg_type in self._event_handlers:
+            handler = self._event_handlers[msg_type]
+            if handler: handler(msg)
+        else: self.log(f"ℹ️ {msg_type}: {str(msg)[:100]}...")
+
+    def _on_audio_delta(self, item_id_of_delta, audio_data_b64):
+        self.audio_received_counter += 1
+        if self.audio_received_counter % 75 == 0:  # Log every 75th message
+            self.log(f"🔊 AUDIO: Received {self.audio_received_counter} chunks from OpenAI")
+        # Skip processing audio if we're in wake word mode (sleeping)
+        if self.get_app_state() == "LISTENING_FOR_WAKEWORD":
+            return
+        if item_id_of_delta and item_id_of_delta in self.client_initiated_truncated_item_ids:
+            pass
+        elif audio_data_b64:
+            self.last_activity_t = time.time()
+            if self._turn_endpoints: self._on_first_response_audio()
+            audio_data_bytes = base64.b64decode(audio_data_b64)
+            self._process_and_play_audio(audio_data_bytes, item_id=item_id_of_delta)
+            if self.last_assistant_item_id and self.last_assistant_item_id == item_id_of_delta:
+                self.current_assistant_item_received_ms += len(audio_data_bytes) * 1000 // (self.openai_sample_rate * 2)
+
+    def _on_item_created(self, msg):
+        item = msg.get("item", {})
+        item_id, item_role, item_type, item_status = item.get("id"), item.get("role"), item.get("type"), item.get("status")
+        if item_id and item_id.startswith(REPLAY_ITEM_PREFIX):
+            if item_id == self._replay_last_item_id:
+                self.log(f"Client: Context restored ({(time.time() - self._replay_started_t) * 1000.0:.0f} ms from replay to last item acknowledged).")
+                self._replay_last_item_id = None
+            return
+        if item_role == "user": self.log(f"👤 USER: New message started (ID: {item_id})")
+        elif item_role == "assistant" and item_type == "message": self.log(f"🤖 ASSISTANT: New message started (ID: {item_id})")
+        elif item_type == "function_call": self.log(f"🔧 FUNCTION: Starting '{item.get('name', 'unknown')}' (ID: {item_id})")
+        if item_role == "assistant" and item_type == "message" and item_status == "in_progress":
+            if self.last_assistant_item_id != item_id:
+                self.log(f"------ CONVERSATION START ------\n🤖 ASSISTANT STARTING: New message (ID: {item_id})\n---------------------------")
+                self.last_assistant_item_id = item_id
+                self.current_assistant_item_received_ms = 0
+                self._log_turn("assistant", "Starting new response...", "assistant response start")
+
+    def _on_output_delta(self, msg):
+        delta_content = msg.get("delta", {}).get("tool_calls", [])
+        for tc_obj in delta_content:
+            if isinstance(tc_obj, dict):
+                call_id, fn_name = tc_obj.get("id"), tc_obj.get('function',{}).get('name')
+                fn_args_partial = tc_obj.get('function',{}).get('arguments',"")
+                if call_id and fn_name: 
+                    self.accumulated_tool_args[call_id] = self.accumulated_tool_args.get(call_id, "") + fn_args_partial
+
+    def _on_function_call_arguments_delta(self, msg):
+        call_id, delta_args = msg.get("call_id"), msg.get("delta", "") 
+        if call_id: self.accumulated_tool_args[call_id] = self.accumulated_tool_args.get(call_id, "") + delta_args
+
+    def _on_function_call_arguments_done(self, msg):
+        call_id = msg.get("call_id")
+        function_to_execute_name = msg.get("name") 
+        final_args_str_from_event = msg.get("arguments", "{}")
+        final_accumulated_args = self.accumulated_tool_args.pop(call_id, "{}") 
+        final_args_to_use = final_args_str_from_event if (final_args_str_from_event and final_args_str_from_event != "{}") else final_accumulated_args
+        self.log(f"🔧 FUNCTION: Executing '{function_to_execute_name}' (ID: {call_id})\n    Args: {final_args_str_from_event[:100]}{'...' if len(final_args_str_from_event) > 100 else ''}")
         
-        elif msg_type == "response.function_call_arguments.delta":
-            call_id, delta_args = msg.get("call_id"), msg.get("delta", "") 
-            if call_id: self.accumulated_tool_args[call_id] = self.accumulated_tool_args.get(call_id, "") + delta_args
-
-        elif msg_type == "response.function_call_arguments.done":
-            call_id = msg.get("call_id")
-            function_to_execute_name = msg.get("name") 
-            final_args_str_from_event = msg.get("arguments", "{}")
-            final_accumulated_args = self.accumulated_tool_args.pop(call_id, "{}") 
-            final_args_to_use = final_args_str_from_event if (final_args_str_from_event and final_args_str_from_event != "{}") else final_accumulated_args
-            
-            if not function_to_execute_name:
-                self.log(f"Client WARN: 'function_call_arguments.done' for Call_ID='{call_id}' missing function name. Args='{final_args_to_use}'.")
-                return
+        if not function_to_execute_name:
+            self.log(f"Client WARN: 'function_call_arguments.done' for Call_ID='{call_id}' missing function name. Args='{final_args_to_use}'.")
+            return
 
-            self.log(f"Client: Function Call Finalized by LLM: Name='{function_to_execute_name}', Call_ID='{call_id}', Args='{final_args_to_use}'")
-            # Log tool call to conversation history
-            if self.session_id:
-                log_conversation_turn(
-                    self.session_id,
-                    "tool_call",
-                    json.dumps({
-                        "name": function_to_execute_name,
-                        "arguments": final_args_to_use
-                    })
-                )
-            parsed_args = {}
+        self.log(f"Client: Function Call Finalized by LLM: Name='{function_to_execute_name}', Call_ID='{call_id}', Args='{final_args_to_use}'")
+        # Log tool call to conversation history
+        self._log_turn("tool_call", json.dumps({"name": function_to_execute_name, "arguments": final_args_to_use}), "tool call")
+        parsed_args = {}
+        try:
+            if final_args_to_use: parsed_args = json.loads(final_args_to_use) 
+        except json.JSONDecodeError as e:
+            self.log(f"Client WARN: Could not decode JSON arguments for {function_to_execute_name}: '{final_args_to_use}'. Error: {e}")
+            error_detail_for_llm = f"Invalid JSON arguments for tool {function_to_execute_name}. Error: {str(e)}"
+            error_output_for_llm = json.dumps({"error": error_detail_for_llm })
+            error_result_payload = {"type": "conversation.item.create", "item": {"type": "function_call_output", "call_id": call_id, "output": error_output_for_llm }}
             try:
-                if final_args_to_use: parsed_args = json.loads(final_args_to_use) 
-            except json.JSONDecodeError as e:
-                self.log(f"Client WARN: Could not decode JSON arguments for {function_to_execute_name}: '{final_args_to_use}'. Error: {e}")
-                error_detail_for_llm = f"Invalid JSON arguments for tool {function_to_execute_name}. Error: {str(e)}"
-                error_output_for_llm = json.dumps({"error": error_detail_for_llm })
-                error_result_payload = {"type": "conversation.item.create", "item": {"type": "function_call_output", "call_id": call_id, "output": error_output_for_llm }}
-                try:
-                    if self.ws_app and self.connected:
-                        ws.send(json.dumps(error_result_payload))
-                        ws.send(json.dumps({"type": "response.create", "response": {"modalities": ["text", "audio"], "voice": self.config.get("OPENAI_VOICE", "ash")}}))
-                except Exception as e_send_err: self.log(f"Client ERROR sending arg parsing error: {e_send_err}")
-                return 
-
-            if function_to_execute_name == END_CONVERSATION_TOOL_NAME:
-                reason = parsed_args.get("reason", "No reason specified by LLM.")
-                self.log(f"Client: LLM requests '{END_CONVERSATION_TOOL_NAME}'. Reason: '{reason}'.")
-                
-                # Set goodbye flag to prevent user audio during goodbye message
-                self.goodbye_in_progress = True
-                self.log("🔊 AUDIO: Starting goodbye sequence - blocking user audio")
-                
-                # Send response instructing LLM to say goodbye, then sleep after audio completes
-                goodbye_instruction = "Say a brief goodbye message (e.g., 'Okay, bye!' or 'Goodbye!') and I will go to sleep after you finish speaking."
-                tool_response_payload = {
-                    "type": "conversation.item.create",
-                    "item": {
-                        "type": "function_call_output",
-                        "call_id": call_id,
-                        "output": goodbye_instruction
-                    }
+                if self.ws_app and self.connected:
+                    self.sender.send_event(error_result_payload)
+                    self.sender.send_event({"type": "response.create", "response": {"modalities": ["text", "audio"], "voice": self.config.get("OPENAI_VOICE", "ash")}})
+            except Exception as e_send_err: self.log(f"Client ERROR sending arg parsing error: {e_send_err}")
+            return 
+
+        if function_to_execute_name == END_CONVERSATION_TOOL_NAME:
+            reason = parsed_args.get("reason", "No reason specified by LLM.")
+            self.log(f"Client: LLM requests '{END_CONVERSATION_TOOL_NAME}'. Reason: '{reason}'.")
+            
+            # Set goodbye flag to prevent user audio during goodbye message
+            self.goodbye_in_progress = True
+            self.log("🔊 AUDIO: Starting goodbye sequence - blocking user audio")
+            
+            # Send response instructing LLM to say goodbye, then sleep after audio completes
+            goodbye_instruction = "Say a brief goodbye message (e.g., 'Okay, bye!' or 'Goodbye!') and I will go to sleep after you finish speaking."
+            tool_response_payload = {
+                "type": "conversation.item.create",
+                "item": {
+                    "type": "function_call_output",
+                    "call_id": call_id,
+                    "output": goodbye_instruction
                 }
-                
-                try:
-                    if self.ws_app and self.connected:
-                        self.ws_app.send(json.dumps(tool_response_payload))
-                        self.log(f"Client: Sent goodbye instruction for end_conversation tool.")
-                        
-                        # Trigger LLM to respond with goodbye
-                        response_create_payload = {
-                            "type": "response.create",
-                            "response": {
-                                "modalities": ["text", "audio"],
-                                "voice": self.config.get("OPENAI_VOICE", "ash"),
-                                "output_audio_format": "pcm16"
-                            }
+            }
+            
+            try:
+                if self.ws_app and self.connected:
+                    self.sender.send_event(tool_response_payload)
+                    self.log(f"Client: Sent goodbye instruction for end_conversation tool.")
+                    
+                    # Trigger LLM to respond with goodbye
+                    response_create_payload = {
+                        "type": "response.create",
+                        "response": {
+                            "modalities": ["text", "audio"],
+                            "voice": self.config.get("OPENAI_VOICE", "ash"),
+                            "output_audio_format": "pcm16"
                         }
-                        self.ws_app.send(json.dumps(response_create_payload))
-                        self.log(f"Client: Triggered LLM response for goodbye message.")
-                        
-                        # Set pending sleep to happen after the goodbye audio completes
-                        self.pending_sleep_after_audio = True
-                        self.pending_sleep_reason = reason
-                        return
-                except Exception as e_send_goodbye:
-                    self.log(f"Client ERROR: Could not send goodbye instruction: {e_send_goodbye}")
-                    # Fallback to immediate transition if sending fails
-                    self.goodbye_in_progress = False  # Clear flag on error
-                    self._transition_to_sleep(reason)
+                    }
+                    self.sender.send_event(response_create_payload)
+                    self.log(f"Client: Triggered LLM response for goodbye message.")
+                    
+                    # Set pending sleep to happen after the goodbye audio completes
+                    self.pending_sleep_after_audio = True
+                    self.pending_sleep_reason = reason
                     return
-
-            elif function_to_execute_name in TOOL_HANDLERS:
-                handler_function = TOOL_HANDLERS[function_to_execute_name]
-                tool_thread = threading.Thread(target=self._execute_tool_in_thread, args=(handler_function, parsed_args, call_id, self.config, function_to_execute_name), daemon=True)
-                tool_thread.start()
-                return 
-            else: 
-                self.log(f"Client WARN: No handler for function '{function_to_execute_name}'. Call_ID='{call_id}'.")
-                unhandled_error_out = json.dumps({"error": f"Tool '{function_to_execute_name}' not implemented by client."})
-                error_payload = {"type": "conversation.item.create", "item": {"type": "function_call_output", "call_id": call_id, "output": unhandled_error_out}}
-                try:
-                    if self.ws_app and self.connected:
-                        ws.send(json.dumps(error_payload))
-                        ws.send(json.dumps({"type": "response.create", "response": {"modalities": ["text", "audio"], "voice": self.config.get("OPENAI_VOICE", "ash")}}))
-                except Exception as e_send_unhandled: self.log(f"Client ERROR sending unhandled tool error: {e_send_unhandled}")
+            except Exception as e_send_goodbye:
+                self.log(f"Client ERROR: Could not send goodbye instruction: {e_send_goodbye}")
+                # Fallback to immediate transition if sending fails
+                self.goodbye_in_progress = False  # Clear flag on error
+                self._transition_to_sleep(reason)
                 return
 
-        elif msg_type == "session.created":
-            self.session_id = msg.get('session', {}).get('id')
-            expires_at_ts = msg.get('session', {}).get('expires_at', 0)
-            self.log(f"Client: OpenAI Session created: {self.session_id}, Expires At (Unix): {expires_at_ts}")
-            if expires_at_ts > 0:
-                try: self.log(f"Client: Session expiry datetime: {time.strftime('%Y-%m-%d %H:%M:%S %Z', time.localtime(expires_at_ts))}")
-                except: self.log("Client: Could not parse session expiry to datetime.")
-            turn_detection_settings = msg.get('session', {}).get('turn_detection', {})
-            self.log(f"Client: Server turn_detection settings: {json.dumps(turn_detection_settings)}")
-            if self.get_app_state() == "LISTENING_FOR_WAKEWORD" and self.wake_word_active:
-                 print(f"\n*** CLIENT: Listening for wake word: '{self.wake_word_detector_instance.wake_word_model_name}' ***\n")
-            else:
-                 print(f"\n*** CLIENT: Speak now to interact with OpenAI (WW inactive or sending mode). ***\n")
+        elif function_to_execute_name in TOOL_HANDLERS:
+            handler_function = TOOL_HANDLERS[function_to_execute_name]
+            with self._tools_lock: self._tools_in_flight += 1
+            self._spawn(self._run_tool, handler_function, parsed_args, call_id, self.config, function_to_execute_name)
+            return 
+        else: 
+            self.log(f"Client WARN: No handler for function '{function_to_execute_name}'. Call_ID='{call_id}'.")
+            unhandled_error_out = json.dumps({"error": f"Tool '{function_to_execute_name}' not implemented by client."})
+            error_payload = {"type": "conversation.item.create", "item": {"type": "function_call_output", "call_id": call_id, "output": unhandled_error_out}}
+            try:
+                if self.ws_app and self.connected:
+                    self.sender.send_event(error_payload)
+                    self.sender.send_event({"type": "response.create", "response": {"modalities": ["text", "audio"], "voice": self.config.get("OPENAI_VOICE", "ash")}})
+            except Exception as e_send_unhandled: self.log(f"Client ERROR sending unhandled tool error: {e_send_unhandled}")
+            return
 
-        elif msg_type == "response.audio.delta":
-            # Skip processing audio if we're in wake word mode (sleeping)
-            if self.get_app_state() == "LISTENING_FOR_WAKEWORD":
-                return
-                
-            audio_data_b64 = msg.get("delta")
-            item_id_of_delta = msg.get("item_id")
-            self.audio_received_counter += 1
-            if self.audio_received_counter % 75 == 0:  # Log every 75th message
-                self.log(f"🔊 AUDIO: Received {self.audio_received_counter} chunks from OpenAI")
-            if item_id_of_delta and item_id_of_delta in self.client_initiated_truncated_item_ids:
-                pass
-            elif audio_data_b64:
-                audio_data_bytes = base64.b64decode(audio_data_b64)
-                self._process_and_play_audio(audio_data_bytes)
-                if self.last_assistant_item_id and self.last_assistant_item_id == item_id_of_delta:
-                    self.current_assistant_item_played_ms += self.client_audio_chunk_duration_ms
+    def _on_session_created(self, msg):
+        self.session_id = msg.get('session', {}).get('id')
+        expires_at_ts = msg.get('session', {}).get('expires_at', 0)
+        self.session_expires_at = expires_at_ts
+        self.log(f"📡 SESSION: Created new session {self.session_id} (expires at {expires_at_ts})")
+        if expires_at_ts > 0:
+            try: self.log(f"Client: Session expiry datetime: {time.strftime('%Y-%m-%d %H:%M:%S %Z', time.localtime(expires_at_ts))}")
+            except: self.log("Client: Could not parse session expiry to datetime.")
+        turn_detection_settings = msg.get('session', {}).get('turn_detection', {})
+        self.log(f"Client: Server turn_detection settings: {json.dumps(turn_detection_settings)}")
+        if self.get_app_state() == "LISTENING_FOR_WAKEWORD" and self.wake_word_active:
+             print(f"\n*** CLIENT: Listening for wake word: '{self.wake_word_detector_instance.wake_word_model_name}' ***\n")
+        else:
+             print(f"\n*** CLIENT: Speak now to interact with OpenAI (WW inactive or sending mode). ***\n")
+
+    def _on_audio_done(self, msg):
+        # Log completion with total count
+        self.log(f"🔊 AUDIO COMPLETE: Received {self.audio_received_counter} total chunks")
+        if self.player and hasattr(self.player, 'get_stats'):
+            self.log(f"🔊 PLAYER STATS: {self.player.get_stats()}")
+        # Reset counter for next conversation turn
+        self.audio_received_counter = 0
         
-        elif msg_type == "response.audio.done":
-            # Log completion with total count
-            self.log(f"🔊 AUDIO COMPLETE: Received {self.audio_received_counter} total chunks")
-            # Reset counter for next conversation turn
-            self.audio_received_counter = 0
-            
-            if self.tsm_enabled:
-                if len(self.openai_audio_buffer_raw_bytes) > 0:
-                    self.log(f"🔄 TSM: Processing {len(self.openai_audio_buffer_raw_bytes)} remaining bytes")
-                    final_segment_to_process_bytes_for_fallback = self.openai_audio_buffer_raw_bytes
-                    try:
-                        final_segment_bytes = self.openai_audio_buffer_raw_bytes
-                        self.openai_audio_buffer_raw_bytes = b''
-                        segment_np_int16 = np.frombuffer(final_segment_bytes, dtype=np.int16)
-                        segment_np_float32 = segment_np_int16.astype(np.float32) / 32768.0
-                        if segment_np_float32.size > 0:
-                            stretched_audio_float32 = wsola(segment_np_float32, s=self.desired_playback_speed)
-                            clipped_stretched_audio = np.clip(stretched_audio_float32, -1.0, 1.0)
-                            stretched_audio_int16 = (clipped_stretched_audio * 32767.0).astype(np.int16)
-                            stretched_audio_bytes = stretched_audio_int16.tobytes()
-                            if self.player and len(stretched_audio_bytes) > 0:
-                                self.player.play(stretched_audio_bytes)
-                    except Exception as e_tsm_flush_proc:
-                        self.log(f"❌ TSM ERROR: {e_tsm_flush_proc}. Falling back to raw audio.")
-                        if self.player and final_segment_to_process_bytes_for_fallback and len(final_segment_to_process_bytes_for_fallback) > 0:
-                           self.player.play(final_segment_to_process_bytes_for_fallback)
-            else:
-                if len(self.openai_audio_buffer_raw_bytes) > 0 and self.player:
-                    self.player.play(self.openai_audio_buffer_raw_bytes)
-                    self.openai_audio_buffer_raw_bytes = b''
-            if self.player: self.player.flush()
-            self.log(f"⚙️ STATE: Audio complete, app state: {self.get_app_state()}")
-            
-            # Check if we should transition to sleep after audio completion
-            if self.pending_sleep_after_audio:
-                self.log("🔊 AUDIO: Executing pending sleep transition after audio completion")
-                self.pending_sleep_after_audio = False
-                self._transition_to_sleep(self.pending_sleep_reason)
-                return
-            
-            if not (self.get_app_state() == "LISTENING_FOR_WAKEWORD" and self.wake_word_active):
-                print(f"\n*** Assistant has finished speaking. Ready for your next query. (Ctrl+C to exit) ***\n")
-
-        elif msg_type == "response.output_item.done":
-            item_done = msg.get("item", {})
-            item_id_done = item_done.get("id")
-            if self.last_assistant_item_id and self.last_assistant_item_id == item_id_done:
-                self.log(f"Client: Current assistant message item {item_id_done} is now fully done. Clearing tracking.")
-                self.last_assistant_item_id = None
-                self.current_assistant_item_played_ms = 0
-            if item_id_done in self.client_initiated_truncated_item_ids:
-                self.log(f"Client: Removing {item_id_done} from client_initiated_truncated_item_ids.")
-                self.client_initiated_truncated_item_ids.discard(item_id_done)
+        self._finish_response_audio()
+        self.log(f"⚙️ STATE: Audio complete, app state: {self.get_app_state()}")
         
-        elif msg_type == "response.done": 
-            response_details = msg.get("response", {})
-            if response_details.get("status") == "cancelled":
-                self.log(f"Client: response.done with status 'cancelled'. Cleaning up.")
-                for item_in_cancelled in response_details.get("output", []):
-                    if isinstance(item_in_cancelled, dict):
-                        item_id_cancelled = item_in_cancelled.get("id")
-                        if item_id_cancelled:
-                            self.client_initiated_truncated_item_ids.discard(item_id_cancelled)
-                            if self.last_assistant_item_id == item_id_cancelled:
-                                self.last_assistant_item_id = None; self.current_assistant_item_played_ms = 0
-        elif msg_type == "input_audio_buffer.speech_started":
-            self.log(f"🎤 SPEECH: User started speaking | State: {self.get_app_state()}")
-            if self.get_app_state() == "SENDING_TO_OPENAI": self._perform_truncation(reason_prefix="Server VAD")
-        elif msg_type == "input_audio_buffer.speech_stopped":
-            self.log("🎤 SPEECH: User stopped speaking")
-        elif msg_type == "error":
-            error_message = msg.get('error', {}).get('message', 'Unknown error from OpenAI.')
-            error_code = msg.get('error', {}).get('code', 'unknown')
-            self.log(f"❌ ERROR: {error_message} (Code: {error_code})")
-            if "session" in error_message.lower() or "authorization" in error_message.lower():
-                self.log("⚠️ CRITICAL: Session/auth error. Closing connection."); self.connected = False
-                if self.ws_app: self.ws_app.close()
+        # Check if we should transition to sleep after audio completion
+        if self.pending_sleep_after_audio:
+            self.log("🔊 AUDIO: Executing pending sleep transition after audio completion")
+            self.pending_sleep_after_audio = False
+            # The goodbye may still be queued in the player; wait for it off the websocket thread
+            self._spawn(self._transition_to_sleep_after_playback, self.pending_sleep_reason)
+            return
+        
+        if not (self.get_app_state() == "LISTENING_FOR_WAKEWORD" and self.wake_word_active):
+            print(f"\n*** Assistant has finished speaking. Ready for your next query. (Ctrl+C to exit) ***\n")
+
+    def _on_output_item_done(self, msg):
+        item_done = msg.get("item", {})
+        item_id_done = item_done.get("id")
+        self.log(f"✅ COMPLETED: {item_done.get('type')} (ID: {item_id_done}, Status: {item_done.get('status')})")
+        if self.last_assistant_item_id and self.last_assistant_item_id == item_id_done:
+            self.log(f"Client: Current assistant message item {item_id_done} is now fully done. Clearing tracking.")
+            self.last_assistant_item_id = None
+            self.current_assistant_item_received_ms = 0
+        if item_id_done in self.client_initiated_truncated_item_ids:
+            self.log(f"Client: Removing {item_id_done} from client_initiated_truncated_item_ids.")
+            self.client_initiated_truncated_item_ids.discard(item_id_done)
+
+    def _on_response_done(self, msg):
+        self.last_activity_t = time.time()
+        response_details = msg.get("response", {})
+        self.log(f"ℹ️ response.done: status={response_details.get('status')}")
+        if response_details.get("status") == "cancelled":
+            self.log(f"Client: response.done with status 'cancelled'. Cleaning up.")
+            for item_in_cancelled in response_details.get("output", []):
+                if isinstance(item_in_cancelled, dict):
+                    item_id_cancelled = item_in_cancelled.get("id")
+                    if item_id_cancelled:
+                        self.client_initiated_truncated_item_ids.discard(item_id_cancelled)
+                        if self.last_assistant_item_id == item_id_cancelled:
+                            self.last_assistant_item_id = None; self.current_assistant_item_received_ms = 0
+
+    def _on_speech_started(self, msg):
+        self.log(f"🎤 SPEECH: User started speaking | State: {self.get_app_state()}")
+        self._user_speaking = True; self.last_activity_t = time.time()
+        if self.get_app_state() == "SENDING_TO_OPENAI": self._perform_truncation(reason_prefix="Server VAD")
+        self._on_server_speech_started()
+
+    def _on_speech_stopped(self, msg):
+        self.log("🎤 SPEECH: User stopped speaking")
+        self._user_speaking = False; self.last_activity_t = time.time()
+        self._on_server_speech_stopped()
+
+    def _on_error_event(self, msg):
+        error_message = msg.get('error', {}).get('message', 'Unknown error from OpenAI.')
+        error_code = msg.get('error', {}).get('code', 'unknown')
+        self.log(f"❌ ERROR: {error_message} (Code: {error_code})")
+        if "session" in error_message.lower() or "authorization" in error_message.lower():
+            self.log("⚠️ CRITICAL: Session/auth error. Closing connection."); self.connected = False
+            self._close_socket()
+
+    def _on_input_transcription_delta(self, msg):
+        transcript = msg.get("delta", "")
+        if transcript and transcript.strip():  # Only log if there's actual content
+            self.log(f"------ CONVERSATION ------\n👤 USER SAYING: \"{transcript.strip()}\"\n---------------------------")
+
+    def _on_input_transcription_completed(self, msg):
+        transcript = msg.get("transcript", "")
+        if transcript: self._log_turn("user", transcript, "user transcript", summarize=True)
+        self.log(f"------ CONVERSATION ------\n👤 USER SAID: \"{transcript}\"\n---------------------------")
+
+    def _on_audio_transcript_done(self, msg):
+        transcript = msg.get("transcript", "")
+        if transcript: self._log_turn("assistant", transcript, "assistant response", summarize=True)
+        self.log(f"------ CONVERSATION ------\n🤖 ASSISTANT SAID: \"{transcript}\"\n---------------------------")
+
     def on_error(self, ws, error):
         self._log_section("WebSocket ERROR TEST")
         self.log(f"Client: WebSocket error: {error}")
@@ -979,7 +1199,7 @@ class OpenAISpeechClient:
         
         # Reset all state variables related to the active session
         self.last_assistant_item_id = None
-        self.current_assistant_item_played_ms = 0
+        self.current_assistant_item_received_ms = 0
         self.accumulated_tool_args.clear()
         self.client_initiated_truncated_item_ids.clear()
         
@@ -999,6 +1219,7 @@ class OpenAISpeechClient:
         self._log_section("WebSocket CLOSE")
         self.log(f"Client WS Closed: {close_status_code} {close_msg}")
         self.connected = False
+        if self.rolling_summarizer: self.rolling_summarizer.request_fold() # Have the summary current for the reconnect
         
         # Log connection close to conversation history if we have a session
         if self.session_id:
@@ -1025,6 +1246,7 @@ class OpenAISpeechClient:
 
     def run_client(self):
         self.log("Client: Starting run_client loop.")
+        if self.session_rotator: self.session_rotator.start()
         # Preserve self.session_id across reconnect attempts for history
         # It will be updated by session.created if OpenAI issues a new one.
         preserved_session_id_for_reconnect = self.session_id 
@@ -1038,6 +1260,10 @@ class OpenAISpeechClient:
             self.ws_app = websocket.WebSocketApp(self.ws_url, header=self.headers, on_open=self.on_open, on_message=self.on_message, on_error=self.on_error, on_close=self.on_close)
             try:
                 self.ws_app.run_forever(ping_interval=70, ping_timeout=30)
+                while True: # A rotated-in standby runs on its own thread; stay on it until it really disconnects
+                    with self._ws_swap_lock: handoff, self._ws_handoff_thread = self._ws_handoff_thread, None
+                    if handoff is None: break
+                    handoff.join()
             except Exception as e: self.log(f"Client: Exception in run_forever: {e}")
             finally:
                 self.connected = False
@@ -1070,9 +1296,20 @@ class OpenAISpeechClient:
                 if not self.keep_outer_loop_running: break
         self.log("Client: Exited run_client loop.")
 
+    def _close_traffic_record(self):
+        record_file, self._traffic_record_file = self._traffic_record_file, None
+        if record_file:
+            try: record_file.close()
+            except Exception: pass
+
     def close_connection(self):
         self.log("Client: close_connection() called.")
         self.keep_outer_loop_running = False
+        if self.session_rotator: self.session_rotator.stop()
+        if self.rolling_summarizer: self.rolling_summarizer.stop()
+        if self.tsm_worker: self.tsm_worker.stop()
+        self.sender.stop()
+        self._close_traffic_record()
         if self.ws_app:
             try:
                 if hasattr(self.ws_app, 'close') and callable(self.ws_app.close): self.ws_app.close()
@@ -0,0 +1,302 @@
+# openai_client_async.py
+"""
+asyncio implementation of the Realtime client (OPENAI_CLIENT_MODE=asyncio).
+
+AsyncOpenAISpeechClient has the same public surface as OpenAISpeechClient and
+subclasses it, so event handling, session config, truncation, endpointing and
+the TTS cache are shared. What changes is the transport and threading:
+
+  - One event loop per client instead of websocket-client's run_forever
+    thread. The websocket (`websockets` package), the outbound writer
+    (AsyncOutboundSender.run) and the reader are tasks.
+  - Tool calls run as tasks. Blocking handlers go to the loop's default
+    executor (a bounded, reused pool) instead of a new Thread per call.
+    Handler bookkeeping that touches SQLite (history turns, the rolling
+    summary counter, replay loads) goes to one bookkeeping thread, in order,
+    so audio deltas and keepalives never wait on the disk.
+  - Assistant audio goes from the reader to the TSM worker / player through
+    an asyncio.Queue and a playback task. The reader never blocks on player
+    backpressure; only a chunk that must wait for space is handed to a thread.
+  - Barge-in cancels the playback task and drops its queued audio before
+    truncating (structured cancellation rather than flags).
+  - Calls that arrive from the audio pipeline or main thread and touch
+    per-response state are marshalled onto the loop.
+  - Session rotation is done natively: the standby connection is opened and
+    primed by a task and swapped in on the loop.
+
+run_client() keeps the blocking signature main.py starts on a thread. To host
+several sessions in one process, run `await client.run()` for each on a shared
+loop instead.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import websockets
+
+from openai_client import OpenAISpeechClient
+from ws_sender import AsyncOutboundSender
+
+_FLUSH = object() # Playback queue marker: end of the response's audio
+
+
+class AsyncOpenAISpeechClient(OpenAISpeechClient):
+    def __init__(self, *args, **kwargs):
+        self.loop = None
+        self._stop = None # asyncio.Event, set by close_connection()
+        self._helper_tasks = set() # Tool calls and other executor work
+        self._playback_queue = None
+        self._playback_task = None
+        self._playback_pending = 0 # Chunks queued but not yet handed to the TSM worker / player; guarded by _playback_cond
+        self._playback_cond = threading.Condition() # Executor threads wait on it for the queue to drain
+        self._bookkeeping = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ClientBookkeeping") # One worker: turns stay in order
+        self._writer_task = None
+        super().__init__(*args, **kwargs)
+        self.session_rotator = None # Rotation runs as a task on this client's loop instead
+        self.rotation_enabled = bool(self.config.get("SESSION_ROTATION_ENABLED", False))
+        self.rotate_lead_s = float(self.config.get("SESSION_ROTATE_LEAD_S", 300))
+        self.rotate_idle_s = float(self.config.get("SESSION_ROTATE_IDLE_S", 3))
+        self.rotate_force_s = 20.0
+        self.rotation_stats = {"rotations": 0, "forced": 0, "standby_failures": 0, "last_prime_ms": 0.0}
+
+    # --- Hooks overridden from the threaded client ---
+    def _make_sender(self):
+        return AsyncOutboundSender(lambda: self.ws_app, lambda: self.connected, log_fn=self.log,
+                                   coalesce_ms=int(self.config.get("OPENAI_APPEND_COALESCE_MS", 90)))
+
+    def _on_loop(self) -> bool:
+        try: return asyncio.get_running_loop() is self.loop
+        except RuntimeError: return False
+
+    def _call_on_loop(self, fn, *args):
+        """Run fn on the loop: now if already there (or no loop yet), else as soon as the loop gets to it."""
+        if self.loop is None or self._on_loop(): fn(*args)
+        elif not self.loop.is_closed(): self.loop.call_soon_threadsafe(fn, *args)
+
+    def _spawn(self, target, *args):
+        def _start():
+            task = self.loop.create_task(asyncio.to_thread(target, *args))
+            self._helper_tasks.add(task); task.add_done_callback(self._helper_tasks.discard)
+        self._call_on_loop(_start)
+
+    def _close_socket(self):
+        ws = self.ws_app
+        if ws: self._call_on_loop(lambda: self.loop.create_task(ws.close()))
+
+    def _defer_blocking(self, fn, *args):
+        if not self._on_loop(): fn(*args); return # Already on a helper thread
+        future = self._bookkeeping.submit(fn, *args)
+        future.add_done_callback(lambda f: f.exception() and self.log(f"Client: Bookkeeping failed: {f.exception()}"))
+
+    def _add_playback_pending(self, delta: int):
+        with self._playback_cond:
+            self._playback_pending += delta
+            if self._playback_pending <= 0: self._playback_cond.notify_all()
+
+    def _process_and_play_audio(self, audio_data_bytes: bytes, item_id=None):
+        if self.get_app_state() == "LISTENING_FOR_WAKEWORD": return
+        self._add_playback_pending(1)
+        self._playback_queue.put_nowait((audio_data_bytes, item_id))
+
+    def _finish_response_audio(self):
+        self._add_playback_pending(1)
+        self._playback_queue.put_nowait((_FLUSH, None)) # Flush only after the audio queued before it
+
+    def _perform_truncation(self, reason_prefix: str):
+        if self.last_assistant_item_id: self._cancel_playback()
+        super()._perform_truncation(reason_prefix)
+
+    def _clear_audio_state(self):
+        self._call_on_loop(self._clear_audio_state_on_loop)
+
+    def _clear_audio_state_on_loop(self):
+        self._cancel_playback()
+        super()._clear_audio_state()
+
+    def _transition_to_sleep(self, reason):
+        self._call_on_loop(self._transition_to_sleep_on_loop, reason)
+
+    def _transition_to_sleep_on_loop(self, reason):
+        self._cancel_playback()
+        super()._transition_to_sleep(reason)
+
+    def _transition_to_sleep_after_playback(self, reason):
+        # Executor thread: the goodbye may still be in the playback queue ahead of the TSM worker / player
+        with self._playback_cond: self._playback_cond.wait_for(lambda: self._playback_pending <= 0, timeout=5.0)
+        super()._transition_to_sleep_after_playback(reason)
+
+    def handle_local_user_speech_interrupt(self):
+        self._call_on_loop(super().handle_local_user_speech_interrupt)
+
+    def is_idle_for_rotation(self, idle_s: float) -> bool:
+        with self._playback_cond: drained = self._playback_pending <= 0
+        return drained and super().is_idle_for_rotation(idle_s)
+
+    # --- Playback ---
+    def _start_playback_task(self):
+        self._playback_task = self.loop.create_task(self._playback_pump(), name="RealtimePlayback")
+
+    def _cancel_playback(self):
+        """Barge-in: drop queued assistant audio and cancel the playback task, even mid-handoff."""
+        if self._playback_queue is None: return
+        dropped = 0
+        while not self._playback_queue.empty():
+            self._playback_queue.get_nowait(); dropped += 1
+        if dropped: self._add_playback_pending(-dropped)
+        if self._playback_task and not self._playback_task.done():
+            self._playback_task.cancel()
+            self._start_playback_task()
+
+    async def _playback_pump(self):
+        while True:
+            pcm, item_id = await self._playback_queue.get()
+            try:
+                if pcm is _FLUSH: OpenAISpeechClient._finish_response_audio(self)
+                elif self.tsm_worker: self.tsm_worker.submit(pcm, item_id=item_id) # Never blocks
+                elif self.player:
+                    max_queued = getattr(self.player, "max_queued_bytes", None)
+                    if max_queued is None or self.player.buffered_bytes() + len(pcm) <= max_queued: self.player.play(pcm, item_id=item_id)
+                    else: await asyncio.to_thread(self.player.play, pcm, item_id) # Backpressure: wait off the loop
+            except asyncio.CancelledError: raise
+            except Exception as e_play: self.log(f"Client: Playback handoff failed: {e_play}")
+            finally: self._add_playback_pending(-1)
+
+    # --- Connection ---
+    def _header_dict(self) -> dict:
+        return dict(h.split(": ", 1) for h in self.headers)
+
+    async def _connect(self):
+        return await websockets.connect(self.ws_url, additional_headers=self._header_dict(), ping_interval=70, ping_timeout=30, max_size=None)
+
+    async def _read(self, ws):
+        async for message_str in ws:
+            try: self.on_message(ws, message_str)
+            except Exception as e_msg: self.log(f"Client: Error handling message: {e_msg}")
+
+    async def _serve(self, ws):
+        """Run one connection (and any sessions rotated in after it) until it closes or the client stops."""
+        self.ws_app = ws
+        await asyncio.to_thread(self.on_open, ws) # Frontend notify + session config; the summary follows in a helper task
+        stop_task = self.loop.create_task(self._stop.wait())
+        try:
+            while True:
+                reader = self.loop.create_task(self._read(ws))
+                rotation = self.loop.create_task(self._rotate_when_due()) if self.rotation_enabled else None
+                waiting = {reader, stop_task} | ({rotation} if rotation else set())
+                done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+                standby = rotation.result() if rotation in done else None
+                if rotation and not rotation.done(): rotation.cancel()
+                if standby is None: # Socket closed, or the client is stopping
+                    if not reader.done(): reader.cancel()
+                    if reader in done and reader.exception(): raise reader.exception()
+                    return
+                reader.cancel() # The old socket's close must not be handled as a disconnect
+                old_ws, ws = ws, standby
+                await old_ws.close()
+        finally:
+            stop_task.cancel()
+            await ws.close() # No-op if the server already closed it
+
+    async def _rotate_when_due(self):
+        """Open, prime and swap in a standby session before expires_at. Returns the new socket once swapped."""
+        retry_after = 0.0
+        while True:
+            await asyncio.sleep(1.0)
+            remaining = self.session_expires_at - time.time() if self.session_expires_at else None
+            if remaining is None or remaining > self.rotate_lead_s or time.time() < retry_after: continue
+            try: standby_ws, session_id, expires_at = await self._open_standby()
+            except Exception as e_standby:
+                self.rotation_stats["standby_failures"] += 1
+                self.log(f"Client: Standby session failed ({e_standby}). Retrying.")
+                retry_after = time.time() + min(30.0, max(1.0, remaining / 4))
+                continue
+            while True:
+                forced = self.session_expires_at - time.time() <= self.rotate_force_s
+                if forced or self.is_idle_for_rotation(self.rotate_idle_s): break
+                await asyncio.sleep(0.25)
+            self.sender.flush_audio()
+            self.ws_app = standby_ws # Single-threaded swap: the writer uses it for its next frame
+            self._adopt_session_state(session_id, expires_at, forced)
+            self.rotation_stats["rotations"] += 1; self.rotation_stats["forced"] += int(forced)
+            self.log(f"Client: Rotated to session {session_id} ({remaining:.0f}s before expiry{', forced' if forced else ''}). {self.rotation_stats}")
+            return standby_ws
+
+    async def _open_standby(self):
+        self.log(f"Client: Session expires in {self.session_expires_at - time.time():.0f}s. Preparing standby connection.")
+        session_config = await asyncio.to_thread(self.build_session_config, True) # Fresh summary for the standby
+        opened_t = time.time()
+        ws = await self._connect()
+        try:
+            await ws.send(json.dumps(session_config))
+            session_id, expires_at = await asyncio.wait_for(self._await_standby_ready(ws), timeout=20.0)
+            self.rotation_stats["last_prime_ms"] = round((time.time() - opened_t) * 1000.0, 1)
+            self.log(f"Client: Standby session {session_id} ready in {self.rotation_stats['last_prime_ms']:.0f} ms.")
+            return ws, session_id, expires_at
+        except BaseException:
+            await ws.close()
+            raise
+
+    @staticmethod
+    async def _await_standby_ready(ws):
+        session_id, expires_at = None, 0
+        while True:
+            msg = json.loads(await ws.recv())
+            if msg.get("type") == "session.created":
+                session_id = msg.get("session", {}).get("id"); expires_at = msg.get("session", {}).get("expires_at", 0)
+            elif msg.get("type") == "session.updated": return session_id, expires_at
+            elif msg.get("type") == "error": raise RuntimeError(msg.get("error", {}).get("message", "unknown error"))
+
+    async def run(self):
+        """Connection loop; the asyncio counterpart of run_client()."""
+        self.log("Client: Starting asyncio client loop.")
+        self.loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        if not self.keep_outer_loop_running: self._stop.set()
+        self.sender.bind_loop(self.loop)
+        self._writer_task = self.loop.create_task(self.sender.run(), name="RealtimeWriter")
+        self._playback_queue = asyncio.Queue()
+        self._start_playback_task()
+        preserved_session_id_for_reconnect = self.session_id
+        try:
+            while self.keep_outer_loop_running:
+                self.log(f"Client: Attempting WebSocket connection (session_id for history: {preserved_session_id_for_reconnect}).")
+                self.connected = False
+                self.current_assistant_text_response = ""
+                self.session_id = preserved_session_id_for_reconnect
+                close_code, close_reason = None, None
+                try:
+                    ws = await self._connect()
+                    await self._serve(ws)
+                    close_code, close_reason = self.ws_app.close_code, self.ws_app.close_reason
+                except Exception as e_conn:
+                    await asyncio.to_thread(self.on_error, self.ws_app, e_conn)
+                finally:
+                    self.connected = False
+                await asyncio.to_thread(self.on_close, self.ws_app, close_code, close_reason)
+                preserved_session_id_for_reconnect = self.session_id
+                if not self.keep_outer_loop_running: break
+                self.log(f"Client: Disconnected. Waiting {self.RECONNECT_DELAY_SECONDS}s.")
+                try: await asyncio.wait_for(self._stop.wait(), timeout=self.RECONNECT_DELAY_SECONDS)
+                except asyncio.TimeoutError: pass
+        finally:
+            for task in [self._writer_task, self._playback_task, *self._helper_tasks]:
+                if task: task.cancel()
+            await asyncio.gather(self._writer_task, self._playback_task, *self._helper_tasks, return_exceptions=True)
+        self.log("Client: Exited asyncio client loop.")
+
+    def run_client(self):
+        asyncio.run(self.run())
+
+    def close_connection(self):
+        self.log("Client: close_connection() called.")
+        self.keep_outer_loop_running = False
+        if self.rolling_summarizer: self.rolling_summarizer.stop()
+        if self.tsm_worker: self.tsm_worker.stop()
+        self.sender.stop()
+        self._bookkeeping.shutdown(wait=False) # Turns already queued are still written
+        self._close_traffic_record()
+        if self.loop and not self.loop.is_closed() and self._stop is not None:
+            self.loop.call_soon_threadsafe(self._stop.set)
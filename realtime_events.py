@@ -0,0 +1,49 @@
+# realtime_events.py
+"""
+Parsing helpers for inbound Realtime API frames.
+
+response.audio.delta is by far the most frequent server event and the largest
+(base64 PCM), yet on_message only needs its item_id and delta. scan_audio_delta()
+pulls those two fields out of the raw frame with str.find, so no dict is built
+and the payload is never copied through the JSON decoder. Anything it does not
+recognise (other event types, escaped strings, unexpected layout) returns None
+and the caller falls back to parse_event().
+
+parse_event() uses orjson when it is installed and json otherwise.
+"""
+
+import json
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+_AUDIO_DELTA_TYPE = '"type":"response.audio.delta"'
+_TYPE_SCAN_CHARS = 128 # "type" is one of the first keys the server writes
+_DELTA_KEY = '"delta":"'
+_ITEM_ID_KEY = '"item_id":"'
+
+
+def parse_event(message) -> dict:
+    return orjson.loads(message) if ORJSON_AVAILABLE else json.loads(message)
+
+
+def scan_audio_delta(message):
+    """(item_id, delta_b64) for a response.audio.delta frame, or None to use parse_event()."""
+    # A key/value pair like this can't appear unescaped inside any string value, so a match is the event's own type
+    if not isinstance(message, str) or message.find(_AUDIO_DELTA_TYPE, 0, _TYPE_SCAN_CHARS) < 0: return None
+    start = message.find(_DELTA_KEY)
+    if start < 0: return None
+    start += len(_DELTA_KEY)
+    end = message.find('"', start)
+    if end < 0 or message.find("\\", start, end) >= 0: return None # Escaped payload: let the decoder handle it
+    item_id = None
+    id_start = message.find(_ITEM_ID_KEY)
+    if id_start >= 0:
+        id_start += len(_ITEM_ID_KEY)
+        id_end = message.find('"', id_start)
+        if id_end < 0: return None
+        item_id = message[id_start:id_end]
+    return item_id, message[start:end]
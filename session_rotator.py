@@ -0,0 +1,142 @@
+# session_rotator.py
+"""
+Proactive rotation of the OpenAI Realtime session before it expires.
+
+A Realtime session ends at its `expires_at` (session.created). Left alone, the
+server closes the socket mid-conversation and run_client goes through the slow
+path: wait RECONNECT_DELAY_SECONDS, reconnect, then re-prime the history
+summary in the background - several seconds of dead air and lost context.
+
+SessionRotator watches the active session's expiry from a background thread.
+Once it is within `lead_s` of expiring it:
+
+  1. builds the session config with a freshly computed history summary and
+     call updates (the slow part runs here, off the audio path),
+  2. opens a standby websocket and sends that config, waiting for
+     session.updated,
+  3. waits for an idle gap (client.is_idle_for_rotation(), at least `idle_s`
+     without speech, audio or tool activity) and asks the client to swap the
+     standby in (client.adopt_rotated_connection). The old socket is detached
+     from the client's callbacks and closed.
+
+If no idle gap comes, the swap is forced `force_s` before expiry - cutting over
+to a ready session beats letting the server drop the connection.
+"""
+
+import json
+import threading
+import time
+
+import websocket
+
+
+class SessionRotator:
+    def __init__(self, client, lead_s: float = 300.0, idle_s: float = 3.0, force_s: float = 20.0,
+                 prime_timeout_s: float = 20.0, poll_s: float = 1.0, log_fn=print):
+        self.client = client
+        self.lead_s = lead_s
+        self.idle_s = idle_s
+        self.force_s = force_s
+        self.prime_timeout_s = prime_timeout_s
+        self.poll_s = poll_s
+        self.log = log_fn
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._standby = None # Dict for the standby connection being primed / ready
+        self._retry_after = 0.0
+        self.stats = {"rotations": 0, "forced": 0, "standby_failures": 0, "last_prime_ms": 0.0, "last_swap_gap_ms": 0.0}
+
+    def start(self):
+        if self._thread and self._thread.is_alive(): return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="SessionRotator", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._discard_standby("stopping")
+
+    def get_stats(self) -> dict:
+        return dict(self.stats)
+
+    # --- Rotator thread ---
+    def _run(self):
+        while not self._stop_event.wait(self.poll_s):
+            try: self._tick()
+            except Exception as e: self.log(f"SessionRotator: Error: {e}")
+
+    def _tick(self):
+        expires_at = self.client.session_expires_at
+        if not expires_at or not self.client.connected:
+            if self._standby and not self.client.connected: self._discard_standby("active connection lost")
+            return
+        remaining = expires_at - time.time()
+        if remaining > self.lead_s: return
+        if self._standby is None:
+            if time.time() < self._retry_after: return
+            self._open_standby()
+            return
+        standby = self._standby
+        if standby["failed"].is_set() or (not standby["primed"].is_set() and time.time() - standby["opened_t"] > self.prime_timeout_s):
+            self.stats["standby_failures"] += 1
+            self._discard_standby(standby.get("error") or "priming timed out")
+            self._retry_after = time.time() + min(30.0, max(self.poll_s, remaining / 4))
+            return
+        if not standby["primed"].is_set(): return
+        forced = remaining <= self.force_s
+        if not forced and not self.client.is_idle_for_rotation(self.idle_s): return
+        swap_start = time.time()
+        if self.client.adopt_rotated_connection(standby["app"], standby["thread"], standby["session_id"], standby["expires_at"], forced=forced):
+            self._standby = None
+            self.stats["rotations"] += 1; self.stats["forced"] += int(forced)
+            self.stats["last_swap_gap_ms"] = round((time.time() - swap_start) * 1000.0, 1)
+            self.log(f"SessionRotator: Rotated to session {standby['session_id']} ({remaining:.0f}s before expiry{', forced' if forced else ''}). {self.stats}")
+
+    def _open_standby(self):
+        self.log(f"SessionRotator: Session expires in {self.client.session_expires_at - time.time():.0f}s. Preparing standby connection.")
+        session_config = self.client.build_session_config(refresh_context=True) # Blocks on the summarizer; fine on this thread
+        standby = {"primed": threading.Event(), "failed": threading.Event(), "opened_t": time.time(),
+                   "session_id": None, "expires_at": 0, "error": None}
+
+        def on_open(ws):
+            try: ws.send(json.dumps(session_config))
+            except Exception as e: standby["error"] = f"config send failed: {e}"; standby["failed"].set()
+
+        def on_message(ws, message_str):
+            if standby["primed"].is_set(): return # Nothing but session events is expected before the swap
+            msg = json.loads(message_str)
+            msg_type = msg.get("type")
+            if msg_type == "session.created":
+                standby["session_id"] = msg.get("session", {}).get("id")
+                standby["expires_at"] = msg.get("session", {}).get("expires_at", 0)
+            elif msg_type == "session.updated":
+                self.stats["last_prime_ms"] = round((time.time() - standby["opened_t"]) * 1000.0, 1)
+                standby["primed"].set()
+                self.log(f"SessionRotator: Standby session {standby['session_id']} ready in {self.stats['last_prime_ms']:.0f} ms.")
+            elif msg_type == "error":
+                standby["error"] = msg.get("error", {}).get("message", "unknown error"); standby["failed"].set()
+
+        def on_error(ws, error):
+            standby["error"] = str(error); standby["failed"].set()
+
+        def on_close(ws, close_status_code, close_msg):
+            if not standby["error"]: standby["error"] = f"closed before swap ({close_status_code})"
+            standby["failed"].set()
+
+        app = websocket.WebSocketApp(self.client.ws_url, header=self.client.headers, on_open=on_open,
+                                     on_message=on_message, on_error=on_error, on_close=on_close)
+        standby["app"] = app
+        standby["thread"] = threading.Thread(target=app.run_forever, kwargs={"ping_interval": 70, "ping_timeout": 30},
+                                             name="RealtimeStandbyWS", daemon=True)
+        self._standby = standby
+        standby["thread"].start()
+
+    def _discard_standby(self, reason: str):
+        standby, self._standby = self._standby, None
+        if not standby: return
+        self.log(f"SessionRotator: Discarding standby connection ({reason}).")
+        app = standby.get("app")
+        if app:
+            app.on_message = app.on_error = app.on_close = None
+            try: app.close()
+            except Exception: pass
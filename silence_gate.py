@@ -0,0 +1,79 @@
+# silence_gate.py
+"""
+Client-side silence gate for the mic -> OpenAI send path.
+
+While in STATE_SENDING_TO_OPENAI every 30 ms mic chunk used to be appended,
+including minutes of room silence, all of which is paid for as bandwidth and
+audio input tokens. SilenceGate drops sustained quiet without starving the
+server VAD:
+
+  - open:     chunks pass through. Chunks below `threshold_dbfs` count towards
+              `hangover_ms`; any loud chunk resets the count, so pauses inside
+              speech are sent untouched.
+  - closing:  once the hangover is used up, `padding_ms` of digital silence is
+              sent in place of that chunk. Real room noise may hover around the
+              server VAD threshold; clean zeros guarantee it sees the end of
+              speech (server_vad silence_duration_ms defaults to 500 ms, which
+              the default hangover already covers).
+  - closed:   chunks are held in a `preroll_ms` rolling window and not sent.
+  - reopen:   the first loud chunk is sent together with the held window, so
+              the soft onset of the next utterance (server_vad prefix_padding_ms,
+              300 ms by default) is not lost.
+
+process() returns the (bytes, duration_ms) segments to append, in order.
+"""
+
+import numpy as np
+
+import dsp_kernels
+from audio_buffers import PreRollBuffer
+
+
+class SilenceGate:
+    def __init__(self, threshold_dbfs: float = -50.0, hangover_ms: float = 800.0, padding_ms: float = 300.0,
+                 preroll_ms: float = 300.0, chunk_ms: float = 30.0, sample_rate: int = 24000):
+        self.threshold_dbfs = threshold_dbfs
+        self.hangover_ms = hangover_ms
+        self.padding_ms = padding_ms
+        self.chunk_ms = chunk_ms
+        self.padding_bytes = int(sample_rate * padding_ms / 1000) * 2 # PCM16 mono
+        self.preroll = PreRollBuffer(preroll_ms, chunk_ms)
+        self.bytes_per_ms = sample_rate * 2 / 1000.0
+        self.stats = {"chunks_in": 0, "bytes_in": 0, "bytes_sent": 0, "closes": 0, "reopens": 0}
+        self._scratch = dsp_kernels.Scratch()
+        self.reset()
+
+    def reset(self):
+        """Open the gate and forget the quiet count (new conversation turn, or not sending)."""
+        self.is_open = True
+        self.quiet_ms = 0.0
+        self.preroll.clear()
+
+    @property
+    def bytes_saved(self) -> int:
+        """Mic PCM not sent (held pre-roll that went out later and padding are already netted off)."""
+        return self.stats["bytes_in"] - self.stats["bytes_sent"]
+
+    def get_stats(self) -> dict:
+        bytes_in = self.stats["bytes_in"]
+        return {**self.stats, "bytes_saved": self.bytes_saved, "audio_saved_s": round(self.bytes_saved / self.bytes_per_ms / 1000.0, 1),
+                "saved_pct": round(100.0 * self.bytes_saved / bytes_in, 1) if bytes_in else 0.0}
+
+    def process(self, chunk: bytes) -> list:
+        self.stats["chunks_in"] += 1; self.stats["bytes_in"] += len(chunk)
+        loud = dsp_kernels.rms_dbfs(np.frombuffer(chunk, dtype=np.int16), self._scratch) >= self.threshold_dbfs
+        if self.is_open:
+            self.quiet_ms = 0.0 if loud else self.quiet_ms + self.chunk_ms
+            if self.quiet_ms <= self.hangover_ms: return self._sent([(chunk, self.chunk_ms)])
+            self.is_open = False; self.stats["closes"] += 1
+            return self._sent([(bytes(self.padding_bytes), self.padding_ms)] if self.padding_bytes else [])
+        self.preroll.push(chunk)
+        if not loud: return []
+        held_ms = self.preroll.duration_ms()
+        self.is_open = True; self.quiet_ms = 0.0; self.stats["reopens"] += 1
+        if not held_ms: return self._sent([(chunk, self.chunk_ms)]) # Pre-roll disabled
+        return self._sent([(self.preroll.drain(), held_ms)])
+
+    def _sent(self, segments: list) -> list:
+        self.stats["bytes_sent"] += sum(len(data) for data, _ in segments)
+        return segments
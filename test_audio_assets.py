@@ -0,0 +1,50 @@
+# test_audio_assets.py
+"""Unit tests for audio_assets (decoded static playback assets). Run: python -m pytest -q test_audio_assets.py"""
+
+import os
+import wave
+
+import numpy as np
+
+from audio_assets import AudioAssetCache, parse_asset_spec
+
+
+def _quiet(*args, **kwargs): pass
+
+
+def test_parse_asset_spec():
+    spec = " ding = static/ding.mp3, chime=/abs/chime.wav,, broken, =x.wav, empty= "
+    assert parse_asset_spec(spec, base_dir="/app") == {"ding": os.path.join("/app", "static/ding.mp3"), "chime": "/abs/chime.wav"}
+    assert parse_asset_spec("ding=static/ding.mp3") == {"ding": "static/ding.mp3"}
+    assert parse_asset_spec("") == {} and parse_asset_spec(None) == {}
+
+
+def _write_wav(path, samples: np.ndarray, rate: int, channels: int = 1):
+    with wave.open(str(path), "wb") as wf:
+        wf.setnchannels(channels); wf.setsampwidth(2); wf.setframerate(rate)
+        wf.writeframes(samples.astype(np.int16).tobytes())
+
+
+def test_asset_is_decoded_once_then_memory_mapped(tmp_path):
+    samples = (np.sin(np.arange(2400) / 5) * 8000).astype(np.int16)
+    _write_wav(tmp_path / "ding.wav", samples, 24000)
+    cache = AudioAssetCache(str(tmp_path / "cache"), sample_rate=24000, log_fn=_quiet)
+    np.testing.assert_array_equal(cache.load("ding", str(tmp_path / "ding.wav")), samples)
+    assert cache.stats["decoded"] == 1 and cache.duration_ms("ding") == 100.0
+    again = AudioAssetCache(str(tmp_path / "cache"), sample_rate=24000, log_fn=_quiet)
+    mapped = again.load("ding", str(tmp_path / "ding.wav"))
+    assert again.stats == {"decoded": 0, "mapped": 1, "errors": 0}
+    assert isinstance(mapped, np.memmap) and not mapped.flags.writeable
+
+
+def test_asset_is_downmixed_and_resampled(tmp_path):
+    stereo = np.repeat((np.sin(np.arange(1600) / 5) * 8000).astype(np.int16), 2) # 100 ms at 16 kHz, L == R
+    _write_wav(tmp_path / "chime.wav", stereo, 16000, channels=2)
+    cache = AudioAssetCache(str(tmp_path / "cache"), sample_rate=24000, log_fn=_quiet)
+    assert cache.load("chime", str(tmp_path / "chime.wav")).size == 2400
+
+
+def test_missing_asset_is_counted_not_raised(tmp_path):
+    cache = AudioAssetCache(str(tmp_path / "cache"), log_fn=_quiet)
+    assert cache.load("nope", str(tmp_path / "nope.wav")) is None
+    assert cache.stats["errors"] == 1 and cache.get("nope") is None
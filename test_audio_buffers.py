@@ -0,0 +1,94 @@
+# test_audio_buffers.py
+"""Unit tests for audio_buffers. Run: python -m pytest -q test_audio_buffers.py"""
+
+from audio_buffers import AdaptiveJitterBuffer, PCMRingBuffer, PreRollBuffer
+
+BYTES_PER_SECOND = 48000 # 24 kHz PCM16 mono
+
+
+def test_ring_buffer_wraps_around():
+    ring = PCMRingBuffer(16, BYTES_PER_SECOND)
+    ring.write(bytes(range(12)))
+    assert ring.read(10) == bytes(range(10))
+    ring.write(bytes(range(100, 112))) # Crosses the end of the 16-byte buffer
+    assert ring.capacity == 16 and ring.grow_count == 0
+    assert ring.read(14) == bytes([10, 11]) + bytes(range(100, 112))
+    assert len(ring) == 0
+
+
+def test_ring_buffer_grows_instead_of_dropping():
+    ring = PCMRingBuffer(8, BYTES_PER_SECOND)
+    ring.write(bytes(range(6)))
+    ring.read(4)
+    ring.write(bytes(range(10, 30))) # Pending data wraps when the buffer has to grow
+    assert ring.grow_count == 1 and ring.capacity >= 22
+    assert ring.read(100) == bytes([4, 5]) + bytes(range(10, 30))
+    assert ring.total_written_bytes == 26 and ring.total_read_bytes == 26
+
+
+def test_ring_buffer_reads_are_frame_aligned_and_clear_counts():
+    ring = PCMRingBuffer(64, BYTES_PER_SECOND)
+    ring.write(bytes(7))
+    assert len(ring.read(5)) == 4
+    assert ring.read(1) == b""
+    assert ring.clear() == 3 and ring.total_cleared_bytes == 3
+    ring.write(bytes(2400))
+    assert ring.buffered_ms() == 50.0
+
+
+def test_pre_roll_keeps_only_the_newest_chunks():
+    preroll = PreRollBuffer(max_ms=90, chunk_ms=30)
+    for i in range(5): preroll.push(bytes([i]) * 2)
+    assert preroll.duration_ms() == 90
+    assert preroll.drain() == b"\x02\x02\x03\x03\x04\x04"
+    assert preroll.drain() == b"" and preroll.duration_ms() == 0
+
+
+def test_pre_roll_disabled_holds_nothing():
+    preroll = PreRollBuffer(max_ms=0, chunk_ms=30)
+    preroll.push(b"\x01\x02")
+    assert preroll.drain() == b""
+
+
+def _jitter_buffer(**kwargs):
+    ring = PCMRingBuffer(48000, BYTES_PER_SECOND)
+    return ring, AdaptiveJitterBuffer(ring, **kwargs)
+
+
+def test_jitter_buffer_primes_to_target_before_playing():
+    ring, jb = _jitter_buffer(min_ms=60, initial_ms=100)
+    ring.write(b"\x01" * 2400) # 50 ms, below the 100 ms target
+    assert jb.pull(480) == bytes(480) and jb.priming
+    ring.write(b"\x01" * 2400)
+    assert jb.pull(480) == b"\x01" * 480 and not jb.priming
+
+
+def test_jitter_buffer_plays_short_tail_at_end_of_stream():
+    ring, jb = _jitter_buffer(initial_ms=200)
+    ring.write(b"\x02" * 960)
+    jb.mark_end_of_stream()
+    assert jb.pull(480) == b"\x02" * 480
+    assert jb.pull(960) == b"\x02" * 480 + bytes(480) # Drained: padded, no underrun
+    assert jb.underruns == 0 and jb.priming
+
+
+def test_jitter_buffer_underrun_raises_target_and_rebuffers():
+    ring, jb = _jitter_buffer(min_ms=60, initial_ms=60, underrun_step_ms=20)
+    ring.write(b"\x03" * 2880) # 60 ms
+    assert jb.pull(2880) == b"\x03" * 2880
+    assert jb.pull(480) == bytes(480) # Starved mid-stream
+    assert jb.underruns == 1 and jb.priming and jb.target_ms == 80
+    ring.write(b"\x03" * 2880)
+    assert jb.pull(480) == bytes(480) # 60 ms is no longer enough
+
+
+def test_jitter_buffer_target_follows_arrival_jitter():
+    _, jb = _jitter_buffer(min_ms=60, max_ms=400, jitter_multiplier=3.0)
+    now = 0.0
+    for i in range(50):
+        now += 0.100 + (0.040 if i % 2 else -0.040) # 100 ms deltas arriving +-40 ms off
+        jb.on_arrival(4800, now)
+    assert jb.jitter_ms > 30
+    assert 60 + 3 * 30 < jb.target_ms <= 400
+    jb.on_arrival(4800, now + 5.0) # Idle gap: new stream, not a jitter sample
+    assert jb.jitter_ms < 80
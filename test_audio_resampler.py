@@ -0,0 +1,47 @@
+# test_audio_resampler.py
+"""Unit tests for audio_resampler.StreamingResampler. Run: python -m pytest -q test_audio_resampler.py"""
+
+import numpy as np
+
+from audio_resampler import StreamingResampler
+
+
+def _tone(freq_hz: float, rate: int, seconds: float, amplitude: int = 10000) -> np.ndarray:
+    t = np.arange(int(rate * seconds)) / rate
+    return (np.sin(2 * np.pi * freq_hz * t) * amplitude).astype(np.int16)
+
+
+def test_chunked_output_matches_one_shot():
+    signal = _tone(440, 24000, 0.5) + _tone(3100, 24000, 0.5, 3000)
+    one_shot = StreamingResampler(24000, 16000).process(signal)
+    chunked_rs = StreamingResampler(24000, 16000)
+    sizes = [720, 1, 2, 719, 333, 1440, 5]
+    pieces, pos, i = [], 0, 0
+    while pos < signal.size:
+        n = sizes[i % len(sizes)]; i += 1
+        pieces.append(chunked_rs.process(signal[pos:pos + n])); pos += n
+    np.testing.assert_array_equal(np.concatenate(pieces), one_shot)
+
+
+def test_output_length_and_bytes_input():
+    rs = StreamingResampler(24000, 16000)
+    assert rs.output_length_for(720) == 480
+    out = rs.process(bytes(1440)) # 30 ms chunk as bytes
+    assert out.dtype == np.int16 and out.size == 480
+    assert rs.process(b"").size == 0
+
+
+def test_tone_keeps_its_frequency():
+    out = StreamingResampler(24000, 16000).process(_tone(1000, 24000, 1.0))[2000:] # Skip the filter warm-up
+    spectrum = np.abs(np.fft.rfft(out * np.hanning(out.size)))
+    peak_hz = np.argmax(spectrum) * 16000 / out.size
+    assert abs(peak_hz - 1000) < 5
+
+
+def test_reset_forgets_history():
+    rs = StreamingResampler(24000, 16000)
+    chunk = _tone(440, 24000, 0.03)
+    first = rs.process(chunk)
+    rs.process(chunk)
+    rs.reset()
+    np.testing.assert_array_equal(rs.process(chunk), first)
@@ -0,0 +1,91 @@
+# test_audio_tsm.py
+"""Unit tests for audio_tsm (streaming WSOLA and its worker thread). Run: python -m pytest -q test_audio_tsm.py"""
+
+import numpy as np
+import pytest
+
+from audio_tsm import StreamingWSOLA, TSMWorker
+
+
+def _voice_like(seconds: float = 1.0, rate: int = 24000) -> np.ndarray:
+    t = np.arange(int(rate * seconds)) / rate
+    rng = np.random.default_rng(7)
+    x = 0.3 * np.sin(2 * np.pi * 180 * t) + 0.1 * np.sin(2 * np.pi * 900 * t) + 0.02 * rng.standard_normal(t.size)
+    return (x * 32767).astype(np.int16)
+
+
+def _stretch(engine: StreamingWSOLA, signal: np.ndarray, chunk: int) -> np.ndarray:
+    pieces = [engine.process(signal[i:i + chunk]).copy() for i in range(0, signal.size, chunk)]
+    pieces.append(engine.flush())
+    return np.concatenate(pieces)
+
+
+@pytest.mark.parametrize("speed", [0.8, 1.0, 1.25])
+def test_chunked_output_matches_one_shot(speed):
+    signal = _voice_like()
+    one_shot = _stretch(StreamingWSOLA(speed), signal, signal.size)
+    for chunk in (240, 719, 4800):
+        np.testing.assert_array_equal(_stretch(StreamingWSOLA(speed), signal, chunk), one_shot)
+
+
+@pytest.mark.parametrize("speed", [0.8, 1.25, 1.5])
+def test_output_length_follows_speed(speed):
+    signal = _voice_like()
+    out = _stretch(StreamingWSOLA(speed), signal, 2400)
+    assert out.size == round(signal.size / speed)
+
+
+def test_unit_speed_is_near_identity():
+    signal = _voice_like()
+    out = _stretch(StreamingWSOLA(1.0), signal, 2400)
+    assert out.size == signal.size
+    assert np.abs(out.astype(np.int32) - signal).max() <= 2 # Hann overlap-add sums to 1; float rounding only
+
+
+def test_flush_resets_for_the_next_stream():
+    signal = _voice_like(0.5)
+    engine = StreamingWSOLA(1.25)
+    first = _stretch(engine, signal, 2400)
+    np.testing.assert_array_equal(_stretch(engine, signal, 2400), first)
+
+
+def test_invalid_speed_is_rejected():
+    with pytest.raises(ValueError): StreamingWSOLA(0)
+
+
+class _Player:
+    def __init__(self):
+        self.pcm, self.item_ids, self.flushes = bytearray(), [], 0
+    def play(self, pcm, item_id=None):
+        self.pcm += pcm; self.item_ids.append(item_id)
+    def flush(self):
+        self.flushes += 1
+
+
+def test_worker_plays_stretched_audio_and_flushes():
+    player = _Player()
+    worker = TSMWorker(1.25, player)
+    try:
+        signal = _voice_like()
+        for i in range(0, signal.size, 2400): worker.submit(signal[i:i + 2400].tobytes(), item_id="item_1")
+        worker.flush()
+        assert worker.wait_until_idle()
+        assert len(player.pcm) // 2 == round(signal.size / 1.25)
+        assert player.flushes == 1 and set(player.item_ids) == {"item_1"}
+    finally: worker.stop()
+
+
+def test_worker_clear_drops_queued_audio():
+    player = _Player()
+    worker = TSMWorker(1.25, player)
+    try:
+        worker.clear()
+        worker.submit(_voice_like(0.2).tobytes()) # Queued after the clear: played
+        assert worker.wait_until_idle()
+        played = len(player.pcm)
+        assert played > 0
+        worker.clear()
+        worker.flush() # The tail from before the clear must not reach the player
+        assert worker.wait_until_idle()
+        assert len(player.pcm) == played and player.flushes == 1
+    finally: worker.stop()
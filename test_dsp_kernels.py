@@ -0,0 +1,66 @@
+# test_dsp_kernels.py
+"""Unit tests for dsp_kernels and the preallocated-buffer paths built on it. Run: python -m pytest -q test_dsp_kernels.py"""
+
+import numpy as np
+
+import dsp_kernels
+from audio_resampler import StreamingResampler
+from audio_tsm import StreamingWSOLA
+
+
+def _tone(freq_hz: float, rate: int, seconds: float, amplitude: int = 10000) -> np.ndarray:
+    t = np.arange(int(rate * seconds)) / rate
+    return (np.sin(2 * np.pi * freq_hz * t) * amplitude).astype(np.int16)
+
+
+def test_scratch_reuses_and_grows():
+    scratch = dsp_kernels.Scratch()
+    a = scratch.get("x", 100, np.float32)
+    assert np.shares_memory(a, scratch.get("x", 50, np.float32))
+    assert scratch.get("x", 5000, np.float32).size == 5000
+    assert scratch.get("x", 10, np.int16).dtype == np.int16
+
+
+def test_apply_gain_q15_rounds_and_saturates():
+    scratch = dsp_kernels.Scratch()
+    samples = np.array([0, 1, 2, 3, -3, 10000, -32768, 32767], dtype=np.int16)
+    gain_q15 = dsp_kernels.gain_to_q15(0.2)
+    reference = (samples.astype(np.int64) * gain_q15 + (1 << 14)) >> 15 # Round half up, then shift
+    out = dsp_kernels.apply_gain_q15(samples, gain_q15, scratch)
+    np.testing.assert_array_equal(out, reference)
+    assert np.abs(out - samples * 0.2).max() <= 1
+    loud = dsp_kernels.apply_gain_q15(np.array([20000, -20000], dtype=np.int16), dsp_kernels.gain_to_q15(2.0), scratch)
+    np.testing.assert_array_equal(loud, [32767, -32768])
+
+
+def test_int16_float32_conversions():
+    scratch = dsp_kernels.Scratch()
+    samples = np.array([-32768, -1, 0, 1, 32767], dtype=np.int16)
+    as_float = dsp_kernels.int16_to_float32(samples, np.empty(5, dtype=np.float32))
+    np.testing.assert_allclose(as_float, samples / 32768.0)
+    x = np.array([-2.0, -1.0, -0.5, 0.0, 0.25, 1.0, 3.0], dtype=np.float32)
+    out = dsp_kernels.float32_to_int16(x, np.empty(x.size, dtype=np.int16), scratch)
+    np.testing.assert_array_equal(out, (np.clip(x, -1.0, 1.0) * 32767.0).astype(np.int16))
+
+
+def test_rms_dbfs():
+    assert dsp_kernels.rms_dbfs(np.zeros(0, dtype=np.int16)) == -120.0
+    full_scale_square = np.array([32767, -32767] * 240, dtype=np.int16)
+    assert abs(dsp_kernels.rms_dbfs(full_scale_square, dsp_kernels.Scratch())) < 0.01
+    assert abs(dsp_kernels.rms_dbfs(_tone(440, 24000, 0.1, 32767)) + 3.01) < 0.1 # Sine: -3 dB
+
+
+def test_resampler_reuse_output_returns_a_view():
+    rs = StreamingResampler(24000, 16000, reuse_output=True)
+    assert np.shares_memory(rs.process(_tone(440, 24000, 0.03)), rs.process(_tone(440, 24000, 0.03)))
+    rs = StreamingResampler(24000, 16000)
+    assert not np.shares_memory(rs.process(_tone(440, 24000, 0.03)), rs.process(_tone(440, 24000, 0.03)))
+
+
+def test_wsola_reuse_output_matches_copied_output():
+    signal = _tone(180, 24000, 0.5)
+    reused, copied = StreamingWSOLA(1.25, reuse_output=True), StreamingWSOLA(1.25)
+    for i in range(0, signal.size, 2400):
+        a, b = reused.process(signal[i:i + 2400]), copied.process(signal[i:i + 2400])
+        np.testing.assert_array_equal(a, b)
+    np.testing.assert_array_equal(reused.flush(), copied.flush())
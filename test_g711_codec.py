@@ -0,0 +1,55 @@
+# test_g711_codec.py
+"""Unit tests for g711_codec (μ-law input path). Run: python -m pytest -q test_g711_codec.py"""
+
+import warnings
+
+import numpy as np
+import pytest
+
+from audio_resampler import StreamingResampler
+from g711_codec import UlawInputEncoder, ulaw_decode, ulaw_encode
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", DeprecationWarning)
+    try:
+        import audioop # Reference encoder; removed from the stdlib in Python 3.13
+    except ImportError:
+        audioop = None
+
+ALL_INT16 = np.arange(-32768, 32768, dtype=np.int16)
+
+
+@pytest.mark.skipif(audioop is None, reason="audioop not available")
+def test_encode_matches_audioop_for_every_sample():
+    expected = np.frombuffer(audioop.lin2ulaw(ALL_INT16.tobytes(), 2), dtype=np.uint8)
+    np.testing.assert_array_equal(ulaw_encode(ALL_INT16), expected)
+
+
+@pytest.mark.skipif(audioop is None, reason="audioop not available")
+def test_decode_matches_audioop():
+    codes = np.arange(256, dtype=np.uint8)
+    expected = np.frombuffer(audioop.ulaw2lin(codes.tobytes(), 2), dtype=np.int16)
+    np.testing.assert_array_equal(ulaw_decode(codes), expected)
+
+
+def test_round_trip_error_is_within_the_segment_step():
+    samples = ALL_INT16.astype(np.int32)
+    error = np.abs(ulaw_decode(ulaw_encode(ALL_INT16)).astype(np.int32) - samples)
+    magnitude = np.abs(samples)
+    assert error[magnitude < 256].max() <= 12 # Finest segments
+    assert (error[magnitude >= 256] <= magnitude[magnitude >= 256] // 16).all() # 4-bit mantissa: ~6% relative
+
+
+def test_encoder_downsamples_then_encodes():
+    rng = np.random.default_rng(3)
+    pcm = (rng.standard_normal(24000) * 4000).astype(np.int16)
+    chunked = UlawInputEncoder(24000)
+    out = b"".join(chunked.process(pcm[i:i + 720].tobytes()) for i in range(0, pcm.size, 720))
+    assert len(out) == 8000 # 1 s at 8 kHz, one byte per sample
+    expected = ulaw_encode(StreamingResampler(24000, 8000).process(pcm)).tobytes()
+    assert out == expected
+
+
+def test_encoder_at_8khz_skips_resampling():
+    pcm = np.array([0, 100, -100, 32767], dtype=np.int16)
+    assert UlawInputEncoder(8000).process(pcm.tobytes()) == ulaw_encode(pcm).tobytes()
@@ -0,0 +1,45 @@
+# test_realtime_events.py
+"""Unit tests for realtime_events (fast-path scan of response.audio.delta frames). Run: python -m pytest -q test_realtime_events.py"""
+
+import json
+
+from realtime_events import parse_event, scan_audio_delta
+
+
+def _frame(payload: dict, compact: bool = True) -> str:
+    return json.dumps(payload, separators=(",", ":")) if compact else json.dumps(payload)
+
+
+def test_audio_delta_agrees_with_the_json_decoder():
+    frame = _frame({"type": "response.audio.delta", "event_id": "ev_1", "response_id": "resp_1", "item_id": "item_9",
+                    "output_index": 0, "content_index": 0, "delta": "AAECAwQF+/8="})
+    msg = parse_event(frame)
+    assert scan_audio_delta(frame) == (msg["item_id"], msg["delta"])
+
+
+def test_audio_delta_without_item_id():
+    assert scan_audio_delta(_frame({"type": "response.audio.delta", "delta": "AAAA"})) == (None, "AAAA")
+
+
+def test_other_events_fall_back_to_the_decoder():
+    assert scan_audio_delta(_frame({"type": "response.audio_transcript.delta", "item_id": "i", "delta": "hi"})) is None
+    assert scan_audio_delta(_frame({"type": "response.audio.done", "item_id": "i"})) is None
+    assert scan_audio_delta(_frame({"type": "response.audio.delta", "delta": "AAAA"}, compact=False)) is None # Unknown layout
+
+
+def test_type_string_inside_a_value_is_not_matched():
+    frame = _frame({"type": "conversation.item.created", "item": {"content": [{"text": '"type":"response.audio.delta" "delta":"x"'}]}})
+    assert scan_audio_delta(frame) is None
+    assert parse_event(frame)["type"] == "conversation.item.created"
+
+
+def test_escaped_payload_is_left_to_the_decoder():
+    frame = _frame({"type": "response.audio.delta", "item_id": "i", "delta": "ab\\/cd"})
+    assert scan_audio_delta(frame) is None
+    assert parse_event(frame)["delta"] == "ab\\/cd"
+
+
+def test_non_string_frames_are_not_scanned():
+    frame = _frame({"type": "response.audio.delta", "delta": "AAAA"})
+    assert scan_audio_delta(frame.encode("utf-8")) is None
+    assert parse_event(frame.encode("utf-8"))["delta"] == "AAAA"
@@ -0,0 +1,57 @@
+# test_tts_audio_cache.py
+"""Unit tests for tts_audio_cache.TTSAudioCache. Run: python -m pytest -q test_tts_audio_cache.py"""
+
+import os
+import threading
+
+from tts_audio_cache import TTSAudioCache
+
+
+def _quiet(*args, **kwargs): pass
+
+
+def test_tts_key_depends_on_model_voice_and_trimmed_text(tmp_path):
+    cache = TTSAudioCache(str(tmp_path), model="tts-1", log_fn=_quiet)
+    assert cache.key("ash", "Hi there.") == cache.key("ash", "  Hi there. ")
+    assert cache.key("ash", "Hi there.") != cache.key("alloy", "Hi there.")
+    assert cache.key("ash", "Hi there.") != TTSAudioCache(str(tmp_path), model="tts-1-hd", log_fn=_quiet).key("ash", "Hi there.")
+
+
+def test_tts_put_get_survives_a_restart(tmp_path):
+    cache = TTSAudioCache(str(tmp_path), log_fn=_quiet)
+    assert cache.get("ash", "Hello") is None and cache.stats["misses"] == 1
+    cache.put("ash", "Hello", b"\x01\x02" * 10)
+    assert cache.get("ash", "Hello") == b"\x01\x02" * 10 and cache.contains("ash", "Hello")
+    restarted = TTSAudioCache(str(tmp_path), log_fn=_quiet)
+    assert restarted.get("ash", "Hello") == b"\x01\x02" * 10 # From disk
+    assert not any(name.endswith(".tmp") for name in os.listdir(tmp_path))
+
+
+def test_tts_memory_is_bounded_lru(tmp_path):
+    cache = TTSAudioCache(str(tmp_path), max_memory_items=2, log_fn=_quiet)
+    for text in ("a", "b", "c"): cache.put("ash", text, text.encode() * 2)
+    assert cache.key("ash", "a") not in cache._memory and len(cache._memory) == 2
+    assert cache.get("ash", "a") == b"aa" # Still on disk
+
+
+def test_tts_concurrent_renders_of_one_phrase_render_once(tmp_path):
+    cache = TTSAudioCache(str(tmp_path), log_fn=_quiet)
+    started, release, calls = threading.Event(), threading.Event(), []
+    def render(voice, text):
+        calls.append(text); started.set(); release.wait(5)
+        return b"\x00\x01" * 100
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_render("ash", "Yes?", render))) for _ in range(4)]
+    threads[0].start(); started.wait(5)
+    for t in threads[1:]: t.start()
+    release.set()
+    for t in threads: t.join(5)
+    assert calls == ["Yes?"] and results == [b"\x00\x01" * 100] * 4
+    assert cache.stats["renders"] == 1
+
+
+def test_tts_failed_render_returns_none(tmp_path):
+    cache = TTSAudioCache(str(tmp_path), log_fn=_quiet)
+    def render(voice, text): raise RuntimeError("no network")
+    assert cache.get_or_render("ash", "Hi", render) is None
+    assert cache.stats["render_errors"] == 1 and not cache.contains("ash", "Hi")
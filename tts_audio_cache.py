@@ -0,0 +1,116 @@
+# tts_audio_cache.py
+"""
+Persistent cache of pre-rendered TTS audio (24 kHz PCM16 mono).
+
+Entries are keyed by (tts model, voice, text) and stored as raw .pcm files in
+`cache_dir`, so fixed phrases - wake greetings, "I have an update on your call
+with <name>" announcements - are rendered once and then play instantly, across
+restarts. Recently used entries are also held in memory.
+
+Rendering is done by a caller-supplied render_fn(voice, text) -> bytes (the
+client's OpenAI TTS call). prerender_async() renders missing phrases on a
+background thread ahead of when they are needed; concurrent requests for the
+same phrase render it only once.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+
+class TTSAudioCache:
+    def __init__(self, cache_dir: str, model: str = "tts-1", max_memory_items: int = 32, log_fn=print):
+        self.cache_dir = cache_dir
+        self.model = model
+        self.max_memory_items = max_memory_items
+        self.log = log_fn
+        self._memory = OrderedDict() # key -> PCM bytes, least recently used first
+        self._lock = threading.Lock()
+        self._rendering = {} # key -> Event set when that render finishes
+        self.stats = {"hits": 0, "misses": 0, "renders": 0, "render_errors": 0}
+        try: os.makedirs(cache_dir, exist_ok=True)
+        except OSError as e: self.log(f"TTSAudioCache: Cannot create '{cache_dir}': {e}. Disk cache disabled.")
+
+    def key(self, voice: str, text: str) -> str:
+        return hashlib.sha1(f"{self.model}|{voice}|{text.strip()}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pcm")
+
+    def _remember_locked(self, key: str, pcm: bytes):
+        self._memory[key] = pcm
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items: self._memory.popitem(last=False)
+
+    def get(self, voice: str, text: str):
+        """Cached PCM for (voice, text), or None."""
+        key = self.key(voice, text)
+        with self._lock:
+            pcm = self._memory.get(key)
+            if pcm is not None:
+                self._memory.move_to_end(key); self.stats["hits"] += 1
+                return pcm
+        try:
+            with open(self._path(key), "rb") as f: pcm = f.read()
+        except OSError: pcm = None
+        with self._lock:
+            if not pcm:
+                self.stats["misses"] += 1
+                return None
+            self._remember_locked(key, pcm); self.stats["hits"] += 1
+        return pcm
+
+    def contains(self, voice: str, text: str) -> bool:
+        key = self.key(voice, text)
+        with self._lock:
+            if key in self._memory: return True
+        return os.path.exists(self._path(key))
+
+    def put(self, voice: str, text: str, pcm: bytes):
+        if not pcm: return
+        key = self.key(voice, text)
+        with self._lock: self._remember_locked(key, pcm)
+        tmp_path = self._path(key) + ".tmp"
+        try:
+            with open(tmp_path, "wb") as f: f.write(pcm)
+            os.replace(tmp_path, self._path(key)) # Readers never see a partial file
+        except OSError as e: self.log(f"TTSAudioCache: Could not persist '{text[:40]}': {e}")
+
+    def get_or_render(self, voice: str, text: str, render_fn):
+        """Cached PCM, rendering (and caching) it on a miss. Returns None if rendering fails."""
+        pcm = self.get(voice, text)
+        if pcm is not None: return pcm
+        key = self.key(voice, text)
+        with self._lock:
+            if key in self._memory: # Another render finished since the miss above
+                self._memory.move_to_end(key); self.stats["hits"] += 1
+                return self._memory[key]
+            pending = self._rendering.get(key)
+            if pending is None: self._rendering[key] = threading.Event()
+        if pending is not None: # Someone else is rendering this phrase; use their result
+            pending.wait(timeout=30)
+            return self.get(voice, text)
+        try:
+            pcm = render_fn(voice, text)
+            if pcm:
+                self.put(voice, text, pcm); self.stats["renders"] += 1
+            else: self.stats["render_errors"] += 1
+            return pcm
+        except Exception as e:
+            self.stats["render_errors"] += 1
+            self.log(f"TTSAudioCache: Render failed for '{text[:40]}': {e}")
+            return None
+        finally:
+            with self._lock: self._rendering.pop(key).set()
+
+    def prerender_async(self, voice: str, texts, render_fn):
+        """Render any of `texts` not yet cached on a background thread."""
+        missing = [t for t in texts if t and not self.contains(voice, t)]
+        if not missing: return None
+        def _run():
+            for text in missing: self.get_or_render(voice, text, render_fn)
+            self.log(f"TTSAudioCache: Pre-rendered {len(missing)} phrase(s) for voice '{voice}'.")
+        thread = threading.Thread(target=_run, name="TTSPrerender", daemon=True)
+        thread.start()
+        return thread
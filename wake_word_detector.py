@@ -16,6 +16,8 @@ from typing import Dict, Any, Optional, Tuple # Not strictly needed for this fil
 from dotenv import load_dotenv
 load_dotenv() # Ensures .env is loaded when this module is imported or run
 
+from audio_resampler import StreamingResampler
+
 # Print Python path to help with debugging - only when run directly
 if __name__ == "__main__":
     import sys
@@ -103,7 +105,15 @@ except ImportError as e:
 class WakeWordDetector:
     """
     Handles wake word detection using openWakeWord.
+
+    Audio is accumulated into fixed 80 ms (1280-sample) frames, openWakeWord's
+    native step, and the model runs once per full frame instead of once per
+    incoming chunk. Extra models listed in WAKE_WORD_MODELS are loaded into the
+    same openWakeWord Model, so one predict() call computes the shared
+    melspectrogram/embedding features once and scores every model.
     """
+
+    FRAME_SAMPLES = 1280 # 80 ms at 16 kHz
     
     def __init__(self,
                  wake_word_model: Optional[str] = None,
@@ -111,6 +121,10 @@ class WakeWordDetector:
                  sample_rate: int = 16000):
         print(f"WakeWordDetector: Initializing... OPENWAKEWORD_AVAILABLE is {OPENWAKEWORD_AVAILABLE}")
         self.wake_word_model_name = wake_word_model or os.environ.get("WAKE_WORD_MODEL", "hey_jarvis") # Use a default like hey_jarvis
+        # Optional additional models scored in the same predict() call (comma-separated base names)
+        extra_models = [m.strip() for m in os.environ.get("WAKE_WORD_MODELS", "").split(",") if m.strip()]
+        self.wake_word_model_names = [self.wake_word_model_name] + [m for m in extra_models if m != self.wake_word_model_name]
+        self.last_detected_model = None
         
         threshold_str = os.environ.get("WAKE_WORD_THRESHOLD", "0.5")
         self.threshold = threshold if threshold is not None else float(threshold_str)
@@ -139,7 +153,7 @@ class WakeWordDetector:
                 
                 # For openwakeword >0.5, wakeword_models should be list of base names, not filenames
                 self.model = OpenWakeWordModel(
-                    wakeword_models=[self.wake_word_model_name], # Pass base name like "hey_jarvis"
+                    wakeword_models=self.wake_word_model_names, # Pass base names like "hey_jarvis"
                     inference_framework=self.model_type
                 )
                 
@@ -157,24 +171,14 @@ class WakeWordDetector:
             print("WakeWordDetector: openWakeWord not available or core components not imported. Using dummy model.")
             self.model = OpenWakeWordModel() # This will be DummyOpenWakeWordModel if import failed
 
-        self.buffer = np.array([], dtype=np.int16) # Store as int16, convert to float32 for predict
+        self.buffer = np.zeros(self.FRAME_SAMPLES, dtype=np.int16) # One openWakeWord frame, filled in place
+        self._buffered = 0 # Valid samples in self.buffer
+        self.chunks_in = 0
+        self.predict_calls = 0
         self._config_printed = False
         self._raw_values_info_printed = False
         self._resampling_info_printed = False
-        self._scipy_checked = False
-        self._scipy_available = False
-
-    def _check_scipy(self):
-        if not self._scipy_checked:
-            try:
-                import scipy.signal
-                self._scipy_available = True
-                print("WakeWordDetector: Scipy is available for resampling.")
-            except ImportError:
-                self._scipy_available = False
-                print("WakeWordDetector: Scipy not installed, resampling will not be performed. Ensure input audio is 16kHz.")
-            self._scipy_checked = True
-        return self._scipy_available
+        self._resampler = None # Created lazily, only when input rate != 16kHz
 
     def process_audio(self, audio_chunk_bytes: bytes) -> bool:
         if not self._config_printed:
@@ -187,42 +191,51 @@ class WakeWordDetector:
                  print("WakeWordDetector.process_audio: No valid model loaded, cannot process audio.")
             return False
         
-        audio_data_int16 = np.frombuffer(audio_chunk_bytes, dtype=np.int16)
+        # Accepts PCM16 bytes or an int16 array (main.py passes its shared 16 kHz array; no tobytes() copy)
+        audio_data_int16 = audio_chunk_bytes if isinstance(audio_chunk_bytes, np.ndarray) else np.frombuffer(audio_chunk_bytes, dtype=np.int16)
 
-        # Resample if input rate is not 16kHz and scipy is available
+        # Resample if input rate is not 16kHz. Callers that already share a 16kHz stream
+        # (main.py's continuous_audio_pipeline) construct us with sample_rate=16000 and skip this.
         if self.sample_rate != self.oww_expected_rate:
-            if self._check_scipy():
-                try:
-                    num_samples_input = len(audio_data_int16)
-                    num_samples_output = int(num_samples_input * self.oww_expected_rate / self.sample_rate)
-                    if num_samples_output > 0: # Avoid resampling to zero samples
-                        from scipy import signal # Import here as it's checked
-                        resampled_audio_float32 = signal.resample(audio_data_int16.astype(np.float32), num_samples_output)
-                        audio_data_int16 = resampled_audio_float32.astype(np.int16) # openwakeword expects int16
-                        if not self._resampling_info_printed:
-                            print(f"WakeWordDetector: Resampled audio from {self.sample_rate}Hz to {self.oww_expected_rate}Hz. Chunk {num_samples_input} -> {num_samples_output} samples.")
-                            self._resampling_info_printed = True
-                    else: # Resampling would result in 0 samples, skip
-                         if not self._resampling_info_printed: # Print once
-                            print(f"WakeWordDetector: WARN - Resampling from {self.sample_rate}Hz to {self.oww_expected_rate}Hz would result in 0 samples for this chunk size. Skipping resampling. Ensure audio chunks are large enough or rates match.")
-                            self._resampling_info_printed = True # Suppress further warnings for this
-                except Exception as e:
-                    print(f"WakeWordDetector: Error during resampling: {e}")
-            # If scipy not available, warning printed by _check_scipy, audio passes through at original rate
+            try:
+                if self._resampler is None:
+                    self._resampler = StreamingResampler(self.sample_rate, self.oww_expected_rate, reuse_output=True) # Copied into self.buffer below
+                num_samples_input = len(audio_data_int16)
+                audio_data_int16 = self._resampler.process(audio_data_int16)
+                if not self._resampling_info_printed:
+                    print(f"WakeWordDetector: Resampled audio from {self.sample_rate}Hz to {self.oww_expected_rate}Hz. Chunk {num_samples_input} -> {len(audio_data_int16)} samples.")
+                    self._resampling_info_printed = True
+                if audio_data_int16.size == 0:
+                    return False
+            except Exception as e:
+                print(f"WakeWordDetector: Error during resampling: {e}")
         
-        # openWakeWord expects int16 numpy array
-        # For versions like 0.5.x, it seems to handle internal buffering well,
-        # so we can feed it chunks directly.
-        prediction = self.model.predict(audio_data_int16) # Pass the int16 numpy array
+        # Fill the frame buffer; predict once per complete 1280-sample frame.
+        # The 30 ms pipeline chunks (480 samples) give a prediction every 2-3 chunks.
+        self.chunks_in += 1
+        detected = False
+        pos = 0
+        while pos < len(audio_data_int16):
+            take = min(self.FRAME_SAMPLES - self._buffered, len(audio_data_int16) - pos)
+            self.buffer[self._buffered:self._buffered + take] = audio_data_int16[pos:pos + take]
+            self._buffered += take; pos += take
+            if self._buffered == self.FRAME_SAMPLES:
+                self._buffered = 0
+                if self._score_frame(): detected = True
+        return detected
 
-        # The key in the prediction dictionary should be the base model name, e.g., "hey_jarvis"
+    def _score_frame(self) -> bool:
+        # openWakeWord expects an int16 numpy array; keys are base model names, e.g. "hey_jarvis"
         # (not "hey_jarvis.onnx") for openwakeword versions >= 0.5.0
-        score = prediction.get(self.wake_word_model_name, 0.0) 
-        
-        if score > self.threshold:
-            print(f"WakeWordDetector: DETECTED '{self.wake_word_model_name}' with score {score:.4f} (threshold {self.threshold})")
-            return True
-        
+        prediction = self.model.predict(self.buffer)
+        self.predict_calls += 1
+        for model_name in self.wake_word_model_names:
+            score = prediction.get(model_name, 0.0)
+            if score > self.threshold:
+                self.last_detected_model = model_name
+                print(f"WakeWordDetector: DETECTED '{model_name}' with score {score:.4f} (threshold {self.threshold})")
+                return True
+
         # Optional: print scores if they are close to threshold for debugging
         # elif score > self.threshold * 0.5: # e.g. if score is more than half the threshold
         #    print(f"WakeWordDetector: Near miss for '{self.wake_word_model_name}', score: {score:.4f}")
@@ -232,7 +245,9 @@ class WakeWordDetector:
     def reset(self):
         if self.model and hasattr(self.model, 'reset'):
             self.model.reset()
-        self.buffer = np.array([], dtype=np.int16) # Reset buffer
+        self._buffered = 0 # Drop the partial frame
+        if self._resampler is not None:
+            self._resampler.reset()
         print("WakeWordDetector: Reset complete.")
 
 # Example usage when run directly
@@ -0,0 +1,179 @@
+# ws_sender.py
+"""
+Single outbound writer for the OpenAI Realtime websocket.
+
+Previously the audio thread, tool threads, the wake-up message and truncation
+all called ws_app.send() directly and concurrently, and every 30 ms mic chunk
+became its own input_audio_buffer.append frame. OutboundSender owns one send
+queue drained by one writer thread:
+
+- Mic audio is coalesced into one append per `coalesce_ms` window.
+- Append frames are built from a prebuilt JSON envelope by string concatenation,
+  so the (large) base64 payload is never passed through json.dumps.
+- Any control event first flushes pending audio, so ordering is preserved.
+
+AsyncOutboundSender is the same producer side for the asyncio client: frames
+are handed to the client's event loop and written by a task instead of a thread.
+"""
+
+import asyncio
+import base64
+import json
+import queue
+import threading
+import time
+
+_APPEND_PREFIX = '{"type":"input_audio_buffer.append","audio":"'
+_APPEND_SUFFIX = '"}'
+
+
+def build_append_frame(audio_bytes: bytes) -> str:
+    """input_audio_buffer.append event for already-encoded audio bytes (PCM16 or G.711)."""
+    return _APPEND_PREFIX + base64.b64encode(audio_bytes).decode("ascii") + _APPEND_SUFFIX
+
+
+class OutboundSender:
+    def __init__(self, ws_getter, is_connected_fn, log_fn=print, coalesce_ms: int = 90, max_queue: int = 1000):
+        self._ws_getter = ws_getter # Returns the current WebSocketApp (it changes on reconnect)
+        self._is_connected = is_connected_fn
+        self.log = log_fn
+        self.coalesce_ms = max(0, int(coalesce_ms))
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock() # Guards the pending audio and its enqueue order
+        self._pending_audio = bytearray()
+        self._pending_ms = 0.0
+        self._pending_since = None
+        self._stop_event = threading.Event()
+        self.stats = {"frames_sent": 0, "append_frames_sent": 0, "audio_chunks_in": 0, "control_events_sent": 0,
+                      "send_errors": 0, "dropped_disconnected": 0, "dropped_queue_full": 0}
+        self._thread = None
+        self._start_writer()
+
+    def _start_writer(self):
+        self._thread = threading.Thread(target=self._run, name="WSOutboundWriter", daemon=True)
+        self._thread.start()
+
+    # --- Producer side (any thread) ---
+    def append_audio(self, audio_bytes: bytes, duration_ms: float):
+        with self._lock:
+            self.stats["audio_chunks_in"] += 1
+            if not self._pending_audio: self._pending_since = time.time()
+            self._pending_audio += audio_bytes
+            self._pending_ms += duration_ms
+            if self._pending_ms >= self.coalesce_ms:
+                self._flush_audio_locked()
+
+    def send_event(self, payload: dict):
+        self.send_raw(json.dumps(payload), is_control=True)
+
+    def send_raw(self, frame: str, is_control: bool = True):
+        with self._lock:
+            self._flush_audio_locked() # Audio captured before this event must reach the server first
+            self._put((frame, is_control))
+
+    def flush_audio(self):
+        with self._lock: self._flush_audio_locked()
+
+    def reset(self):
+        """Drop pending audio and queued frames (e.g. they belong to a connection that is gone)."""
+        with self._lock:
+            self._pending_audio = bytearray(); self._pending_ms = 0.0; self._pending_since = None
+            while True:
+                try: self._queue.get_nowait()
+                except queue.Empty: break
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _flush_audio_locked(self):
+        if not self._pending_audio: return
+        self._put((build_append_frame(bytes(self._pending_audio)), False))
+        self._pending_audio = bytearray(); self._pending_ms = 0.0; self._pending_since = None
+
+    def _put(self, item):
+        try: self._queue.put_nowait(item)
+        except queue.Full:
+            self.stats["dropped_queue_full"] += 1
+            if self.stats["dropped_queue_full"] % 50 == 1: self.log("WSOutboundWriter: Send queue full; dropping frame.")
+
+    # --- Writer thread ---
+    def _run(self):
+        poll_s = max(self.coalesce_ms, 20) / 2000.0
+        while not self._stop_event.is_set():
+            try:
+                frame, is_control = self._queue.get(timeout=poll_s)
+            except queue.Empty:
+                # Don't let a partial window sit forever if the mic stops delivering
+                with self._lock:
+                    if self._pending_since and (time.time() - self._pending_since) * 1000.0 >= self.coalesce_ms:
+                        self._flush_audio_locked()
+                continue
+            ws = self._ws_getter()
+            if not (ws and self._is_connected()):
+                self.stats["dropped_disconnected"] += 1
+                continue
+            try:
+                ws.send(frame)
+                self.stats["frames_sent"] += 1
+                self.stats["control_events_sent" if is_control else "append_frames_sent"] += 1
+            except Exception as e_send:
+                self.stats["send_errors"] += 1
+                self.log(f"WSOutboundWriter: Send failed: {e_send}")
+
+
+class AsyncOutboundSender(OutboundSender):
+    """OutboundSender whose writer is a task (run()) on the asyncio client's loop. Producers may be on any thread."""
+
+    def __init__(self, ws_getter, is_connected_fn, log_fn=print, coalesce_ms: int = 90, max_queue: int = 1000):
+        self._loop = None
+        self._aqueue = None
+        self._max_queue = max_queue
+        super().__init__(ws_getter, is_connected_fn, log_fn=log_fn, coalesce_ms=coalesce_ms, max_queue=max_queue)
+
+    def _start_writer(self):
+        pass # The client starts run() once its loop is running
+
+    def bind_loop(self, loop):
+        self._loop = loop
+        self._aqueue = asyncio.Queue(maxsize=self._max_queue)
+
+    def reset(self):
+        super().reset()
+        if self._loop: self._loop.call_soon_threadsafe(self._drain_on_loop) # Ordered before anything sent after reset()
+
+    def _drain_on_loop(self):
+        while not self._aqueue.empty(): self._aqueue.get_nowait()
+
+    def _put(self, item):
+        if self._loop is None:
+            self.stats["dropped_disconnected"] += 1; return
+        try: self._loop.call_soon_threadsafe(self._put_on_loop, item) # FIFO, so enqueue order is kept
+        except RuntimeError: self.stats["dropped_disconnected"] += 1 # Loop already closed
+
+    def _put_on_loop(self, item):
+        try: self._aqueue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.stats["dropped_queue_full"] += 1
+            if self.stats["dropped_queue_full"] % 50 == 1: self.log("WSOutboundWriter: Send queue full; dropping frame.")
+
+    async def run(self):
+        poll_s = max(self.coalesce_ms, 20) / 2000.0
+        while not self._stop_event.is_set():
+            try:
+                frame, is_control = await asyncio.wait_for(self._aqueue.get(), timeout=poll_s)
+            except asyncio.TimeoutError:
+                with self._lock:
+                    if self._pending_since and (time.time() - self._pending_since) * 1000.0 >= self.coalesce_ms:
+                        self._flush_audio_locked()
+                continue
+            ws = self._ws_getter()
+            if not (ws and self._is_connected()):
+                self.stats["dropped_disconnected"] += 1
+                continue
+            try:
+                await ws.send(frame)
+                self.stats["frames_sent"] += 1
+                self.stats["control_events_sent" if is_control else "append_frames_sent"] += 1
+            except Exception as e_send:
+                self.stats["send_errors"] += 1
+                self.log(f"WSOutboundWriter: Send failed: {e_send}")